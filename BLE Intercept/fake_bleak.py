@@ -0,0 +1,464 @@
+"""
+Drop-in stand-in for bleak's BleakScanner / BleakClient that emulates the ReCoverRun firmware.
+
+The emulated peripheral reproduces the behaviour of 'ReCoverRun 2.ino':
+  - advertises as "ReCover" with the ReCoverRun service / data characteristic UUIDs
+  - samples FSR and POT (in mV) every send_delay milliseconds
+  - optional two-sample window averaging (_windowAveraging / NUM_SAMPLES = 2)
+  - packs each value as uint16(mean * 10), little endian, and notifies the client
+  - restarts advertising 500 ms after a client disconnects
+
+The host scripts (intercept_BLE_V2.py, BLE_Force_mapping.py) expect the newer ToF firmware,
+which sends FSR, POT and ToF as three little-endian floats on a different characteristic.
+That layout is available as frame_format="float3".
+
+Usage:
+    firmware = FakeRecoverFirmware(sine_waveform(), frame_format="float3",
+                                   characteristic_uuid=HOST_CHARACTERISTIC_UUID)
+    with fake_backend(intercept_BLE_V2, firmware):
+        await intercept_BLE_V2.connect_and_read()
+"""
+import asyncio
+import inspect
+import struct
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# --- Firmware constants (ReCoverRun 2.ino) ---
+DEVICE_NAME = "ReCover"
+SERVICE_UUID = "A9E90000-194C-4523-A473-5FDF36AA4D20"
+DATA_UUID = "A9E90001-194C-4523-A473-5FDF36AA4D20"
+NUM_SAMPLES = 2            # Window averaging length
+SEND_DELAY_MS = 50         # delay(send_delay) at the end of loop()
+READVERTISE_DELAY_S = 0.5  # delay(500) before pServer->startAdvertising()
+
+# Characteristic used by the host scripts for the FSR / POT / ToF float frames
+HOST_CHARACTERISTIC_UUID = "2d8e1b65-9d11-43ea-b0f5-c51cb352ddfa"
+
+# Device Information Service "Firmware Revision String", the sketch does not expose it
+FIRMWARE_REVISION_UUID = "00002a26-0000-1000-8000-00805f9b34fb"
+
+FRAME_FORMATS = ("uint16x10", "float3")
+
+
+class BleakError(Exception):
+    """Raised for the same situations in which bleak raises BleakError."""
+
+
+# --- Waveform sources ---
+def sine_waveform(fsr_mean=1500.0, fsr_amplitude=400.0, pot_mean=1800.0, pot_amplitude=600.0,
+                  tof_mean=20.0, tof_amplitude=8.0, frequency_hz=0.5, noise=0.0, seed=0):
+    """
+    Synthetic grip/release movement.
+
+    Returns:
+        callable: f(t) -> (fsr_mV, pot_mV, tof_mm) for the time t in seconds.
+    """
+    rng = np.random.default_rng(seed)
+
+    def waveform(t):
+        phase = np.sin(2 * np.pi * frequency_hz * t)
+        fsr, pot, tof = (fsr_mean + fsr_amplitude * phase,
+                         pot_mean + pot_amplitude * phase,
+                         tof_mean - tof_amplitude * phase)
+        if noise:
+            fsr, pot, tof = np.array([fsr, pot, tof]) + rng.normal(0.0, noise, 3)
+        return fsr, pot, tof
+
+    return waveform
+
+
+def csv_waveform(csv_file_path, pot_value=1800.0, samples_per_row=1):
+    """
+    Replays a calibration CSV (weight_g, fsr_value, tof_distance_mm) row by row, cyclically.
+
+    Args:
+        csv_file_path (str): e.g. 'DataAnalysis/ForceMapper/Real_calibration_data_ble.csv'.
+        pot_value (float): Constant potentiometer reading, the file does not contain one.
+        samples_per_row (int): Number of consecutive firmware samples that repeat each row.
+
+    Returns:
+        callable: f(t, index) -> (fsr_mV, pot_mV, tof_mm).
+    """
+    df = pd.read_csv(csv_file_path)
+    rows = df[['fsr_value', 'tof_distance_mm']].to_numpy(dtype=float)
+
+    def waveform(t, index):
+        fsr, tof = rows[(index // samples_per_row) % len(rows)]
+        return fsr, pot_value, tof
+
+    return waveform
+
+
+class WeightRig:
+    """
+    Simulated calibration bench: the elastic band loaded with a weight.
+
+    After apply() the load approaches the new weight exponentially with settle_time_s as time
+    constant. FSR and ToF follow quadratic calibration curves fitted to a calibration CSV, with
+    Gaussian noise, and the ToF is rounded to whole millimetres like the real sensor. The POT
+    reads pot_value plus pot_per_deg for every degree of finger angle given to apply().
+
+    Use the rig itself as the waveform of a FakeRecoverFirmware.
+    """
+
+    def __init__(self, csv_file_path, settle_time_s=0.4, fsr_noise=5.0, tof_noise=0.7,
+                 pot_value=1800.0, pot_per_deg=12.0, pot_noise=3.0, seed=0):
+        df = pd.read_csv(csv_file_path)
+        self.fsr_coeffs = np.polyfit(df['weight_g'], df['fsr_value'], 2)
+        self.tof_coeffs = np.polyfit(df['weight_g'], df['tof_distance_mm'], 2)
+        self.settle_time_s = settle_time_s
+        self.fsr_noise = fsr_noise
+        self.tof_noise = tof_noise
+        self.pot_value = pot_value
+        self.pot_per_deg = pot_per_deg
+        self.pot_noise = pot_noise
+        self.angle_deg = 0.0
+        self.rng = np.random.default_rng(seed)
+        self.weight_g = 0.0
+        self.load_g = 0.0
+        self._last_t = None
+
+    def apply(self, weight_g, angle_deg=None):
+        self.weight_g = float(weight_g)
+        if angle_deg is not None:
+            self.angle_deg = float(angle_deg)
+
+    def __call__(self, t):
+        if self._last_t is not None and self.settle_time_s > 0:
+            self.load_g += (self.weight_g - self.load_g) * (1.0 - np.exp(-(t - self._last_t) / self.settle_time_s))
+        elif self.settle_time_s <= 0:
+            self.load_g = self.weight_g
+        self._last_t = t
+        fsr = np.polyval(self.fsr_coeffs, self.load_g) + self.rng.normal(0.0, self.fsr_noise)
+        tof = np.round(np.polyval(self.tof_coeffs, self.load_g) + self.rng.normal(0.0, self.tof_noise))
+        pot = self.pot_value + self.pot_per_deg * self.angle_deg + self.rng.normal(0.0, self.pot_noise)
+        return fsr, pot, tof
+
+
+# --- Emulated peripheral ---
+class FakeDevice:
+    """Mimics bleak's BLEDevice."""
+
+    def __init__(self, name, address, firmware):
+        self.name = name
+        self.address = address
+        self.details = firmware
+        self.firmware = firmware
+
+    def __repr__(self):
+        return f"FakeDevice({self.address}, {self.name})"
+
+
+class FakeAdvertisementData:
+    """Mimics bleak's AdvertisementData."""
+
+    def __init__(self, local_name, service_uuids, rssi=-50):
+        self.local_name = local_name
+        self.service_uuids = service_uuids
+        self.rssi = rssi
+        self.manufacturer_data = {}
+        self.service_data = {}
+
+
+class FakeCharacteristic:
+    """Sender object handed to notification callbacks, like BleakGATTCharacteristic."""
+
+    def __init__(self, characteristic_uuid, handle=42):
+        self.uuid = characteristic_uuid.lower()
+        self.handle = handle
+
+    def __repr__(self):
+        return f"{self.uuid} (Handle: {self.handle})"
+
+
+class FakeRecoverFirmware:
+    """
+    Emulated ReCoverRun ESP32.
+
+    Args:
+        waveform (callable): f(t) or f(t, index) returning (fsr_mV, pot_mV, tof_mm).
+        send_delay (float): Milliseconds between notifications (send_delay in the sketch).
+        window_averaging (bool): Enables the two-sample moving average (_windowAveraging).
+        frame_format (str): "uint16x10" (<HH, as in the sketch) or "float3" (<fff, ToF firmware).
+        characteristic_uuid (str): UUID of the notifying characteristic.
+        disconnect_schedule (list): Seconds of connection after which the firmware drops the
+            link, one entry per connection. The link stays up once the list is exhausted.
+        readvertise_delay (float): Seconds between a dropped link and advertising again.
+        time_scale (float): Multiplies every wall-clock wait, e.g. 0.01 for a 100x faster run.
+        name (str): Advertised name.
+        address (str): Device address, random by default.
+        firmware_version (str): Firmware Revision String to expose, None (like the sketch) for none.
+    """
+
+    def __init__(self, waveform=None, send_delay=SEND_DELAY_MS, window_averaging=False,
+                 frame_format="uint16x10", characteristic_uuid=DATA_UUID, disconnect_schedule=None,
+                 readvertise_delay=READVERTISE_DELAY_S, time_scale=1.0, name=DEVICE_NAME, address=None,
+                 firmware_version=None):
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"frame_format must be one of {FRAME_FORMATS}")
+
+        self.waveform = waveform or sine_waveform()
+        self._waveform_takes_index = len(inspect.signature(self.waveform).parameters) > 1
+        self.send_delay = send_delay
+        self.window_averaging = window_averaging
+        self.frame_format = frame_format
+        self.characteristic = FakeCharacteristic(characteristic_uuid)
+        self.disconnect_schedule = list(disconnect_schedule or [])
+        self.readvertise_delay = readvertise_delay
+        self.time_scale = time_scale
+        self.address = address or ":".join(f"{b:02X}" for b in uuid.uuid4().bytes[:6])
+        self.firmware_version = firmware_version
+        self.device = FakeDevice(name, self.address, self)
+        self.advertisement = FakeAdvertisementData(name, [SERVICE_UUID.lower()])
+
+        self.advertising = True
+        self.client = None
+        self.last_frame = b""
+        self._sample_index = 0
+        self._fsr_window = [0.0] * NUM_SAMPLES
+        self._pot_window = [0.0] * NUM_SAMPLES
+        self._connection_count = 0
+
+        # Counters for stress tests
+        self.notifications_sent = 0
+        self.connections = 0
+        self.dropped_links = 0
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds * self.time_scale)
+
+    def next_frame(self):
+        """Runs one iteration of loop(): sample, average, quantise and pack."""
+        t = self._sample_index * self.send_delay / 1000.0
+        if self._waveform_takes_index:
+            fsr_mv, pot_mv, tof_mm = self.waveform(t, self._sample_index)
+        else:
+            fsr_mv, pot_mv, tof_mm = self.waveform(t)
+        self._sample_index += 1
+
+        if self.window_averaging:
+            self._fsr_window = [float(fsr_mv)] + self._fsr_window[:-1]
+            self._pot_window = [float(pot_mv)] + self._pot_window[:-1]
+            fsr_mean = sum(self._fsr_window) / NUM_SAMPLES
+            pot_mean = sum(self._pot_window) / NUM_SAMPLES
+        else:
+            fsr_mean, pot_mean = float(fsr_mv), float(pot_mv)
+
+        # (uint16_t)(mean * 10): truncation towards zero and wrap-around like the C cast
+        fsr_int = int(max(fsr_mean, 0.0) * 10) & 0xFFFF
+        pot_int = int(max(pot_mean, 0.0) * 10) & 0xFFFF
+
+        if self.frame_format == "uint16x10":
+            return struct.pack('<HH', fsr_int, pot_int)
+        return struct.pack('<fff', fsr_int / 10.0, pot_int / 10.0, float(tof_mm))
+
+    def accept(self, client):
+        if not self.advertising or self.client is not None:
+            raise BleakError(f"Device with address {self.address} was not found.")
+        self.advertising = False
+        self.client = client
+        self.connections += 1
+        self._connection_count += 1
+
+    async def run_link(self, client):
+        """Notification loop of one connection, ends when either side drops the link."""
+        link_index = self._connection_count - 1
+        drop_after = (self.disconnect_schedule[link_index]
+                      if link_index < len(self.disconnect_schedule) else None)
+        elapsed = 0.0
+
+        while client.is_connected:
+            frame = self.next_frame()
+            self.last_frame = frame
+            await client.deliver(self.characteristic, frame)
+            self.notifications_sent += 1
+
+            await self.sleep(self.send_delay / 1000.0)
+            elapsed += self.send_delay / 1000.0
+            if drop_after is not None and elapsed >= drop_after:
+                self.dropped_links += 1
+                client.link_lost()
+                break
+
+    async def release(self, client):
+        if self.client is not client:
+            return
+        self.client = None
+        await self.sleep(self.readvertise_delay)
+        self.advertising = True
+
+
+# --- Peripheral registry and bleak replacements ---
+_peripherals = []
+
+
+def register_peripheral(firmware):
+    """Makes an emulated device visible to FakeBleakScanner / FakeBleakClient."""
+    _peripherals.append(firmware)
+    return firmware
+
+
+def reset():
+    """Removes all emulated devices."""
+    _peripherals.clear()
+
+
+def _lookup(address_or_device):
+    if isinstance(address_or_device, FakeDevice):
+        return address_or_device.firmware
+    for firmware in _peripherals:
+        if firmware.address.lower() == str(address_or_device).lower():
+            return firmware
+    return None
+
+
+class FakeBleakScanner:
+    """Replacement for bleak.BleakScanner that only sees registered emulated devices."""
+
+    POLL_INTERVAL = 0.01
+
+    @classmethod
+    async def find_device_by_filter(cls, filterfunc, timeout=10.0, **kwargs):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            for firmware in _peripherals:
+                if firmware.advertising and filterfunc(firmware.device, firmware.advertisement):
+                    return firmware.device
+            if loop.time() >= deadline:
+                return None
+            await asyncio.sleep(cls.POLL_INTERVAL)
+
+    @classmethod
+    async def find_device_by_name(cls, name, timeout=10.0, **kwargs):
+        return await cls.find_device_by_filter(lambda d, ad: ad.local_name == name, timeout)
+
+    @classmethod
+    async def find_device_by_address(cls, device_identifier, timeout=10.0, **kwargs):
+        return await cls.find_device_by_filter(
+            lambda d, ad: d.address.lower() == device_identifier.lower(), timeout)
+
+    @classmethod
+    async def discover(cls, timeout=5.0, return_adv=False, **kwargs):
+        await asyncio.sleep(min(timeout, cls.POLL_INTERVAL))
+        found = [f for f in _peripherals if f.advertising]
+        if return_adv:
+            return {f.address: (f.device, f.advertisement) for f in found}
+        return [f.device for f in found]
+
+
+class FakeBleakClient:
+    """Replacement for bleak.BleakClient connected to an emulated ReCoverRun device."""
+
+    def __init__(self, address_or_ble_device, disconnected_callback=None, timeout=10.0, **kwargs):
+        self.address = getattr(address_or_ble_device, "address", address_or_ble_device)
+        self._target = address_or_ble_device
+        self._disconnected_callback = disconnected_callback
+        self._firmware = None
+        self._connected = False
+        self._callbacks = {}
+        self._link_task = None
+
+    @property
+    def is_connected(self):
+        return self._connected
+
+    async def connect(self, **kwargs):
+        firmware = _lookup(self._target)
+        if firmware is None:
+            raise BleakError(f"Device with address {self.address} was not found.")
+        firmware.accept(self)
+        self._firmware = firmware
+        self._connected = True
+        self._link_task = asyncio.create_task(firmware.run_link(self))
+        return True
+
+    async def disconnect(self):
+        if self._firmware is None:
+            return True
+        self._connected = False
+        if self._link_task is not None and self._link_task is not asyncio.current_task():
+            self._link_task.cancel()
+            try:
+                await self._link_task
+            except asyncio.CancelledError:
+                pass
+        firmware, self._firmware = self._firmware, None
+        asyncio.create_task(firmware.release(self))
+        return True
+
+    def link_lost(self):
+        """Called by the firmware when it drops the link."""
+        self._connected = False
+        firmware, self._firmware = self._firmware, None
+        asyncio.get_running_loop().create_task(firmware.release(self))
+        if self._disconnected_callback is not None:
+            self._disconnected_callback(self)
+
+    def _check_characteristic(self, char_specifier):
+        char_uuid = getattr(char_specifier, "uuid", char_specifier)
+        if not self._connected:
+            raise BleakError("Not connected")
+        if str(char_uuid).lower() != self._firmware.characteristic.uuid:
+            raise BleakError(f"Characteristic {char_uuid} was not found!")
+        return self._firmware.characteristic.uuid
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        self._callbacks[self._check_characteristic(char_specifier)] = callback
+
+    async def stop_notify(self, char_specifier):
+        self._callbacks.pop(self._check_characteristic(char_specifier), None)
+
+    async def read_gatt_char(self, char_specifier, **kwargs):
+        char_uuid = str(getattr(char_specifier, "uuid", char_specifier)).lower()
+        if char_uuid == FIRMWARE_REVISION_UUID and self._connected and self._firmware.firmware_version:
+            return bytearray(self._firmware.firmware_version.encode())
+        self._check_characteristic(char_specifier)
+        return bytearray(self._firmware.last_frame)
+
+    async def deliver(self, characteristic, frame):
+        callback = self._callbacks.get(characteristic.uuid)
+        if callback is None:
+            return
+        result = callback(characteristic, bytearray(frame))
+        if inspect.isawaitable(result):
+            await result
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+
+@contextmanager
+def fake_backend(modules, *firmwares):
+    """
+    Patches BleakScanner / BleakClient in the given script modules and registers devices.
+
+    Args:
+        modules: A module or list of modules that did `from bleak import BleakClient, BleakScanner`.
+        firmwares: FakeRecoverFirmware instances to make visible.
+    """
+    if not isinstance(modules, (list, tuple)):
+        modules = [modules]
+    originals = [(m, getattr(m, "BleakScanner", None), getattr(m, "BleakClient", None)) for m in modules]
+    for firmware in firmwares:
+        register_peripheral(firmware)
+    for module in modules:
+        module.BleakScanner = FakeBleakScanner
+        module.BleakClient = FakeBleakClient
+    try:
+        yield firmwares
+    finally:
+        for module, scanner, client in originals:
+            module.BleakScanner = scanner
+            module.BleakClient = client
+        for firmware in firmwares:
+            if firmware in _peripherals:
+                _peripherals.remove(firmware)
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+
+# The host scripts create matplotlib figures at import time, render them off-screen
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FORCE_MAPPER_DIR = os.path.join(SCRIPT_DIR, '..', 'DataAnalysis', 'ForceMapper')
+sys.path.insert(0, FORCE_MAPPER_DIR)  # Ahead of the legacy copy of BLE_Force_mapping.py next to this script
+
+import fake_bleak
+from calibration_fitting import SENSOR_PAIRS
+from calibration_registry import CalibrationRegistry
+from calibration_report import available_figures
+from fake_bleak import (FakeBleakClient, FakeRecoverFirmware, HOST_CHARACTERISTIC_UUID, DATA_UUID,
+                        WeightRig, fake_backend, sine_waveform)
+
+# --- Scenario settings ---
+TIME_SCALE = 0.1            # Run the 50 ms firmware loop 10x faster than real time
+STORM_CYCLES = 20           # Forced disconnect / re-advertise cycles in the reconnect storm
+HIGH_RATE_SEND_DELAY = 1    # ms, 50x the normal notification rate
+HIGH_RATE_DURATION = 2.0    # s
+CALIBRATION_CSV = os.path.join(FORCE_MAPPER_DIR, 'Real_calibration_data_ble.csv')
+
+
+def host_firmware(**kwargs):
+    """Emulated device speaking the <fff frame format the host scripts unpack."""
+    kwargs.setdefault("frame_format", "float3")
+    kwargs.setdefault("characteristic_uuid", HOST_CHARACTERISTIC_UUID)
+    kwargs.setdefault("time_scale", TIME_SCALE)
+    return FakeRecoverFirmware(**kwargs)
+
+
+async def run_until(task, condition, timeout):
+    """Waits until condition() holds or the timeout expires, returns whether it held."""
+    deadline = time.time() + timeout
+    while time.time() < deadline and not task.done():
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+async def stop_intercept(module, task):
+    module.animation_running = False
+    await asyncio.wait_for(task, timeout=10)
+
+
+def fresh_intercept_module():
+    import intercept_BLE_V2
+    intercept_BLE_V2.animation_running = True
+    intercept_BLE_V2.connected = False
+    intercept_BLE_V2.client = None
+    intercept_BLE_V2.start_time = None
+    for buffer in (intercept_BLE_V2.timestamps, intercept_BLE_V2.fsr_values,
+                   intercept_BLE_V2.pot_values, intercept_BLE_V2.tof_values):
+        buffer.clear()
+    return intercept_BLE_V2
+
+
+# --- Scenarios ---
+async def scenario_uint16_frames():
+    """Frames on the sketch's own characteristic decode to the quantised waveform."""
+    firmware = FakeRecoverFirmware(sine_waveform(), send_delay=5, window_averaging=True)
+    frames = []
+    fake_bleak.register_peripheral(firmware)
+    try:
+        async with FakeBleakClient(firmware.device) as client:
+            await client.start_notify(DATA_UUID, lambda sender, data: frames.append(bytes(data)))
+            await asyncio.sleep(0.2)
+    finally:
+        fake_bleak.reset()
+
+    reference = FakeRecoverFirmware(sine_waveform(), send_delay=5, window_averaging=True)
+    expected = [reference.next_frame() for _ in frames]
+    decoded = [struct.unpack('<HH', f) for f in frames]
+    ok = len(frames) > 10 and frames == expected and all(len(f) == 4 for f in frames)
+    return ok, f"{len(frames)} frames, first decoded FSR/POT = {decoded[0][0] / 10:.1f}/{decoded[0][1] / 10:.1f} mV"
+
+
+async def scenario_intercept_end_to_end():
+    """intercept_BLE_V2.connect_and_read scans, connects and fills its plot buffers."""
+    module = fresh_intercept_module()
+    firmware = host_firmware()
+    with fake_backend(module, firmware):
+        task = asyncio.create_task(module.connect_and_read())
+        filled = await run_until(task, lambda: len(module.fsr_values) == module.BUFFER_SIZE, timeout=30)
+        await stop_intercept(module, task)
+    return filled, f"{len(module.fsr_values)} samples buffered, {firmware.notifications_sent} notifications"
+
+
+async def scenario_reconnect_storm():
+    """The firmware drops the link STORM_CYCLES times, the client reconnects every time."""
+    module = fresh_intercept_module()
+    firmware = host_firmware(disconnect_schedule=[0.2] * STORM_CYCLES)
+    with fake_backend(module, firmware):
+        task = asyncio.create_task(module.connect_and_read())
+        recovered = await run_until(
+            task, lambda: firmware.connections > STORM_CYCLES and module.connected, timeout=60)
+        received_before = len(module.timestamps)
+        await asyncio.sleep(0.2)
+        streaming = module.client is not None and module.client.is_connected
+        await stop_intercept(module, task)
+    ok = recovered and streaming and firmware.dropped_links == STORM_CYCLES and received_before > 0
+    return ok, f"{firmware.connections} connections, {firmware.dropped_links} dropped links"
+
+
+async def scenario_high_rate():
+    """Notifications at 1 kHz reach the handler without loss."""
+    module = fresh_intercept_module()
+    firmware = host_firmware(send_delay=HIGH_RATE_SEND_DELAY, time_scale=1.0)
+    received = []
+    original_handler = module.notification_handler
+    module.notification_handler = lambda sender, data: received.append(data)
+    try:
+        with fake_backend(module, firmware):
+            task = asyncio.create_task(module.connect_and_read())
+            await run_until(task, lambda: module.connected, timeout=10)
+            start = time.perf_counter()
+            await asyncio.sleep(HIGH_RATE_DURATION)
+            await stop_intercept(module, task)
+            elapsed = time.perf_counter() - start
+    finally:
+        module.notification_handler = original_handler
+    rate = len(received) / elapsed
+    ok = len(received) == firmware.notifications_sent and rate > 200
+    return ok, f"{len(received)}/{firmware.notifications_sent} frames delivered, {rate:.0f} frames/s"
+
+
+async def scenario_calibration_end_to_end():
+    """BLE_Force_mapping.run_calibration_mode collects three weights and writes its CSV."""
+    import BLE_Force_mapping
+    weights = ["0", "100", "200", "d"]
+    rig = WeightRig(CALIBRATION_CSV)
+    firmware = host_firmware(waveform=rig)
+    BLE_Force_mapping.calibration_data = []
+    BLE_Force_mapping.client = None
+    BLE_Force_mapping.CALIBRATION_REGISTRY = "calibration_registry.npz"  # Inside the temporary directory
+
+    def operator(prompt=""):
+        # The operator types the weight, then hangs it on the band
+        answer = weights.pop(0)
+        if answer != "d":
+            rig.apply(float(answer))
+        return answer
+
+    read_operator_line = BLE_Force_mapping.read_operator_line
+    BLE_Force_mapping.read_operator_line = operator
+
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with fake_backend(BLE_Force_mapping, firmware):
+                await BLE_Force_mapping.run_calibration_mode()
+            df = pd.read_csv("calibration_data_ble.csv")
+            figures = sorted(f for f in os.listdir(".") if f.endswith(".png"))
+        finally:
+            os.chdir(working_dir)
+            BLE_Force_mapping.read_operator_line = read_operator_line
+
+    per_weight = df.groupby("weight_g").size()
+    ok = (list(per_weight.index) == [0.0, 100.0, 200.0]
+          and per_weight.between(BLE_Force_mapping.MIN_DATAPOINTS_PER_WEIGHT,
+                                 BLE_Force_mapping.MAX_DATAPOINTS_PER_WEIGHT).all())
+    ok = ok and len(figures) == len(available_figures(df))
+    return ok, (f"{len(df)} rows written for weights {list(per_weight.index)} (adaptive: {per_weight.tolist()}), "
+                f"{len(figures)} figures")
+
+
+async def scenario_scripted_calibration():
+    """A protocol file drives an unattended calibration of all channels, the rig applies each weight and angle."""
+    import BLE_Force_mapping
+    protocol = {
+        "output": "scripted_calibration.csv",
+        "defaults": {"samples": 5, "adaptive": False, "max_wait": 5, "retries": 1},
+        "steps": [{"weight_g": 0, "angle_deg": 0}, {"weight_g": 50, "angle_deg": 30},
+                  {"weight_g": 150, "samples": 7, "angle_deg": 60}, {"weight_g": 150, "angle_deg": 90},
+                  {"weight_g": 0, "stabilization": "fixed", "settle_delay": 0.2}],
+    }
+    rig = WeightRig(CALIBRATION_CSV)
+    firmware = host_firmware(waveform=rig, firmware_version="2.1.0")
+    BLE_Force_mapping.client = None
+    BLE_Force_mapping.CALIBRATION_REGISTRY = "calibration_registry.npz"
+
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with open("protocol.json", "w") as f:
+                json.dump(protocol, f)
+            with fake_backend(BLE_Force_mapping, firmware):
+                summary = await BLE_Force_mapping.run_scripted_calibration(
+                    "protocol.json", apply_weight=lambda weight, step: rig.apply(weight, **step["references"]))
+            df = pd.read_csv("scripted_calibration.csv")
+            runs = pd.read_csv(BLE_Force_mapping.CALIBRATION_RUN_LOG)
+            record = CalibrationRegistry("calibration_registry.npz").get(firmware.address, "2.1.0")
+        finally:
+            os.chdir(working_dir)
+
+    per_weight = df.groupby("weight_g").size().to_dict()
+    ok = (per_weight == {0.0: 10, 50.0: 5, 150.0: 12} and summary["failed_steps"] == 0
+          and len(runs) == 1 and runs["devices_per_hour"].iloc[0] > 0
+          and record is not None and set(record.fits) == set(SENSOR_PAIRS) - {"pot_vs_extension"})
+    if record is not None and "pot_vs_angle" in record.fits:
+        fit = record.fits["pot_vs_angle"]
+        slope = float(fit.predict(60.0) - fit.predict(30.0)) / 30.0
+        ok = ok and abs(slope - rig.pot_per_deg) < 0.5
+    return ok, (f"{len(df)} rows in {summary['duration_s']}s, {summary['devices_per_hour']} devices/h (emulator time), "
+                f"registered {record}")
+
+
+async def scenario_calibration_resume():
+    """A calibration that crashes mid-protocol resumes after its last complete step."""
+    import BLE_Force_mapping
+    protocol = {
+        "output": "resumed_calibration.csv",
+        "defaults": {"samples": 5, "adaptive": False, "max_wait": 5},
+        "steps": [{"weight_g": 0}, {"weight_g": 50}, {"weight_g": 100}, {"weight_g": 150}],
+    }
+    rig = WeightRig(CALIBRATION_CSV)
+    firmware = host_firmware(waveform=rig)
+    BLE_Force_mapping.client = None
+    BLE_Force_mapping.CALIBRATION_REGISTRY = None
+    applied = []
+
+    def crashing_rig(weight, step):
+        if weight == 100:
+            raise RuntimeError("rig controller crashed")
+        applied.append(weight)
+        rig.apply(weight)
+
+    def working_rig(weight, step):
+        applied.append(weight)
+        rig.apply(weight)
+
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with open("protocol.json", "w") as f:
+                json.dump(protocol, f)
+            with fake_backend(BLE_Force_mapping, firmware):
+                try:
+                    await BLE_Force_mapping.run_scripted_calibration("protocol.json", apply_weight=crashing_rig)
+                    crashed = False
+                except RuntimeError:
+                    crashed = True
+                session_file = BLE_Force_mapping.session.path
+                with open(session_file, "a") as f:
+                    f.write("3,5,100.0,1712.5")  # Half-written row of the crashed step
+                await BLE_Force_mapping.run_scripted_calibration("protocol.json", apply_weight=working_rig)
+            df = pd.read_csv("resumed_calibration.csv")
+            session_left = os.path.exists(session_file)
+        finally:
+            os.chdir(working_dir)
+            BLE_Force_mapping.CALIBRATION_REGISTRY = "calibration_registry.npz"
+
+    per_weight = df.groupby("weight_g").size().to_dict()
+    ok = (crashed and applied == [0.0, 50.0, 100.0, 150.0] and not session_left
+          and per_weight == {0.0: 5, 50.0: 5, 100.0: 5, 150.0: 5})
+    return ok, f"weights applied {applied}, {len(df)} rows exported"
+
+
+async def scenario_converged_stop():
+    """A protocol with stop_when_converged ends once the live fit no longer moves."""
+    import BLE_Force_mapping
+    weights = [0, 50, 100, 150, 200] * 3
+    protocol = {
+        "output": "converged_calibration.csv",
+        "stop_when_converged": True,
+        "defaults": {"max_wait": 5},
+        "steps": [{"weight_g": w} for w in weights],
+    }
+    rig = WeightRig(CALIBRATION_CSV)
+    firmware = host_firmware(waveform=rig)
+    BLE_Force_mapping.client = None
+    BLE_Force_mapping.CALIBRATION_REGISTRY = None
+    applied = []
+
+    def apply(weight, step):
+        applied.append(weight)
+        rig.apply(weight)
+
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with open("protocol.json", "w") as f:
+                json.dump(protocol, f)
+            with fake_backend(BLE_Force_mapping, firmware):
+                await BLE_Force_mapping.run_scripted_calibration("protocol.json", apply_weight=apply)
+        finally:
+            os.chdir(working_dir)
+            BLE_Force_mapping.CALIBRATION_REGISTRY = "calibration_registry.npz"
+
+    live_fit = BLE_Force_mapping.live_fit
+    ok = live_fit.converged and len(applied) < len(weights)
+    return ok, (f"stopped after {len(applied)}/{len(weights)} steps, "
+                f"last change {', '.join(f'{c}: {v:.2g}' for c, v in live_fit.last_change.items())}")
+
+
+async def scenario_quick_check():
+    """A quick check passes on an unchanged device and asks for recalibration once the ToF has shifted."""
+    import BLE_Force_mapping
+    rig = WeightRig(CALIBRATION_CSV)
+    firmware = host_firmware(waveform=rig, firmware_version="2.1.0")
+    BLE_Force_mapping.client = None
+
+    working_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        BLE_Force_mapping.CALIBRATION_REGISTRY = "calibration_registry.npz"
+        try:
+            CalibrationRegistry("calibration_registry.npz").register_csv(firmware.address, "2.1.0", CALIBRATION_CSV)
+            with fake_backend(BLE_Force_mapping, firmware):
+                unchanged = await BLE_Force_mapping.run_quick_check(
+                    apply_weight=lambda weight, step: rig.apply(weight), offer_recalibration=False)
+                rig.tof_coeffs[-1] += 5.0  # Sensor moved: 5 mm more at every weight
+                shifted = await BLE_Force_mapping.run_quick_check(
+                    apply_weight=lambda weight, step: rig.apply(weight), offer_recalibration=False)
+            checks = pd.read_csv(BLE_Force_mapping.CALIBRATION_CHECK_LOG)
+        finally:
+            os.chdir(working_dir)
+
+    ok = not unchanged["recalibrate"] and shifted["recalibrate"] and len(checks) == 2
+    return ok, (f"unchanged: {unchanged['reason']} ({unchanged['duration_s']:.1f}s); "
+                f"shifted: {shifted['reason']}")
+
+
+SCENARIOS = [
+    scenario_uint16_frames,
+    scenario_intercept_end_to_end,
+    scenario_reconnect_storm,
+    scenario_high_rate,
+    scenario_calibration_end_to_end,
+    scenario_scripted_calibration,
+    scenario_calibration_resume,
+    scenario_converged_stop,
+    scenario_quick_check,
+]
+
+
+async def main():
+    failures = 0
+    for scenario in SCENARIOS:
+        start = time.perf_counter()
+        try:
+            ok, details = await scenario()
+        except Exception as e:
+            ok, details = False, f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - start
+        print(f"[{'PASS' if ok else 'FAIL'}] {scenario.__name__} ({elapsed:.1f}s): {details}")
+        failures += not ok
+    return failures
+
+
+if __name__ == "__main__":
+    # Runs without any radio, exits non-zero if a scenario fails (for CI)
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -1,5 +1,7 @@
 import asyncio
+import os
 import struct
+import sys
 import time
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
@@ -8,6 +10,15 @@ from collections import deque
 import numpy as np
 import warnings
 
+# Spectral engine and force fusion shared with the offline analysis tools
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(REPO_DIR, 'DataAnalysis', 'SignalProcessing'))
+from spectral_analysis import StreamingSpectralAnalyzer, LIVE_SAMPLE_RATE_HZ
+from force_fusion import ForceFusionFilter
+from force_prediction import AlphaBetaPredictor, ForcePredictionStage
+sys.path.append(os.path.join(REPO_DIR, 'DataAnalysis', 'ForceMapper'))
+from calibration_registry import REGISTRY_FILE, lookup_calibration, read_firmware_version
+
 # Suppress the specific warning about cache_frame_data
 warnings.filterwarnings("ignore", category=UserWarning, 
                         message=".*frames=None.*cache_frame_data=True.*")
@@ -21,12 +32,61 @@ CHARACTERISTIC_UUID = "2d8e1b65-9d11-43ea-b0f5-c51cb352ddfa"
 # Buffer size for plotting (how many data points to keep)
 BUFFER_SIZE = 100
 
+# Live tremor-band power and smoothness of the FSR and POT channels
+SPECTRAL_ANALYSIS = True
+
+# Calibration used to fuse FSR and ToF into one force estimate (set to None to disable)
+FUSION_CALIBRATION_CSV = os.path.join(REPO_DIR, 'DataAnalysis', 'ForceMapper', 'Real_calibration_data_ble.csv')
+
+# Per-device calibrations written by BLE_Force_mapping.py; a registered device uses its own
+# calibration instead of FUSION_CALIBRATION_CSV (None to always use the CSV)
+CALIBRATION_REGISTRY = REGISTRY_FILE
+
+# Forecast the force for "now" to hide send_delay + connection interval latency (None to disable).
+# Check force_prediction.py on recorded sessions first: for step-like grips holding the last
+# value can be more accurate than extrapolating.
+PREDICTION_HORIZON_S = None
+
 # Initialize the data buffers (deques are efficient for this purpose)
 timestamps = deque(maxlen=BUFFER_SIZE)
 fsr_values = deque(maxlen=BUFFER_SIZE)
 pot_values = deque(maxlen=BUFFER_SIZE)
 tof_values = deque(maxlen=BUFFER_SIZE)
 
+# Sliding-window spectral analysis of the live stream (publishes once per window hop)
+spectral_analyzer = StreamingSpectralAnalyzer(channels=("FSR", "POT"), fs=LIVE_SAMPLE_RATE_HZ) if SPECTRAL_ANALYSIS else None
+
+def print_band_power(result):
+    fsr_tremor = result["band_power"][-1, 0, list(spectral_analyzer.bands).index("tremor")]
+    pot_smoothness = result["smoothness"][-1, 1]
+    print(f"Spectral: FSR tremor power={fsr_tremor:.2f}, POT smoothness={pot_smoothness:.2f}")
+
+if spectral_analyzer is not None:
+    spectral_analyzer.subscribe(print_band_power)
+
+# Kalman fusion of FSR and ToF into a single weight (force) channel in grams
+force_filter = ForceFusionFilter.from_calibration_csv(FUSION_CALIBRATION_CSV) if FUSION_CALIBRATION_CSV else None
+
+def use_registered_calibration(address, firmware):
+    """Switches the fusion filter to the device's registered calibration, if there is a usable one."""
+    global force_filter
+    if force_filter is None or not CALIBRATION_REGISTRY:
+        return
+    record = lookup_calibration(address, firmware, path=CALIBRATION_REGISTRY)
+    if record is None:
+        return
+    try:
+        force_filter = ForceFusionFilter.from_calibration_record(record)
+        print(f"Using calibration v{record.version} of {record.address} (firmware {record.firmware})")
+    except ValueError as e:
+        print(f"Registered calibration not usable for fusion ({e}), keeping the default calibration")
+
+# Short-horizon prediction of the force (fused force if available, FSR otherwise)
+force_prediction = None
+if PREDICTION_HORIZON_S is not None:
+    force_prediction = ForcePredictionStage(AlphaBetaPredictor(1.0 / LIVE_SAMPLE_RATE_HZ, alpha=0.8),
+                                            horizon_s=PREDICTION_HORIZON_S)
+
 # Initialize the figure and axes globally
 fig = plt.figure(figsize=(12, 8))
 ax1 = fig.add_subplot(3, 1, 1)
@@ -96,9 +156,20 @@ def notification_handler(sender, data):
         fsr_values.append(min(fsr_value, 4095))  # Cap at 4095 to match ADC range
         pot_values.append(min(pot_value, 4095))  # Cap at 4095 to match ADC range
         tof_values.append(min(tof_value_cm, 50))  # Cap at 30cm
+
+        if spectral_analyzer is not None:
+            spectral_analyzer.push([fsr_value, pot_value], [current_time])
         
         # Print the values (optional)
-        print(f"Time: {current_time:.2f}s, FSR: {fsr_value:.1f}, POT: {pot_value:.1f}, TOF: {tof_value_cm:.2f}cm")
+        force_text = ""
+        force_value = fsr_value
+        if force_filter is not None:
+            force_value = force_filter.update(fsr_value, tof_value)
+            force_text = f", Force: {force_value:.1f}g"
+        if force_prediction is not None:
+            forecast, confidence = force_prediction.update(force_value, current_time)
+            force_text += f", Forecast(+{PREDICTION_HORIZON_S * 1e3:.0f}ms): {forecast:.1f} (confidence {confidence:.2f})"
+        print(f"Time: {current_time:.2f}s, FSR: {fsr_value:.1f}, POT: {pot_value:.1f}, TOF: {tof_value_cm:.2f}cm{force_text}")
         
     except struct.error as e:
         print(f"Error unpacking data: {e}")
@@ -165,13 +236,14 @@ async def connect_and_read():
             if client.is_connected:
                 print(f"Connected to {device.name}")
                 connected = True
+                use_registered_calibration(device.address, await read_firmware_version(client))
                 
                 # Subscribe to notifications
                 await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
                 print("Subscribed to notifications. Waiting for data...")
                 
-                # Keep the connection alive
-                while connected and animation_running:
+                # Keep the connection alive until we stop or the device drops the link
+                while connected and animation_running and client.is_connected:
                     await asyncio.sleep(0.01)
                 
                 # If we exited the loop but client is still connected, disconnect
@@ -179,6 +251,9 @@ async def connect_and_read():
                     await client.stop_notify(CHARACTERISTIC_UUID)
                     await client.disconnect()
                     print("Disconnected from device")
+                else:
+                    print("Device dropped the connection. Reconnecting...")
+                connected = False
             else:
                 print("Failed to connect to device")
                 await asyncio.sleep(2)
@@ -1,11 +1,22 @@
+import argparse
 import asyncio
+import json
+import os
 import struct
+import sys
+import threading
 import time
 import pandas as pd
-import matplotlib.pyplot as plt
 from bleak import BleakClient, BleakScanner
-import numpy as np
-from scipy.optimize import curve_fit
+from stabilization import PlateauDetector
+from adaptive_sampling import AdaptiveSampler, MAX_SAMPLES, MIN_SAMPLES
+from live_fit import LiveFitPreview
+from calibration_fitting import POT_REFERENCES, fit_calibration_batch, summary_table
+from calibration_bootstrap import bootstrap_calibration
+from calibration_report import write_calibration_report
+from calibration_session import CalibrationSession, sample_rows, session_path
+from calibration_registry import REGISTRY_FILE, UNKNOWN_FIRMWARE, load_registry, read_firmware_version
+from calibration_check import CHECK_WEIGHTS, check_readings, needs_recalibration
 
 # --- Configuration ---
 DEVICE_NAME = "ReCover"  # Name of your ESP32 BLE device
@@ -15,37 +26,64 @@ CHARACTERISTIC_UUID = "2d8e1b65-9d11-43ea-b0f5-c51cb352ddfa"
 
 # Calibration specific settings
 NUM_DATAPOINTS_PER_WEIGHT = 5 # Number of readings to take for each weight (between 3 and 7)
+ADAPTIVE_SAMPLING = True    # Collect until the standard error of the mean reaches its target (see adaptive_sampling.py)
+MIN_DATAPOINTS_PER_WEIGHT = MIN_SAMPLES # Bounds of the adaptive sample count
+MAX_DATAPOINTS_PER_WEIGHT = MAX_SAMPLES
 STABILIZATION_DELAY = 2     # Seconds to wait for readings to stabilize after applying weight
+USE_PLATEAU_DETECTION = True # Start collecting as soon as FSR and ToF have settled instead of waiting STABILIZATION_DELAY
+MAX_STABILIZATION_WAIT = 10 # Seconds to wait for a plateau before collecting anyway
+SAMPLE_TIMEOUT = 10         # Seconds to wait for the samples of one weight before giving up
+SAMPLE_QUEUE_SIZE = 256     # Frames kept while nobody is collecting (oldest are dropped)
+POT_REFERENCE = "angle_deg" # Reference the operator enters for the potentiometer: "angle_deg" (finger) or "extension_mm" (rope)
+
+# Scripted calibration (--protocol): per-step settings a protocol file can override
+PROTOCOL_DEFAULTS = {
+    "samples": NUM_DATAPOINTS_PER_WEIGHT,
+    "min_samples": None,        # Defaults to samples (to the adaptive minimum for adaptive steps)
+    "adaptive": ADAPTIVE_SAMPLING,
+    "max_samples": MAX_DATAPOINTS_PER_WEIGHT,
+    "stabilization": "plateau",
+    "max_wait": 30,             # Unattended: time the operator has to swap the weight
+    "settle_delay": STABILIZATION_DELAY,
+    "require_plateau": True,
+    "retries": 1,
+    "confirm": False,
+}
+CALIBRATION_RUN_LOG = "calibration_runs.csv" # One row per scripted run, for devices-per-hour tracking
+CALIBRATION_REGISTRY = REGISTRY_FILE # Registry the fitted models are stored in per device (None to disable)
+CALIBRATION_CHECK_LOG = "calibration_checks.csv" # One row per quick check (--check)
+SIMULATED_ADDRESS = "5E:ED:00:00:00:01" # Fixed address of the emulated device, so --simulate runs share a registry entry
 
 # --- Global Data Buffer for Calibration ---
 calibration_data = [] # List of dictionaries to store collected calibration data
+session = None # CalibrationSession every completed step is appended to (crash-safe, resumable)
+live_fit = None # LiveFitPreview of the curves so far, updated with every recorded sample
 
 # --- Global Control Flags and Objects ---
 connected = False
 client = None
-current_calibration_samples = [] # Temporary buffer for samples during a single weight measurement
-
-# --- Functions for Curve Fitting ---
-# Define a polynomial function (e.g., quadratic) for fitting
-def quadratic_func(x, a, b, c):
-    return a * x**2 + b * x + c
+device_address = None # Address of the device being calibrated
+firmware_version = UNKNOWN_FIRMWARE # Its Firmware Revision String, if it exposes one
+sample_queue = None # asyncio.Queue the notification handler pushes decoded frames to
 
 # --- Notification Callback Function ---
 # This function is called every time the ESP32 sends a BLE notification
 def notification_handler(sender, data):
-    global current_calibration_samples
-
     try:
         # Unpack the bytes into three floats (FSR, POT, TOF)
         # ESP32 sends FSR, POT, TOF as floats
         fsr_value, pot_value, tof_value_mm = struct.unpack('<fff', data)
 
-        # In calibration mode, collect samples to a temporary buffer
-        current_calibration_samples.append({
-            "fsr_value": fsr_value,
-            "tof_distance_mm": tof_value_mm
-        })
-        print(f"Calibrating: FSR={fsr_value:.1f}, ToF={tof_value_mm:.2f}mm (Sample {len(current_calibration_samples)})")
+        # Hand the frame to the collector; bleak calls this handler on the event loop thread
+        if sample_queue is not None:
+            if sample_queue.full():
+                sample_queue.get_nowait() # Drop the oldest frame rather than blocking the handler
+            sample_queue.put_nowait({
+                "fsr_value": fsr_value,
+                "tof_distance_mm": tof_value_mm,
+                "pot_value": pot_value
+            })
+        print(f"Calibrating: FSR={fsr_value:.1f}, ToF={tof_value_mm:.2f}mm, POT={pot_value:.1f}")
 
     except struct.error as e:
         print(f"Error unpacking data: {e}")
@@ -55,7 +93,7 @@ def notification_handler(sender, data):
 
 # --- Async Function to Connect to Device ---
 async def connect_to_device():
-    global connected, client
+    global connected, client, device_address, firmware_version
 
     if client and client.is_connected:
         return True # Already connected
@@ -71,6 +109,7 @@ async def connect_to_device():
         return False
 
     print(f"Found device: {device.name} ({device.address})")
+    device_address = device.address
 
     try:
         client = BleakClient(device, timeout=20.0) # Increased timeout for connection
@@ -79,8 +118,9 @@ async def connect_to_device():
         if client.is_connected:
             print(f"Connected to {device.name}")
             connected = True
+            firmware_version = await read_firmware_version(client)
             await client.start_notify(CHARACTERISTIC_UUID, notification_handler)
-            print("Subscribed to notifications.")
+            print(f"Subscribed to notifications (firmware {firmware_version}).")
             return True
         else:
             print("Failed to connect to device.")
@@ -108,67 +148,313 @@ async def disconnect_from_device():
             connected = False
             client = None
 
+# --- Sample Collection ---
+async def collect_samples(num_samples, timeout=SAMPLE_TIMEOUT, sampler=None):
+    """
+    Awaits the next num_samples frames from the notification handler.
+
+    Frames that arrived before the call (e.g. during stabilization) are discarded first.
+    Returns as soon as enough frames exist, or with fewer samples once the deadline passes.
+
+    Args:
+        num_samples (int): Number of frames to collect (at most, with a sampler).
+        timeout (float): Deadline in seconds for the whole collection.
+        sampler (AdaptiveSampler): Stops the collection once it has enough frames.
+
+    Returns:
+        list: Collected samples (dicts with 'fsr_value' and 'tof_distance_mm').
+    """
+    while not sample_queue.empty():
+        sample_queue.get_nowait()
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    samples = []
+    while len(samples) < num_samples:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            samples.append(await asyncio.wait_for(sample_queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+        if sampler is None:
+            print(f"  Collected sample {len(samples)}/{num_samples}")
+            continue
+        done = sampler.update(samples[-1])
+        print(f"  Collected sample {len(samples)} (standard error: {sampler.describe()})")
+        if done:
+            break
+    return samples
+
+async def wait_for_plateau(previous_level=None, max_wait=MAX_STABILIZATION_WAIT):
+    """
+    Watches the live frames until FSR and ToF have settled (see stabilization.PlateauDetector).
+
+    Args:
+        previous_level (dict): Plateau level of the previous weight, the signal must leave it first.
+        max_wait (float): Seconds after which to give up waiting.
+
+    Returns:
+        tuple: (settled (bool), PlateauDetector)
+    """
+    while not sample_queue.empty():
+        sample_queue.get_nowait()
+
+    detector = PlateauDetector(previous_level)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return False, detector
+        try:
+            sample = await asyncio.wait_for(sample_queue.get(), remaining)
+        except asyncio.TimeoutError:
+            return False, detector
+        if detector.update(sample):
+            return True, detector
+
+# --- Operator Prompts ---
+def read_operator_line(prompt=""):
+    """
+    input() on the stdin file descriptor.
+
+    A thread blocked inside sys.stdin holds its lock and aborts the interpreter at exit, one
+    blocked in os.read does not, so the prompt thread of ainput can simply be abandoned.
+    """
+    print(prompt, end="", flush=True)
+    line = b""
+    while not line.endswith(b"\n"):
+        char = os.read(sys.stdin.fileno(), 1)
+        if not char:
+            if not line:
+                raise EOFError("stdin closed")
+            break
+        line += char
+    return line.decode(errors="replace").rstrip("\r\n")
+
+async def ainput(prompt=""):
+    """
+    Asks the operator without blocking the event loop, so BLE notifications keep being
+    queued (and the link kept alive) while the prompt is waiting for an answer.
+
+    The line is read in a daemon thread, not in the default executor: asyncio.run waits for the
+    executor on shutdown, so Ctrl-C (which cancels the awaiting task) would hang until Enter.
+    """
+    loop = asyncio.get_running_loop()
+    answer = loop.create_future()
+
+    def deliver(set_answer):
+        try:
+            loop.call_soon_threadsafe(lambda: answer.done() or set_answer())
+        except RuntimeError:  # The loop is already closed, nobody waits for the answer
+            pass
+
+    def read():
+        try:
+            line = read_operator_line(prompt)
+        except Exception as e:  # EOFError when stdin is closed
+            deliver(lambda e=e: answer.set_exception(e))
+        else:
+            deliver(lambda: answer.set_result(line))
+
+    threading.Thread(target=read, name="operator-prompt", daemon=True).start()
+    return await answer
+
+# --- Calibration Step ---
+async def measure_weight_step(weight, previous_level=None, num_samples=NUM_DATAPOINTS_PER_WEIGHT,
+                              stabilization="plateau", max_wait=MAX_STABILIZATION_WAIT,
+                              settle_delay=STABILIZATION_DELAY, adaptive=False):
+    """
+    Waits until the applied weight has settled, then collects its samples.
+
+    Args:
+        weight (float): Applied weight in grams, named in the progress messages (the samples are
+            tagged with it when they are recorded, see record_samples).
+        previous_level (dict): Plateau level of the previous (different) weight, or None.
+        num_samples (int): Number of frames to collect, the maximum if adaptive.
+        stabilization (str): 'plateau' to wait for the readings to settle, 'fixed' to wait settle_delay.
+        max_wait (float): Seconds to wait for a plateau before collecting anyway.
+        settle_delay (float): Seconds to wait in 'fixed' mode.
+        adaptive (bool): Stop as soon as the standard errors reach their targets (see adaptive_sampling.py).
+
+    Returns:
+        tuple: (samples (list), stabilization time (float), plateau level (dict) or None if not settled)
+    """
+    start_stabilization_time = time.perf_counter()
+    level = None
+    if stabilization == "plateau":
+        print(f"Waiting for the readings at {weight:g}g to settle...")
+        settled, detector = await wait_for_plateau(previous_level, max_wait)
+        if settled:
+            level = detector.level()
+            print(f"  Settled after {time.perf_counter() - start_stabilization_time:.2f}s ({detector.frames_seen} frames)")
+        else:
+            print(f"  No plateau at {weight:g}g within {max_wait}s, collecting anyway.")
+    else:
+        print(f"Waiting {settle_delay} seconds for {weight:g}g to stabilize...")
+        await asyncio.sleep(settle_delay)
+    stabilization_time = time.perf_counter() - start_stabilization_time
+
+    start_sample_time = time.perf_counter()
+    sampler = AdaptiveSampler(min_samples=MIN_DATAPOINTS_PER_WEIGHT, max_samples=num_samples) if adaptive else None
+    samples = await collect_samples(num_samples, sampler=sampler)
+    print(f"  Sample capture took {time.perf_counter() - start_sample_time:.2f}s")
+    if sampler is not None and sampler.done and not sampler.reached_target:
+        print(f"  Standard error target not reached with {num_samples} samples ({sampler.describe()}).")
+    if len(samples) < num_samples and (sampler is None or not sampler.done):
+        print(f"  Timeout: Not enough samples received for {weight:g}g ({len(samples)}/{num_samples}). "
+              "Check ESP32 output.")
+    return samples, stabilization_time, level
+
+def record_samples(weight, samples, step=None, references=None):
+    """
+    Adds the samples of one step to calibration_data, appends them to the session file and
+    shows the live fit.
+
+    Args:
+        weight (float): Applied weight in grams (reference of FSR and ToF).
+        samples (list): Decoded frames (fsr_value, tof_distance_mm, pot_value).
+        step (int): Step number for the session file.
+        references (dict): POT reference of the step, e.g. {'angle_deg': 30.0}; all channels of a
+            frame are recorded together, so one pass calibrates force and finger extension.
+    """
+    if session is not None:
+        session.append_step(weight, samples, step, references)
+    calibration_data.extend(sample_rows(weight, samples, references))
+    for sample in samples:
+        if live_fit is not None:
+            live_fit.update(weight, sample)
+    if live_fit is not None:
+        live_fit.step_done()
+        print("  Live fit:")
+        for line in live_fit.describe():
+            print(f"    {line}")
+
+# --- Session Recovery ---
+async def open_session(protocol_steps=None):
+    """
+    Opens the session file of the connected device and resumes an interrupted calibration.
+
+    Interactive calibrations ask before resuming. Scripted ones resume automatically if the
+    recorded steps match the protocol, and start over otherwise.
+
+    Args:
+        protocol_steps (list): Resolved protocol steps, None for the interactive mode.
+
+    Returns:
+        int: Number of the last step already completed (0 for a new calibration).
+    """
+    global session, calibration_data, live_fit
+
+    session = CalibrationSession(session_path(device_address))
+    calibration_data = list(session.rows)
+    live_fit = LiveFitPreview()
+    live_fit.update_many(calibration_data)
+    if session.recovered_bytes:
+        print(f"Dropped an incomplete step ({session.recovered_bytes} bytes) from {session.path}")
+    if not session.steps:
+        return 0
+
+    done = ", ".join(f"{weight:g}g" for _, weight in session.steps)
+    print(f"Found an interrupted calibration in {session.path}: {len(session.steps)} steps done ({done})")
+    if protocol_steps is None:
+        answer = await ainput("Resume it? [Y/n]: ")
+        resume = answer.strip().lower() not in ("n", "no")
+    else:
+        resume = all(number <= len(protocol_steps) and protocol_steps[number - 1]["weight_g"] == weight
+                     for number, weight in session.steps)
+        if not resume:
+            print("The recorded steps do not match this protocol.")
+    if not resume:
+        print("Starting a new calibration.")
+        session.discard()
+        calibration_data = []
+        live_fit = LiveFitPreview()
+        return 0
+    print(f"Resuming after step {session.steps[-1][0]}.")
+    return session.steps[-1][0]
+
 # --- Calibration Mode Function ---
 async def run_calibration_mode():
-    global current_calibration_samples, calibration_data
+    global calibration_data, sample_queue
 
     print("\n--- Starting Calibration Data Collection ---")
     print("Please follow the prompts to collect data for different weights.")
 
+    sample_queue = asyncio.Queue(maxsize=SAMPLE_QUEUE_SIZE)
+    calibration_start_time = time.perf_counter()
+    stabilization_times = []
+    previous_weight, previous_level = None, None
+
     # Ensure connection before starting calibration
     if not await connect_to_device():
         print("Failed to connect to device. Cannot start calibration.")
         return
+    try:
+        await open_session()
+    except asyncio.CancelledError:
+        await disconnect_from_device()
+        raise
+    measured_weights = {weight for _, weight in session.steps}
 
     while True:
         try:
-            weight_input = input("\nEnter the applied weight in grams (e.g., 0, 50, 100) or 'd' when done: ")
+            weight_input = await ainput(f"\nEnter the applied weight in grams and optionally the {POT_REFERENCE} "
+                                        f"(e.g., 50 or 50 30) or 'd' when done: ")
             if weight_input.lower() == 'd':
                 break
 
             try:
-                current_weight = float(weight_input)
+                values = [float(v) for v in weight_input.replace(",", " ").split()]
+                if not 1 <= len(values) <= 2:
+                    raise ValueError
+                current_weight = values[0]
+                references = {POT_REFERENCE: values[1]} if len(values) == 2 else None
                 if current_weight < 0:
                     print("Weight cannot be negative. Please enter a positive value or 0.")
                     continue
             except ValueError:
-                print("Invalid input. Please enter a number or 'd'.")
+                print("Invalid input. Please enter a weight, optionally followed by the POT reference, or 'd'.")
                 continue
+            if current_weight in measured_weights and references is None:
+                answer = await ainput(f"{current_weight}g has already been measured. Measure it again? [y/N]: ")
+                if answer.strip().lower() not in ("y", "yes"):
+                    continue
 
-            print(f"\n--- Collecting {NUM_DATAPOINTS_PER_WEIGHT} data points for {current_weight}g ---")
+            if ADAPTIVE_SAMPLING:
+                print(f"\n--- Collecting up to {MAX_DATAPOINTS_PER_WEIGHT} data points for {current_weight}g ---")
+            else:
+                print(f"\n--- Collecting {NUM_DATAPOINTS_PER_WEIGHT} data points for {current_weight}g ---")
             print(f"Apply {current_weight}g to the elastic band and ensure it's stable.")
-            print(f"Waiting {STABILIZATION_DELAY} seconds for stabilization...")
-            await asyncio.sleep(STABILIZATION_DELAY)
-
-            current_calibration_samples = [] # Clear buffer for new weight
-            samples_collected = 0
-            start_sample_time = time.time()
-
-            while samples_collected < NUM_DATAPOINTS_PER_WEIGHT:
-                # The notification_handler will automatically append to current_calibration_samples
-                # We just need to wait for enough samples
-                await asyncio.sleep(0.1) # Wait for a short period for a notification
-                if len(current_calibration_samples) > samples_collected:
-                    print(f"  Collected sample {len(current_calibration_samples)}/{NUM_DATAPOINTS_PER_WEIGHT}")
-                    samples_collected = len(current_calibration_samples)
-                # Add a timeout to prevent infinite waiting if data stops
-                if time.time() - start_sample_time > 10: # 10 second timeout
-                    print("  Timeout: Not enough samples received. Check ESP32 output.")
-                    break
-
-            if samples_collected > 0:
+            if references:
+                print(f"Hold the potentiometer at {POT_REFERENCE} = {references[POT_REFERENCE]:g}.")
+            # A new weight must visibly move the signal; a repeated weight only has to be stable
+            samples, stabilization_time, level = await measure_weight_step(
+                current_weight,
+                previous_level if current_weight != previous_weight else None,
+                num_samples=MAX_DATAPOINTS_PER_WEIGHT if ADAPTIVE_SAMPLING else NUM_DATAPOINTS_PER_WEIGHT,
+                stabilization="plateau" if USE_PLATEAU_DETECTION else "fixed",
+                adaptive=ADAPTIVE_SAMPLING)
+            stabilization_times.append(stabilization_time)
+            if level is not None:
+                previous_weight, previous_level = current_weight, level
+
+            if samples:
                 # Add collected samples to the main calibration_data list
-                for sample in current_calibration_samples:
-                    calibration_data.append({
-                        "weight_g": current_weight,
-                        "fsr_value": sample["fsr_value"],
-                        "tof_distance_mm": sample["tof_distance_mm"]
-                    })
-                print(f"  Successfully collected {samples_collected} samples for {current_weight}g.")
+                record_samples(current_weight, samples, references=references)
+                measured_weights.add(current_weight)
+                print(f"  Successfully collected {len(samples)} samples for {current_weight}g.")
+                if live_fit.converged:
+                    print("  The calibration curve has converged, enter 'd' to finish.")
             else:
                 print(f"  No valid data collected for {current_weight}g. Please re-check setup.")
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # asyncio.run turns Ctrl-C into a cancellation of this task: keep it running so the
+            # device is disconnected and the samples collected so far are saved
+            asyncio.current_task().uncancel()
             print("\nCalibration interrupted by user.")
             break
         except Exception as e:
@@ -176,99 +462,347 @@ async def run_calibration_mode():
 
     print("\n--- Calibration Data Collection Complete ---")
 
-    await disconnect_from_device() # Disconnect after calibration
-
-    if calibration_data:
-        df = pd.DataFrame(calibration_data)
-        print("\nCollected Calibration Data:")
-        print(df)
-
-        # Save data to CSV
-        output_filename = "calibration_data_ble.csv"
-        df.to_csv(output_filename, index=False)
-        print(f"\nData saved to {output_filename}")
-
-        # --- Plotting ---
-        print("\nGenerating plots...")
-
-        plt.style.use('seaborn-v0_8-darkgrid') # Modern and clean style
-        # plt.rcParams['font.family'] = 'Inter' # Set font to Inter
+    # Compare against the fixed STABILIZATION_DELAY protocol
+    total_time = time.perf_counter() - calibration_start_time
+    waited = sum(stabilization_times)
+    fixed_delay_wait = len(stabilization_times) * STABILIZATION_DELAY
+    print(f"Stabilization wait: {waited:.1f}s over {len(stabilization_times)} steps "
+          f"(fixed {STABILIZATION_DELAY}s delay: {fixed_delay_wait:.1f}s)")
+    print(f"Total calibration time: {total_time:.1f}s "
+          f"(with the fixed delay: {total_time - waited + fixed_delay_wait:.1f}s)")
 
-        # Plot 1: FSR vs. Weight0
-        plt.figure(figsize=(10, 6))
-        plt.scatter(df['weight_g'], df['fsr_value'], color='blue', label='Data Points', alpha=0.7)
-        plt.title('FSR Value vs. Applied Weight', fontsize=16)
-        plt.xlabel('Applied Weight (g)', fontsize=12)
-        plt.ylabel('FSR Analog Value (0-4095)', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.6)
+    await disconnect_from_device() # Disconnect after calibration
 
-        try:
-            popt_fsr, pcov_fsr = curve_fit(quadratic_func, df['weight_g'], df['fsr_value'])
-            x_fit_fsr = np.linspace(df['weight_g'].min(), df['weight_g'].max(), 100)
-            y_fit_fsr = quadratic_func(x_fit_fsr, *popt_fsr)
-            r_squared_fsr = np.corrcoef(df["fsr_value"], quadratic_func(df["weight_g"], *popt_fsr))[0, 1]**2
-            plt.plot(x_fit_fsr, y_fit_fsr, color='red', linestyle='--', label=f'Quadratic Fit ($R^2$: {r_squared_fsr:.2f})')
-            print(f"FSR vs. Weight Quadratic Fit: a={popt_fsr[0]:.4e}, b={popt_fsr[1]:.4e}, c={popt_fsr[2]:.4e}, R^2={r_squared_fsr:.2f}")
-        except RuntimeError:
-            print("Could not fit quadratic curve for FSR vs. Weight. Plotting without fit.")
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
-
-        # Plot 2: ToF Distance vs. Weight
-        plt.figure(figsize=(10, 6))
-        plt.scatter(df['weight_g'], df['tof_distance_mm'], color='green', label='Data Points', alpha=0.7)
-        plt.title('ToF Distance vs. Applied Weight', fontsize=16)
-        plt.xlabel('Applied Weight (g)', fontsize=12)
-        plt.ylabel('ToF Distance (mm)', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.6)
+    save_and_plot_calibration(calibration_data)
+    session.finish()
+
+# --- Scripted (unattended) Calibration ---
+def load_protocol(protocol_path):
+    """
+    Reads a calibration protocol (JSON).
+
+    The protocol lists the weights to apply in order; every step inherits the "defaults" and may
+    override them:
+        samples (int): Frames to collect for the weight (fixed-count steps).
+        adaptive (bool): Collect until the standard errors reach their targets instead.
+        max_samples (int): Frames to collect at most on adaptive steps.
+        min_samples (int): Fewer frames than this count as a failed attempt.
+        stabilization (str): 'plateau' or 'fixed'.
+        max_wait (float): Seconds to wait for a plateau.
+        settle_delay (float): Seconds to wait in 'fixed' mode.
+        require_plateau (bool): A step that did not settle counts as a failed attempt.
+        retries (int): Extra attempts for a failed step before moving on (the samples of a step
+            that fails every attempt are not recorded).
+        confirm (bool): Wait for the operator to press Enter after the weight announcement.
+    A step may also give the potentiometer reference ("angle_deg" or "extension_mm"), so the
+    same pass calibrates the POT alongside FSR and ToF.
+    At the top level, "stop_when_converged" ends the run early once the live fit is stable
+    (see live_fit.py).
+
+    Returns:
+        dict: Protocol with a fully resolved list of steps.
+    """
+    with open(protocol_path) as f:
+        protocol = json.load(f)
+
+    defaults = dict(PROTOCOL_DEFAULTS, **protocol.get("defaults", {}))
+    steps = []
+    for i, step in enumerate(protocol.get("steps", [])):
+        if "weight_g" not in step or float(step["weight_g"]) < 0:
+            raise ValueError(f"Protocol step {i + 1} needs a non-negative 'weight_g'")
+        unknown = set(step) - set(defaults) - {"weight_g"} - set(POT_REFERENCES)
+        if unknown:
+            raise ValueError(f"Protocol step {i + 1} has unknown keys: {sorted(unknown)}")
+        resolved = dict(defaults, **step)
+        resolved["weight_g"] = float(resolved["weight_g"])
+        resolved["references"] = {ref: float(step[ref]) for ref in POT_REFERENCES if step.get(ref) is not None}
+        count = resolved["max_samples"] if resolved["adaptive"] else resolved["samples"]
+        default_min = min(MIN_DATAPOINTS_PER_WEIGHT, count) if resolved["adaptive"] else count
+        resolved["min_samples"] = min(resolved["min_samples"] or default_min, count)
+        if resolved["stabilization"] not in ("plateau", "fixed"):
+            raise ValueError(f"Protocol step {i + 1}: stabilization must be 'plateau' or 'fixed'")
+        steps.append(resolved)
+    if not steps:
+        raise ValueError(f"Protocol {protocol_path} has no steps")
+
+    protocol["steps"] = steps
+    protocol.setdefault("output", "calibration_data_ble.csv")
+    protocol.setdefault("plots", False)
+    protocol.setdefault("stop_when_converged", False)
+    return protocol
+
+async def announce_weight(weight, step):
+    """Default apply_weight callback: tells the operator which weight to hang on the band."""
+    print(f"\n>>> Apply {weight:g}g to the elastic band.")
+    for reference, value in step["references"].items():
+        print(f">>> Hold the potentiometer at {reference} = {value:g}.")
+    if step["confirm"]:
+        await ainput("Press Enter once the weight is hanging: ")
+
+async def run_scripted_calibration(protocol_path, apply_weight=announce_weight):
+    """
+    Runs a calibration protocol without interactive weight entry.
+
+    With stabilization 'plateau' the script notices by itself when the announced weight has been
+    applied (the readings leave the previous plateau and settle again), so the operator only swaps
+    weights. A motorised rig or the emulator passes its own apply_weight coroutine or function.
+
+    Args:
+        protocol_path (str): JSON protocol (see load_protocol).
+        apply_weight (callable): Called as apply_weight(weight_g, step) before each step; may be async.
+
+    Returns:
+        dict: Run summary (steps, failed steps, samples, duration_s, devices_per_hour), or None if
+              the device could not be reached.
+    """
+    global calibration_data, sample_queue
+
+    protocol = load_protocol(protocol_path)
+    steps = protocol["steps"]
+    print(f"\n--- Scripted Calibration: {protocol_path} ({len(steps)} steps) ---")
+
+    calibration_data = []
+    sample_queue = asyncio.Queue(maxsize=SAMPLE_QUEUE_SIZE)
+    calibration_start_time = time.perf_counter()
 
-        try:
-            popt_tof, pcov_tof = curve_fit(quadratic_func, df['weight_g'], df['tof_distance_mm'])
-            x_fit_tof = np.linspace(df['weight_g'].min(), df['weight_g'].max(), 100)
-            y_fit_tof = quadratic_func(x_fit_tof, *popt_tof)
-            r_squared_tof = np.corrcoef(df["tof_distance_mm"], quadratic_func(df["weight_g"], *popt_tof))[0, 1]**2
-            plt.plot(x_fit_tof, y_fit_tof, color='orange', linestyle='--', label=f'Quadratic Fit ($R^2$: {r_squared_tof:.2f})')
-            print(f"ToF vs. Weight Quadratic Fit: a={popt_tof[0]:.4e}, b={popt_tof[1]:.4e}, c={popt_tof[2]:.4e}, R^2={r_squared_tof:.2f}")
-        except RuntimeError:
-            print("Could not fit quadratic curve for ToF vs. Weight. Plotting without fit.")
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
-
-        # Plot 3: FSR vs. ToF
-        plt.figure(figsize=(10, 6))
-        plt.scatter(df['tof_distance_mm'], df['fsr_value'], color='purple', label='Data Points', alpha=0.7)
-        plt.title('FSR Value vs. ToF Distance', fontsize=16)
-        plt.xlabel('ToF Distance (mm)', fontsize=12)
-        plt.ylabel('FSR Analog Value (0-4095)', fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.6)
+    if not await connect_to_device():
+        print("Failed to connect to device. Cannot start calibration.")
+        return None
 
-        try:
-            popt_fsr_tof, pcov_fsr_tof = curve_fit(quadratic_func, df['tof_distance_mm'], df['fsr_value'])
-            x_fit_fsr_tof = np.linspace(df['tof_distance_mm'].min(), df['tof_distance_mm'].max(), 100)
-            y_fit_fsr_tof = quadratic_func(x_fit_fsr_tof, *popt_fsr_tof)
-            r_squared_fsr_tof = np.corrcoef(df["fsr_value"], quadratic_func(df["tof_distance_mm"], *popt_fsr_tof))[0, 1]**2
-            plt.plot(x_fit_fsr_tof, y_fit_fsr_tof, color='brown', linestyle='--', label=f'Quadratic Fit ($R^2$: {r_squared_fsr_tof:.2f})')
-            print(f"FSR vs. ToF Quadratic Fit: a={popt_fsr_tof[0]:.4e}, b={popt_fsr_tof[1]:.4e}, c={popt_fsr_tof[2]:.4e}, R^2={r_squared_fsr_tof:.2f}")
-        except RuntimeError:
-            print("Could not fit quadratic curve for FSR vs. ToF. Plotting without fit.")
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
+    previous_weight, previous_level = None, None
+    failed_steps = []
+    try:
+        resume_after = await open_session(steps)
+        for number, step in enumerate(steps, start=1):
+            if number <= resume_after:
+                continue
+            weight = step["weight_g"]
+            count = f"up to {step['max_samples']}" if step["adaptive"] else step["samples"]
+            print(f"\n--- Step {number}/{len(steps)}: {weight:g}g, {count} samples ---")
+            result = apply_weight(weight, step)
+            if asyncio.iscoroutine(result):
+                await result
+
+            for attempt in range(1 + step["retries"]):
+                if attempt:
+                    print(f"  Retrying step {number} (attempt {attempt + 1}/{1 + step['retries']})")
+                samples, _, level = await measure_weight_step(
+                    weight,
+                    previous_level if weight != previous_weight else None,
+                    num_samples=step["max_samples"] if step["adaptive"] else step["samples"],
+                    stabilization=step["stabilization"],
+                    max_wait=step["max_wait"],
+                    settle_delay=step["settle_delay"],
+                    adaptive=step["adaptive"])
+                if level is not None:
+                    previous_weight, previous_level = weight, level
+                settled = level is not None or step["stabilization"] == "fixed"
+                if len(samples) >= step["min_samples"] and (settled or not step["require_plateau"]):
+                    break
+            else:
+                # Unsettled or too few frames: not recorded, so they cannot bias the fit
+                print(f"  Step {number} ({weight:g}g) failed after {1 + step['retries']} attempts, "
+                      f"its {len(samples)} samples are left out.")
+                failed_steps.append(number)
+                samples = []
+
+            if samples:
+                record_samples(weight, samples, step=number, references=step["references"])
+            if protocol["stop_when_converged"] and live_fit.converged and number < len(steps):
+                print(f"\nThe calibration curve has converged, skipping the remaining {len(steps) - number} steps.")
+                break
+    finally:
+        await disconnect_from_device()
+        if session is not None:
+            session.close()
+
+    duration = time.perf_counter() - calibration_start_time
+    summary = {
+        "protocol": os.path.basename(protocol_path),
+        "device_address": device_address,
+        "steps": len(steps),
+        "failed_steps": len(failed_steps),
+        "samples": len(calibration_data),
+        "duration_s": round(duration, 2),
+        "devices_per_hour": round(3600.0 / duration, 1) if duration > 0 else float("inf"),
+    }
+    print("\n--- Scripted Calibration Complete ---")
+    print(f"{summary['samples']} samples in {duration:.1f}s, {len(failed_steps)} failed steps "
+          f"{failed_steps if failed_steps else ''}")
+    print(f"Throughput: {summary['devices_per_hour']} devices per hour")
+    log_calibration_run(summary)
+
+    save_and_plot_calibration(calibration_data, protocol["output"], plots=protocol["plots"])
+    session.finish()
+    return summary
+
+def log_calibration_run(summary, log_path=CALIBRATION_RUN_LOG):
+    """Appends one run summary to the throughput log (CSV)."""
+    row = dict(summary, finished_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+    pd.DataFrame([row]).to_csv(log_path, mode='a', index=False, header=not os.path.exists(log_path))
+
+# --- Quick Check ---
+async def run_quick_check(weights=CHECK_WEIGHTS, apply_weight=announce_weight, offer_recalibration=True):
+    """
+    Verifies the stored calibration of the device with a few reference weights.
+
+    Each weight is measured like a calibration step (plateau detection, adaptive sample count)
+    and compared with the model in the registry (see calibration_check.py). A full calibration is
+    only proposed when the readings have drifted beyond the limits.
+
+    Args:
+        weights (tuple): Reference weights in grams, in the order they are applied.
+        apply_weight: Called with (weight, step) before each weight, like in run_scripted_calibration.
+        offer_recalibration (bool): Ask whether to start run_calibration_mode if the check fails.
+
+    Returns:
+        dict: 'recalibrate' (bool), 'reason', 'duration_s' and 'result' (one row per weight and
+              pair), or None if the device could not be reached.
+    """
+    global sample_queue
+
+    print(f"\n--- Quick Calibration Check: {', '.join(f'{w:g}g' for w in weights)} ---")
+    sample_queue = asyncio.Queue(maxsize=SAMPLE_QUEUE_SIZE)
+    check_start_time = time.perf_counter()
 
+    if not await connect_to_device():
+        print("Failed to connect to device. Cannot run the check.")
+        return None
+
+    record = None
+    if CALIBRATION_REGISTRY:
+        # The record of the running firmware, else the device's latest one
+        registry = load_registry(CALIBRATION_REGISTRY)
+        record = registry.get(device_address, firmware_version) or registry.get(device_address)
+    readings = {}
+    try:
+        if record is None:
+            print(f"No stored calibration for {device_address}.")
+        else:
+            print(f"Checking against {record}")
+            if record.firmware != firmware_version:
+                print(f"  Note: calibrated with firmware {record.firmware}, the device runs {firmware_version}.")
+            previous_weight, previous_level = None, None
+            for number, weight in enumerate(weights, start=1):
+                print(f"\n--- Check {number}/{len(weights)}: {weight:g}g ---")
+                result = apply_weight(weight, {"weight_g": weight, "confirm": True})
+                if asyncio.iscoroutine(result):
+                    await result
+                samples, _, level = await measure_weight_step(
+                    weight,
+                    previous_level if weight != previous_weight else None,
+                    num_samples=MAX_DATAPOINTS_PER_WEIGHT,
+                    adaptive=True)
+                if level is not None:
+                    previous_weight, previous_level = weight, level
+                readings[weight] = samples
+    finally:
+        await disconnect_from_device()
+
+    if record is not None:
+        result = check_readings(record, readings)
+        recalibrate, reason = needs_recalibration(result)
     else:
+        result, recalibrate, reason = pd.DataFrame(), True, "the device has no stored calibration"
+    duration = time.perf_counter() - check_start_time
+    print("\n--- Quick Check Complete ---")
+    if len(result):
+        columns = ["weight_g", "pair", "samples", "expected", "measured", "z", "weight_error_g", "status"]
+        print(result[[c for c in columns if c in result]].round(2).to_string(index=False))
+    print(f"{'RECALIBRATION REQUIRED' if recalibrate else 'Calibration OK'}: {reason} ({duration:.1f}s)")
+
+    row = {"device_address": device_address, "firmware": firmware_version,
+           "calibration_version": record.version if record is not None else None,
+           "recalibrate": recalibrate, "reason": reason, "duration_s": round(duration, 2),
+           "checked_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    pd.DataFrame([row]).to_csv(CALIBRATION_CHECK_LOG, mode='a', index=False,
+                               header=not os.path.exists(CALIBRATION_CHECK_LOG))
+
+    if recalibrate and offer_recalibration:
+        answer = await ainput("Run a full calibration now? [y/N]: ")
+        if answer.strip().lower() in ("y", "yes"):
+            await run_calibration_mode()
+    return {"recalibrate": recalibrate, "reason": reason, "duration_s": duration, "result": result}
+
+# --- Saving and Plotting ---
+def save_and_plot_calibration(calibration_data, output_filename="calibration_data_ble.csv", plots=True):
+    """Writes the collected samples to CSV, fits them and writes the calibration figures (see calibration_report.py)."""
+    if not calibration_data:
         print("No calibration data collected for plotting.")
+        return
+
+    df = pd.DataFrame(calibration_data)
+    print("\nCollected Calibration Data:")
+    print(df)
+
+    # Save data to CSV
+    df.to_csv(output_filename, index=False)
+    print(f"\nData saved to {output_filename}")
+
+    # Best model per sensor pair, chosen by cross-validation (see calibration_fitting.py)
+    best, _ = fit_calibration_batch([df])
+    print("\nBest calibration models:")
+    table = summary_table(best).drop(columns="dataset")
+    print(table[table["model"].notna()].to_string(index=False))  # POT pairs only with reference data
+
+    # Uncertainty of the quadratic fits, and whether NUM_DATAPOINTS_PER_WEIGHT was enough
+    if df["weight_g"].nunique() >= 3:
+        _, uncertainty = bootstrap_calibration(df)
+        print("\nBootstrap 95% confidence intervals (quadratic fits):")
+        print(uncertainty.round(4).to_string(index=False))
+
+    # Store the models per device so other tools do not have to refit the raw CSV
+    if CALIBRATION_REGISTRY and device_address:
+        record = load_registry(CALIBRATION_REGISTRY).register(device_address, firmware_version, best[0],
+                                                              source=output_filename)
+        print(f"Registered calibration v{record.version} for {record.address} (firmware {record.firmware}) "
+              f"in {CALIBRATION_REGISTRY}")
+
+    # --- Report ---
+    # Figures are rendered off-screen in worker processes and written next to the CSV,
+    # so the session also finishes on a headless rig
+    if plots:
+        print("\nGenerating plots...")
+        write_calibration_report(output_filename)
 
 # --- Main Function to run calibration ---
-async def main():
-    await run_calibration_mode()
+async def main(protocol_path=None, simulate=False, check=False):
+    if simulate:
+        await run_simulated_calibration(protocol_path, check)
+    elif check:
+        await run_quick_check()
+    elif not protocol_path:
+        await run_calibration_mode()
+    else:
+        await run_scripted_calibration(protocol_path)
     print("Program finished.")
 
+async def run_simulated_calibration(protocol_path=None, check=False):
+    """Runs a protocol or a quick check against the emulated ReCover device (BLE Intercept/fake_bleak.py)."""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'BLE Intercept'))
+    from fake_bleak import FakeRecoverFirmware, HOST_CHARACTERISTIC_UUID, WeightRig, fake_backend
+
+    rig = WeightRig(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Real_calibration_data_ble.csv'))
+    firmware = FakeRecoverFirmware(rig, frame_format="float3", characteristic_uuid=HOST_CHARACTERISTIC_UUID,
+                                   address=SIMULATED_ADDRESS)
+    with fake_backend(sys.modules[__name__], firmware):
+        if check:
+            await run_quick_check(apply_weight=lambda weight, step: rig.apply(weight), offer_recalibration=False)
+        elif protocol_path:
+            await run_scripted_calibration(protocol_path, apply_weight=lambda weight, step: rig.apply(weight))
+        else:
+            print("--simulate needs --protocol or --check")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collects FSR/ToF calibration data over BLE.")
+    parser.add_argument("--protocol", help="JSON protocol for an unattended run (see calibration_protocol_example.json)")
+    parser.add_argument("--check", action="store_true",
+                        help="Quick check of the stored calibration with a few reference weights")
+    parser.add_argument("--simulate", action="store_true", help="Run the protocol or check against the emulated device")
+    args = parser.parse_args()
     try:
         print("Starting BLE Calibration Script...")
-        asyncio.run(main())
+        asyncio.run(main(args.protocol, args.simulate, args.check))
         
     except KeyboardInterrupt:
         print("Script interrupted by user")
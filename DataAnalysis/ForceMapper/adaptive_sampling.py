@@ -0,0 +1,180 @@
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from stabilization import SAMPLE_PERIOD_S
+
+# --- Configuration ---
+# A step is complete once the standard error of the mean of every channel is below its target
+SEM_TARGETS = {
+    "fsr_value": 3.0,          # FSR units
+    "tof_distance_mm": 0.5,    # mm
+}
+# Quantisation step of each channel: the spread used for the standard error never drops below
+# resolution / sqrt(12), so a few identical integer ToF readings do not end the step at once
+CHANNEL_RESOLUTION = {"fsr_value": 1.0, "tof_distance_mm": 1.0}
+MIN_SAMPLES = 4            # The spread of fewer samples is too unreliable to stop on
+MAX_SAMPLES = 20           # Cap for very noisy steps
+FIXED_SAMPLES = 5          # The fixed-count protocol (NUM_DATAPOINTS_PER_WEIGHT) replays compare against
+
+
+class AdaptiveSampler:
+    """
+    Decides, frame by frame, when a weight step has enough samples.
+
+    Keeps a running mean and variance per channel (Welford's update, O(1) per frame) and reports
+    the step as complete once every channel's standard error of the mean is below its target,
+    but never before min_samples and always at max_samples.
+
+    Args:
+        targets (dict): Channel -> standard error target.
+        min_samples (int): Frames to collect at least.
+        max_samples (int): Frames to collect at most.
+        resolution (dict): Channel -> quantisation step (see CHANNEL_RESOLUTION).
+    """
+
+    def __init__(self, targets=SEM_TARGETS, min_samples=MIN_SAMPLES, max_samples=MAX_SAMPLES,
+                 resolution=CHANNEL_RESOLUTION):
+        self.targets = targets
+        self.min_samples = min(min_samples, max_samples)
+        self.max_samples = max_samples
+        self.floor = {channel: resolution.get(channel, 0.0) / math.sqrt(12.0) for channel in targets}
+        self.count = 0
+        self.mean = {channel: 0.0 for channel in targets}
+        self._m2 = {channel: 0.0 for channel in targets}
+
+    def update(self, sample):
+        """
+        Adds one frame (dict with the channel values).
+
+        Returns:
+            bool: True if the step has enough samples.
+        """
+        self.count += 1
+        for channel in self.targets:
+            value = sample[channel]
+            delta = value - self.mean[channel]
+            self.mean[channel] += delta / self.count
+            self._m2[channel] += delta * (value - self.mean[channel])
+        return self.done
+
+    def std(self, channel):
+        """Sample standard deviation of a channel, floored at its quantisation noise."""
+        variance = self._m2[channel] / (self.count - 1) if self.count > 1 else math.inf
+        return max(math.sqrt(variance), self.floor[channel])
+
+    def sem(self):
+        """Standard error of the mean per channel (inf before the second frame)."""
+        return {channel: self.std(channel) / math.sqrt(self.count) if self.count > 1 else math.inf
+                for channel in self.targets}
+
+    @property
+    def reached_target(self):
+        return self.count > 1 and all(sem <= self.targets[channel] for channel, sem in self.sem().items())
+
+    @property
+    def done(self):
+        return self.count >= self.max_samples or (self.count >= self.min_samples and self.reached_target)
+
+    def describe(self):
+        return ", ".join(f"{channel} {sem:.2f}" for channel, sem in self.sem().items())
+
+
+# --- Replay ---
+def session_steps(df):
+    """
+    Splits recorded calibration rows into weight steps.
+
+    Uses the 'step' column of session files (see calibration_session.py), otherwise consecutive
+    rows with the same weight.
+    """
+    if "step" in df.columns:
+        keys = df["step"]
+    else:
+        keys = (df["weight_g"] != df["weight_g"].shift()).cumsum()
+    return [group for _, group in df.groupby(keys, sort=False)]
+
+
+def replay_session(df, fixed_samples=FIXED_SAMPLES, targets=SEM_TARGETS, min_samples=MIN_SAMPLES,
+                   max_samples=MAX_SAMPLES, replays=500, sample_period=SAMPLE_PERIOD_S, seed=0):
+    """
+    Replays the steps of a recorded calibration through the fixed-count and the adaptive collector.
+
+    A session only holds the frames its fixed protocol collected, so every step is replayed as
+    streams of max_samples frames with the mean and spread recorded for it (normal noise,
+    quantised to CHANNEL_RESOLUTION like the real readings). The fixed protocol averages the
+    first fixed_samples frames, the adaptive one stops where AdaptiveSampler says. Precision is
+    the RMS error of the step mean against the recorded step mean.
+
+    Returns:
+        pd.DataFrame: One row per step with the samples used, the time saved and the RMS error of
+        both collectors per channel.
+    """
+    rng = np.random.default_rng(seed)
+    channels = list(targets)
+    rows = []
+    for number, step in enumerate(session_steps(df), start=1):
+        values = step[channels].to_numpy(dtype=float)
+        truth = values.mean(axis=0)
+        spread = values.std(axis=0, ddof=1) if len(values) > 1 else np.zeros(len(channels))
+        resolution = np.array([CHANNEL_RESOLUTION.get(channel, 0.0) for channel in channels])
+        streams = truth + spread * rng.standard_normal((replays, max_samples, len(channels)))  # (replays, frames, channels)
+        quantised = resolution > 0
+        streams[..., quantised] = np.round(streams[..., quantised] / resolution[quantised]) * resolution[quantised]
+
+        counts = np.empty(replays, dtype=int)
+        adaptive_means = np.empty((replays, len(channels)))
+        for r in range(replays):
+            sampler = AdaptiveSampler(targets, min_samples, max_samples)
+            for frame in streams[r]:
+                if sampler.update(dict(zip(channels, frame))):
+                    break
+            counts[r] = sampler.count
+            adaptive_means[r] = [sampler.mean[channel] for channel in channels]
+        fixed_means = streams[:, :fixed_samples].mean(axis=1)
+
+        row = {"step": number, "weight_g": step["weight_g"].iloc[0], "recorded": len(values),
+               "fixed_samples": fixed_samples, "adaptive_samples": counts.mean(),
+               "time_saved_s": (fixed_samples - counts.mean()) * sample_period}
+        for c, channel in enumerate(channels):
+            row[f"{channel}_std"] = spread[c]
+            row[f"{channel}_fixed_rmse"] = np.sqrt(np.mean((fixed_means[:, c] - truth[c]) ** 2))
+            row[f"{channel}_adaptive_rmse"] = np.sqrt(np.mean((adaptive_means[:, c] - truth[c]) ** 2))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def replay_summary(steps, targets=SEM_TARGETS):
+    """Totals of replay_session(): samples and time per calibration, and steps within the targets."""
+    summary = {
+        "steps": len(steps),
+        "fixed_samples": steps["fixed_samples"].sum(),
+        "adaptive_samples": steps["adaptive_samples"].sum(),
+        "time_saved_s": steps["time_saved_s"].sum(),
+    }
+    for channel, target in targets.items():
+        summary[f"{channel}_fixed_within_target"] = int((steps[f"{channel}_fixed_rmse"] <= target).sum())
+        summary[f"{channel}_adaptive_within_target"] = int((steps[f"{channel}_adaptive_rmse"] <= target).sum())
+        summary[f"{channel}_worst_fixed_rmse"] = steps[f"{channel}_fixed_rmse"].max()
+        summary[f"{channel}_worst_adaptive_rmse"] = steps[f"{channel}_adaptive_rmse"].max()
+    return summary
+
+
+if __name__ == "__main__":
+    # Usage: python adaptive_sampling.py [calibration.csv | calibration_session_*.csv] ...
+    paths = sys.argv[1:] or ["DataAnalysis/ForceMapper/Real_calibration_data_ble.csv"]
+    for path in paths:
+        steps = replay_session(pd.read_csv(path))
+        summary = replay_summary(steps)
+        print(f"\n{path}")
+        with pd.option_context("display.width", 200):
+            print(steps.round(3).to_string(index=False))
+        print(f"Samples per calibration: fixed {summary['fixed_samples']}, adaptive {summary['adaptive_samples']:.1f} "
+              f"({summary['time_saved_s']:+.2f} s at {SAMPLE_PERIOD_S * 1e3:.0f} ms per frame)")
+        for channel, target in SEM_TARGETS.items():
+            print(f"{channel}: steps within the {target} target: fixed "
+                  f"{summary[f'{channel}_fixed_within_target']}/{summary['steps']}, adaptive "
+                  f"{summary[f'{channel}_adaptive_within_target']}/{summary['steps']}; worst RMS error "
+                  f"{summary[f'{channel}_worst_fixed_rmse']:.2f} -> {summary[f'{channel}_worst_adaptive_rmse']:.2f}")
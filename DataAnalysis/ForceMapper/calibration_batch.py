@@ -0,0 +1,228 @@
+import glob
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from calibration_fitting import POT_REFERENCES, SENSOR_PAIRS, fit_calibration_batch
+from plotter import REQUIRED_COLUMNS, plot_calibration
+
+# --- Configuration ---
+# Files in a calibration directory that are not calibration datasets
+IGNORED_FILES = ("calibration_runs.csv", "calibration_checks.csv", "calibration_fleet_summary.csv")
+IGNORED_PREFIXES = ("calibration_session_",)
+
+OUTLIER_THRESHOLD = 3.5       # Robust z-score (residual / (1.4826 * MAD)) above which a sample is an outlier
+MIN_RESIDUAL_SCALE = {"fsr_vs_weight": 2.0, "tof_vs_weight": 0.5, "fsr_vs_tof": 2.0}  # Sensor resolution floor
+
+# Drift against the fleet: every device's curve is compared to the fleet median at these weights
+REFERENCE_WEIGHTS = (0.0, 50.0, 100.0)
+DRIFT_LIMIT_PERCENT = 10.0    # Of the fleet median span over REFERENCE_WEIGHTS
+DRIFT_PAIRS = ("fsr_vs_weight", "tof_vs_weight")
+
+
+def find_calibration_files(sources):
+    """
+    Expands directories and glob patterns to a sorted list of calibration CSVs.
+
+    Args:
+        sources (list): Directories (all *.csv inside) and/or glob patterns.
+    """
+    paths = set()
+    for source in sources:
+        matches = glob.glob(os.path.join(source, "*.csv")) if os.path.isdir(source) else glob.glob(source)
+        paths.update(p for p in matches
+                     if os.path.basename(p) not in IGNORED_FILES
+                     and not os.path.basename(p).startswith(IGNORED_PREFIXES))
+    return sorted(paths)
+
+
+def device_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# --- Per-file worker ---
+def analyze_calibration_file(path, plot_directory=None):
+    """
+    Loads, validates and fits one calibration CSV; optionally writes its plots.
+
+    Runs in a worker process. Errors are returned in the result instead of raised, so one bad
+    file does not abort the batch.
+
+    Returns:
+        dict: 'file', 'device', 'fits' (pair -> CalibrationFit), 'row' (summary columns), 'error'.
+    """
+    result = {"file": path, "device": device_name(path), "fits": {}, "row": {}, "error": None}
+    try:
+        df = pd.read_csv(path)
+        missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"missing column(s) {missing}")
+        # Potentiometer columns are optional: their pairs are fitted where the file has them
+        optional = [column for column in ("pot_value",) + POT_REFERENCES if column in df.columns]
+        df = df[REQUIRED_COLUMNS + optional].dropna(subset=REQUIRED_COLUMNS)
+        levels = df["weight_g"].nunique()
+        if levels < 2:
+            raise ValueError(f"needs at least 2 weight levels, found {levels}")
+
+        best, _ = fit_calibration_batch([df])
+        row = {"samples": len(df), "weights": " ".join(f"{w:g}" for w in sorted(df["weight_g"].unique()))}
+        for pair, fit in best[0].items():
+            if fit is None:
+                row[f"{pair}_model"] = None
+                continue
+            # Outliers by robust z-score of the residuals of the selected model
+            deviation = np.abs(fit.residuals - np.median(fit.residuals))
+            scale = max(1.4826 * np.median(deviation), MIN_RESIDUAL_SCALE.get(pair, 0.0))
+            row.update({
+                f"{pair}_model": fit.model,
+                f"{pair}_coefficients": " ".join(f"{c:.6g}" for c in fit.coefficients),
+                f"{pair}_r2": fit.r2,
+                f"{pair}_rmse": fit.rmse,
+                f"{pair}_outliers": int(np.sum(deviation > OUTLIER_THRESHOLD * scale)),
+            })
+        result["fits"] = best[0]
+        result["row"] = row
+
+        if plot_directory:
+            plot_calibration(path, plot_directory, prefix=f"{result['device']}_", include_plotlyjs="cdn",
+                             verbose=False, fits=best[0])
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+# --- Fleet analysis ---
+def fleet_drift(results, reference_weights=REFERENCE_WEIGHTS, pairs=DRIFT_PAIRS):
+    """
+    Deviation of every device's calibration curve from the fleet median.
+
+    Returns:
+        pd.DataFrame: Per device and pair, the largest deviation from the fleet median over the
+        reference weights, absolute and in percent of the median curve's span.
+    """
+    weights = np.asarray(reference_weights, dtype=float)
+    columns = {}
+    for pair in pairs:
+        curves = {r["device"]: r["fits"][pair].predict(weights) for r in results if r["fits"].get(pair) is not None}
+        if not curves:
+            continue
+        stacked = np.array(list(curves.values()))
+        median = np.median(stacked, axis=0)
+        span = abs(median[-1] - median[0]) or 1.0
+        deviation = stacked - median
+        worst = np.argmax(np.abs(deviation), axis=1)
+        drift = deviation[np.arange(len(stacked)), worst]
+        columns[f"{pair}_drift"] = pd.Series(drift, index=list(curves))
+        columns[f"{pair}_drift_pct"] = pd.Series(100.0 * drift / span, index=list(curves))
+    return pd.DataFrame(columns)
+
+
+def analyze_calibration_files(paths, plot_directory=None, max_workers=None):
+    """
+    Fits and validates many calibration CSVs in a process pool and builds the fleet summary.
+
+    Args:
+        paths (list): Calibration CSVs.
+        plot_directory (str): Where to write per-device plots, None to skip plotting.
+        max_workers (int): Worker processes, defaults to the number of CPUs.
+
+    Returns:
+        pd.DataFrame: One row per file with coefficients, R^2, RMSE, outlier counts, drift against
+        the fleet median and the error for files that could not be analysed.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        results = [analyze_calibration_file(path, plot_directory) for path in paths]
+    else:
+        chunksize = max(1, len(paths) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(analyze_calibration_file, paths, [plot_directory] * len(paths),
+                                        chunksize=chunksize))
+
+    ok = [r for r in results if r["error"] is None]
+    drift = fleet_drift(ok)
+    rows = []
+    for r in results:
+        row = {"device": r["device"], "file": r["file"], **r["row"]}
+        if r["device"] in drift.index:
+            row.update(drift.loc[r["device"]].to_dict())
+        drift_pct = [abs(row.get(f"{pair}_drift_pct", 0.0)) for pair in DRIFT_PAIRS]
+        row["drift_flag"] = bool(max(drift_pct) > DRIFT_LIMIT_PERCENT) if r["error"] is None else None
+        row["error"] = r["error"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+# --- Benchmark ---
+def write_synthetic_fleet(directory, n_devices, csv_file_path, seed=0):
+    """Writes n_devices calibration CSVs: the reference file with per-device gain, offset and noise."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(csv_file_path)
+    paths = []
+    for i in range(n_devices):
+        df = base.copy()
+        df["fsr_value"] = np.round(df["fsr_value"] * rng.normal(1.0, 0.05) + rng.normal(0.0, 5.0, len(df)))
+        df["tof_distance_mm"] = np.round(df["tof_distance_mm"] + rng.normal(0.0, 1.5) + rng.normal(0.0, 0.5, len(df)))
+        path = os.path.join(directory, f"device_{i:04d}.csv")
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def benchmark(csv_file_path, n_devices=200, plots=True):
+    """Times the batch analysis with 1 .. cpu_count workers on a synthetic fleet."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = write_synthetic_fleet(tmp_dir, n_devices, csv_file_path)
+        plot_directory = os.path.join(tmp_dir, "plots") if plots else None
+        cpus = os.cpu_count() or 1
+        baseline = None
+        for workers in sorted({1, 2, 4, cpus} - {w for w in (2, 4) if w > cpus}):
+            start = time.perf_counter()
+            analyze_calibration_files(paths, plot_directory, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{n_devices} devices, {workers} worker(s): {elapsed:.2f} s "
+                  f"({n_devices / elapsed:.0f} files/s, speed-up {baseline / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_batch.py <directory | glob> [...] [--plots DIR] [--output summary.csv] [--workers N]
+    #        python calibration_batch.py --benchmark [N_DEVICES]
+    args = sys.argv[1:]
+    if "--benchmark" in args:
+        rest = args[args.index("--benchmark") + 1:]
+        benchmark("DataAnalysis/ForceMapper/Real_calibration_data_ble.csv", int(rest[0]) if rest else 200)
+        sys.exit(0)
+
+    def option(name, default=None):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    plot_directory = option("--plots")
+    output_file = option("--output", "calibration_fleet_summary.csv")
+    workers = option("--workers")
+    paths = [p for p in find_calibration_files(args or ["DataAnalysis/ForceMapper"])
+             if os.path.abspath(p) != os.path.abspath(output_file)]  # A summary under a custom --output name
+    if not paths:
+        print("No calibration files found.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    summary = analyze_calibration_files(paths, plot_directory, int(workers) if workers else None)
+    summary.to_csv(output_file, index=False)
+    failed = summary["error"].notna().sum()
+    print(f"Analysed {len(paths)} files in {time.perf_counter() - start:.2f} s ({failed} failed) -> {output_file}")
+    # Failed files have no metrics, so a batch where every file failed lacks those columns
+    columns = (["device", "samples"] + [f"{p}_model" for p in SENSOR_PAIRS]
+               + [c for c in summary if c.endswith(("_r2", "_outliers", "_drift_pct"))] + ["drift_flag", "error"])
+    with pd.option_context("display.width", 200, "display.max_columns", 12):
+        print(summary[[c for c in columns if c in summary]].round(3).to_string(index=False))
@@ -0,0 +1,149 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from calibration_fitting import POT_REFERENCES, SENSOR_PAIRS, raw_polynomial
+
+# --- Configuration ---
+N_BOOTSTRAP = 2000
+CONFIDENCE_LEVEL = 0.95
+CURVE_POINTS = 100
+TARGET_WEIGHT_CI_G = 2.0   # Wanted half-width of the weight confidence interval, in grams
+
+
+def resample_counts(groups, n_boot=N_BOOTSTRAP, rng=None):
+    """
+    Stratified bootstrap as multiplicities: how often each row appears in each resample.
+
+    Rows are resampled within their group (the applied weight), so every resample keeps all
+    weight levels and the design of the calibration.
+
+    Returns:
+        np.ndarray: (n_boot, n_rows) counts, each resample sums to n_rows.
+    """
+    rng = rng or np.random.default_rng()
+    groups = np.asarray(groups)
+    counts = np.zeros((n_boot, len(groups)))
+    for level in np.unique(groups):
+        rows = np.flatnonzero(groups == level)
+        counts[:, rows] = rng.multinomial(len(rows), np.full(len(rows), 1.0 / len(rows)), size=n_boot)
+    return counts
+
+
+def bootstrap_polynomial(x, y, degree=2, groups=None, n_boot=N_BOOTSTRAP, level=CONFIDENCE_LEVEL,
+                         curve_points=CURVE_POINTS, seed=0):
+    """
+    Bootstrap confidence intervals of a polynomial calibration fit.
+
+    A resample only changes how often each row is counted, so its normal equations are the
+    count-weighted sum of per-row outer products: all resamples come out of one matrix product
+    (n_boot x n) @ (n x p^2) and one batched solve.
+
+    Args:
+        x, y (array-like): Calibration data (e.g. weight_g and fsr_value).
+        degree (int): Polynomial degree.
+        groups (array-like): Strata for the resampling, defaults to x (the applied weights).
+        n_boot (int): Number of resamples.
+        level (float): Confidence level of the intervals.
+        curve_points (int): Points of the confidence band over the range of x.
+
+    Returns:
+        dict: 'coefficients' (np.polyfit order), 'coefficient_ci' (2, p), 'samples' (n_boot, p),
+              'x' (curve grid), 'curve', 'curve_ci' (2, curve_points).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    lo, width = x.min(), max(np.ptp(x), 1e-12)
+    design = np.vander((x - lo) / width, degree + 1, increasing=True)  # Scaled for conditioning
+    p = degree + 1
+
+    counts = resample_counts(x if groups is None else groups, n_boot, np.random.default_rng(seed))
+    counts = np.vstack([np.ones(len(x)), counts])  # Row 0: the original data
+    outer = (design[:, :, None] * design[:, None, :]).reshape(len(x), p * p)
+    gram = (counts @ outer).reshape(-1, p, p)
+    rhs = counts @ (design * y[:, None])
+    coeffs_u = np.linalg.solve(gram + 1e-12 * np.eye(p), rhs[..., None])[..., 0]
+    coeffs = raw_polynomial(coeffs_u, np.full(len(coeffs_u), lo), np.full(len(coeffs_u), width))
+
+    alpha = (1.0 - level) / 2.0
+    grid = np.linspace(x.min(), x.max(), curve_points)
+    curves = coeffs_u @ np.vander((grid - lo) / width, p, increasing=True).T
+    return {
+        "coefficients": coeffs[0],
+        "coefficient_ci": np.quantile(coeffs[1:], [alpha, 1.0 - alpha], axis=0),
+        "samples": coeffs[1:],
+        "x": grid,
+        "curve": curves[0],
+        "curve_ci": np.quantile(curves[1:], [alpha, 1.0 - alpha], axis=0),
+    }
+
+
+def weight_uncertainty(result):
+    """
+    Half-width of the weight confidence interval along the curve: sensor band / |slope|.
+
+    Where the curve is flat (the FSR vertex) the weight is not determined and the value is inf.
+    """
+    slope = np.abs(np.polyval(np.polyder(result["coefficients"]), result["x"]))
+    half_band = (result["curve_ci"][1] - result["curve_ci"][0]) / 2.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(slope > 1e-9, half_band / slope, np.inf)
+
+
+def bootstrap_calibration(df, pairs=SENSOR_PAIRS, degree=2, n_boot=N_BOOTSTRAP, level=CONFIDENCE_LEVEL,
+                          target_ci=TARGET_WEIGHT_CI_G, seed=0):
+    """
+    Bootstraps every sensor pair of one calibration and summarises the uncertainty.
+
+    For pairs against weight, the confidence band is also expressed in grams, and the samples
+    per weight needed for target_ci are extrapolated with the 1/sqrt(n) law (NaN where the curve
+    is flat everywhere, so no number of samples reaches it). Pairs the data has
+    no (or too few) reference levels for, e.g. the POT without angles, are skipped.
+
+    Returns:
+        tuple: (results: pair -> bootstrap_polynomial result, summary DataFrame)
+    """
+    results, rows = {}, []
+    samples_per_weight = df.groupby("weight_g").size().median()
+    for pair, (x_col, y_col) in pairs.items():
+        if x_col not in df.columns or y_col not in df.columns:
+            continue
+        # POT pairs are resampled within their reference level, the others within the weight
+        group_col = x_col if x_col in POT_REFERENCES else "weight_g"
+        data = df[list(dict.fromkeys([x_col, y_col, group_col]))].dropna()
+        if data[x_col].nunique() <= degree:
+            continue
+        result = bootstrap_polynomial(data[x_col], data[y_col], degree, groups=data[group_col],
+                                      n_boot=n_boot, level=level, seed=seed)
+        results[pair] = result
+        row = {"pair": pair}
+        for i, (value, (low, high)) in enumerate(zip(result["coefficients"], result["coefficient_ci"].T)):
+            row[f"c{degree - i}"] = value
+            row[f"c{degree - i}_ci"] = f"[{low:.4g}, {high:.4g}]"
+        if x_col == "weight_g":
+            grams = weight_uncertainty(result)
+            # Where the curve is usable (not at a flat extremum). A band of zero width (identical
+            # readings per step) gives 0 g; a flat channel has no finite value and no usable curve
+            finite = grams[np.isfinite(grams)]
+            usable = finite[finite <= 10 * np.median(finite)] if len(finite) else finite
+            row["weight_ci_g"] = np.median(usable) if len(usable) else np.inf
+            row["samples_needed"] = (int(np.ceil(samples_per_weight * (row["weight_ci_g"] / target_ci) ** 2))
+                                     if np.isfinite(row["weight_ci_g"]) else np.nan)
+        rows.append(row)
+    return results, pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_bootstrap.py [calibration.csv] [n_boot]
+    csv_file_path = sys.argv[1] if len(sys.argv) > 1 else "DataAnalysis/ForceMapper/Real_calibration_data_ble.csv"
+    n_boot = int(sys.argv[2]) if len(sys.argv) > 2 else N_BOOTSTRAP
+    df = pd.read_csv(csv_file_path)
+    bootstrap_calibration(df, n_boot=10)  # Warm-up
+    start = time.perf_counter()
+    results, summary = bootstrap_calibration(df, n_boot=n_boot)
+    elapsed = time.perf_counter() - start
+    with pd.option_context("display.width", 200):
+        print(summary.to_string(index=False))
+    print(f"\n{n_boot} resamples x {len(results)} pairs in {elapsed * 1e3:.1f} ms")
@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from adaptive_sampling import CHANNEL_RESOLUTION
+from calibration_fitting import SENSOR_PAIRS
+
+# --- Configuration ---
+CHECK_WEIGHTS = (0.0, 50.0, 100.0)              # Reference weights of a quick check (2-3 are enough)
+CHECK_PAIRS = ("fsr_vs_weight", "tof_vs_weight")
+Z_LIMIT = 3.0               # Deviation (in standard errors) above which a difference is not noise
+MAX_WEIGHT_ERROR_G = 5.0    # Deviation, in grams of applied weight, the calibration may drift by
+CALIBRATION_SAMPLES = 5     # Samples per weight behind the stored model: the uncertainty of the curve itself
+
+# Row status
+OK = "ok"
+DRIFT = "drift"              # Significant and larger than MAX_WEIGHT_ERROR_G
+INSENSITIVE = "insensitive"  # Not drifted, but too flat (or noisy) here to resolve MAX_WEIGHT_ERROR_G
+OUT_OF_RANGE = "out of range"  # Outside the calibrated weights, the model would be extrapolated
+NO_DATA = "no data"
+
+
+def check_readings(record, readings, pairs=CHECK_PAIRS, z_limit=Z_LIMIT, max_weight_error=MAX_WEIGHT_ERROR_G):
+    """
+    Compares fresh readings at reference weights with a stored calibration.
+
+    A reading mean is drifted when it differs from the model by more than z_limit standard errors
+    (its own and the model's) and the difference, converted to grams with the local slope of the
+    curve, exceeds max_weight_error. Both conditions are needed: the first rejects noise, the
+    second differences too small to matter. Weights outside the range the model was fitted on are
+    reported but not judged, since the curve is extrapolated there.
+
+    Args:
+        record (CalibrationRecord): Stored calibration (see calibration_registry.py).
+        readings (dict): Reference weight in grams -> list of samples (dicts with the sensor columns).
+        pairs (tuple): Sensor pairs to check.
+
+    Returns:
+        pd.DataFrame: One row per weight and pair with the expected and measured means, the
+        deviation as a z-score and in grams, and the status.
+    """
+    rows = []
+    for weight, samples in readings.items():
+        for pair in pairs:
+            fit = record.fits.get(pair)
+            if fit is None:
+                continue
+            _, column = SENSOR_PAIRS[pair]
+            values = np.array([s[column] for s in samples], dtype=float)
+            row = {"weight_g": weight, "pair": pair, "samples": len(values), "model": fit.model,
+                   "in_range": bool(fit.x_range[0] <= weight <= fit.x_range[1])}
+            if len(values) < 2:
+                rows.append(dict(row, status=NO_DATA))
+                continue
+
+            expected = float(fit.predict(weight))
+            mean = values.mean()
+            std = max(values.std(ddof=1), CHANNEL_RESOLUTION.get(column, 0.0) / math.sqrt(12.0))
+            sigma = math.sqrt(std ** 2 / len(values) + fit.rmse ** 2 / CALIBRATION_SAMPLES)
+            # Local sensitivity of the curve, reading units per gram
+            slope = float(fit.predict(weight + 0.5) - fit.predict(weight - 0.5))
+            deviation = mean - expected
+            z = deviation / sigma if sigma > 0 else math.inf
+            weight_error = deviation / slope if slope != 0 else math.inf
+
+            if not row["in_range"]:
+                status = OUT_OF_RANGE
+            elif abs(z) > z_limit and abs(weight_error) > max_weight_error:
+                status = DRIFT
+            elif abs(slope) * max_weight_error < z_limit * sigma:
+                status = INSENSITIVE  # No drift seen, but one of max_weight_error would not be either
+            else:
+                status = OK
+            rows.append(dict(row, expected=expected, measured=mean, sem=std / math.sqrt(len(values)),
+                             deviation=deviation, z=z, weight_error_g=weight_error, status=status))
+    return pd.DataFrame(rows)
+
+
+def needs_recalibration(result):
+    """
+    Verdict of a quick check.
+
+    A pair without a single confirmed (OK) row is not verified by the check. Recalibrating
+    would not help there (the curve is too flat at the reference weights), so it does not
+    fail the check, but the reason names it.
+
+    Returns:
+        tuple: (bool, reason) - recalibrate if any row drifted, or if no row could be checked.
+    """
+    drifted = result[result["status"] == DRIFT] if len(result) else result
+    if len(drifted):
+        worst = drifted.loc[drifted["weight_error_g"].abs().idxmax()]
+        return True, (f"{len(drifted)} of {len(result)} checks drifted, worst {worst['pair']} at "
+                      f"{worst['weight_g']:g}g: {worst['weight_error_g']:+.1f}g (z = {worst['z']:+.1f})")
+    if not len(result) or not (result["status"] == OK).any():
+        return True, "no reference weight could be checked against the stored calibration"
+    confirmed = int((result["status"] == OK).sum())
+    reason = f"{confirmed} of {len(result)} checks within {MAX_WEIGHT_ERROR_G:g}g"
+    unverified = []
+    for pair, rows in result.groupby("pair", sort=False):
+        if (rows["status"] == OK).any():
+            continue
+        counts = rows["status"].value_counts()
+        unverified.append(f"{pair} ({', '.join(f'{n} {status}' for status, n in counts.items())})")
+    if unverified:
+        reason += f"; NOT VERIFIED: {', '.join(unverified)}"
+    return False, reason
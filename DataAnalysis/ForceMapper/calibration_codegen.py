@@ -0,0 +1,272 @@
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from calibration_fitting import SENSOR_PAIRS, fit_calibration_batch
+from calibration_inverse import InverseCalibration
+
+# --- Configuration ---
+# The firmware sends FSR and POT as uint16 millivolts x 10 (see calibrate_ADC_Raw in ReCoverRun 2.ino);
+# the tables are indexed by that code, so the firmware looks the value up before it is sent
+INPUT_SCALE = 10             # Codes per millivolt
+ADC_MAX_MV = 3100            # Top of the ESP32 ADC range at ADC_ATTEN_DB_11
+MAX_ENTRIES = 257            # Default table size limit (int16 entries)
+FRACTION_BITS = 4            # Output in Q11.4: 1/16 g (or deg, mm) steps, +/-2047 range
+ADC_PAIRS = ("fsr_vs_weight", "pot_vs_angle", "pot_vs_extension")  # Pairs whose reading comes from the ADC
+OUTPUT_UNITS = {"weight_g": "g", "angle_deg": "deg", "extension_mm": "mm"}
+
+
+class FixedPointLUT:
+    """
+    Fixed-point inverse of a calibration fit, as the firmware evaluates it.
+
+    The table holds the fitted x (weight, angle or extension) at input codes in_min,
+    in_min + 2^shift, ... as int16 with `fraction_bits` fractional bits. A code is looked up with
+    a shift, a mask and one multiply (linear interpolation between neighbouring entries); codes
+    outside the table clamp to its ends, which is where the calibrated branch ends, so the table
+    agrees with the float model (InverseCalibration, out_of_range='clip') over the whole ADC range.
+
+    Args:
+        name (str): C identifier prefix, e.g. 'fsr_weight'.
+        pair (str): Sensor pair of the fit.
+        in_min (int): Input code of the first entry.
+        shift (int): log2 of the input codes between entries.
+        values (np.ndarray): int16 entries.
+        fraction_bits (int): Fractional bits of the entries.
+    """
+
+    def __init__(self, name, pair, in_min, shift, values, fraction_bits=FRACTION_BITS):
+        self.name = name
+        self.pair = pair
+        self.in_min = int(in_min)
+        self.shift = int(shift)
+        self.values = values
+        self.fraction_bits = fraction_bits
+
+    @property
+    def in_max(self):
+        return self.in_min + ((len(self.values) - 1) << self.shift)
+
+    def lookup(self, codes):
+        """Bit-exact emulation of the generated C function; returns the raw fixed-point output."""
+        codes = np.asarray(codes, dtype=np.int64)
+        offset = np.clip(codes - self.in_min, 0, self.in_max - self.in_min)
+        i = np.minimum(offset >> self.shift, len(self.values) - 2)
+        frac = offset - (i << self.shift)
+        a = self.values[i].astype(np.int64)
+        b = self.values[i + 1].astype(np.int64)
+        half = (1 << self.shift) >> 1
+        return a + (((b - a) * frac + half) >> self.shift)  # >> floors, like arithmetic shifts on the ESP32
+
+    def __call__(self, codes):
+        """Output in the units of the fit (e.g. grams) for input codes."""
+        return self.lookup(codes) / float(1 << self.fraction_bits)
+
+    def __repr__(self):
+        return (f"FixedPointLUT({self.name}: {len(self.values)} entries, codes {self.in_min}-{self.in_max} "
+                f"every {1 << self.shift}, Q{self.fraction_bits})")
+
+
+def _table(fit, name, shift, fraction_bits, input_scale):
+    """Table of the given spacing over the calibrated branch of the fit."""
+    inverse = InverseCalibration(fit, out_of_range="clip")
+    lo, hi = sorted((inverse.y_start, inverse.y_end))
+    in_min = math.floor(lo * input_scale)
+    entries = max(math.ceil((math.ceil(hi * input_scale) - in_min) / (1 << shift)) + 1, 2)
+    codes = in_min + (np.arange(entries) << shift)
+    x = inverse.weight(codes / input_scale)
+    q = np.round(x * (1 << fraction_bits))
+    if q.min() < np.iinfo(np.int16).min or q.max() > np.iinfo(np.int16).max:
+        raise ValueError(f"{fit.pair}: {x.min():.1f}..{x.max():.1f} does not fit int16 with {fraction_bits} "
+                         f"fractional bits, use fewer")
+    return FixedPointLUT(name, fit.pair, in_min, shift, q.astype(np.int16), fraction_bits)
+
+
+def error_report(fit, lut, input_scale=INPUT_SCALE, adc_max_mv=ADC_MAX_MV):
+    """
+    Table against the float model at every input code of the ADC range.
+
+    Returns:
+        dict: max and RMS absolute error, where the maximum occurs, and the maximum inside the
+        calibrated branch only (outside it both clamp, so the error there is the rounding).
+    """
+    inverse = InverseCalibration(fit, out_of_range="clip")
+    codes = np.arange(0, adc_max_mv * input_scale + 1)
+    reference = inverse.weight(codes / input_scale)
+    error = np.abs(lut(codes) - reference)
+    worst = int(np.argmax(error))
+    inside = (codes >= lut.in_min) & (codes <= lut.in_max)
+    return {
+        "pair": fit.pair, "model": fit.model, "entries": len(lut.values), "bytes": lut.values.nbytes,
+        "step_codes": 1 << lut.shift, "codes_checked": len(codes),
+        "max_error": float(error[worst]), "rms_error": float(np.sqrt(np.mean(error ** 2))),
+        "worst_code": int(codes[worst]), "worst_mv": codes[worst] / input_scale,
+        "max_error_in_table": float(error[inside].max()) if inside.any() else 0.0,
+        "rounding": 0.5 / (1 << lut.fraction_bits),
+    }
+
+
+def build_lut(fit, name=None, max_entries=MAX_ENTRIES, max_error=None, fraction_bits=FRACTION_BITS,
+              input_scale=INPUT_SCALE, adc_max_mv=ADC_MAX_MV):
+    """
+    Fixed-point lookup table for one fit.
+
+    Without max_error, the finest table with at most max_entries entries is built. With it, the
+    smallest table whose error against the float model stays within max_error over the whole ADC
+    range; if even max_entries entries cannot reach it (e.g. next to the vertex of the FSR
+    quadratic, where the inverse is steep), the finest table is returned and the report says so.
+
+    Args:
+        fit (CalibrationFit): Forward model (see calibration_fitting.py).
+        name (str): C identifier prefix, defaults to e.g. 'fsr_weight' for fsr_vs_weight.
+        max_entries (int): Size limit of the table.
+        max_error (float): Wanted maximum interpolation error in output units (e.g. grams).
+        fraction_bits (int): Fractional bits of the int16 output.
+        input_scale (int): Input codes per millivolt.
+        adc_max_mv (float): Top of the ADC range the report covers.
+
+    Returns:
+        tuple: (FixedPointLUT, error_report dict with 'meets_max_error')
+    """
+    sensor, reference = fit.pair.split("_vs_")
+    name = name or f"{sensor}_{reference}"
+    inverse = InverseCalibration(fit, out_of_range="clip")
+    span = (abs(inverse.y_end - inverse.y_start) + 2.0 / input_scale) * input_scale
+    finest = max(math.ceil(math.log2(max(span / (max_entries - 1), 1.0))), 0)  # Smallest shift within max_entries
+
+    shifts = [finest] if max_error is None else range(max(finest, math.ceil(math.log2(max(span, 2.0)))), finest - 1, -1)
+    for shift in shifts:
+        lut = _table(fit, name, shift, fraction_bits, input_scale)
+        if len(lut.values) > max_entries:
+            lut = _table(fit, name, shift + 1, fraction_bits, input_scale)
+            report = error_report(fit, lut, input_scale, adc_max_mv)
+            break
+        report = error_report(fit, lut, input_scale, adc_max_mv)
+        if max_error is None or report["max_error"] <= max_error:
+            break
+    report["meets_max_error"] = max_error is None or report["max_error"] <= max_error
+    return lut, report
+
+
+# --- C header ---
+def c_header(luts, source=None, input_scale=INPUT_SCALE):
+    """
+    C header with the tables and an inline lookup function per table, for the ESP32 firmware.
+
+    Each function takes the uint16 code the firmware sends (millivolts x input_scale) and returns
+    the calibrated value in fixed point; divide by (1 << NAME_FRACTION_BITS) for the float value.
+    """
+    lines = [
+        "// Generated by DataAnalysis/ForceMapper/calibration_codegen.py - do not edit.",
+        f"// Source: {source}" if source else "// Source: calibration fit",
+        f"// Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"// Input: uint16 code = millivolts x {input_scale}, as sent over BLE.",
+        "#ifndef RECOVER_CALIBRATION_LUT_H",
+        "#define RECOVER_CALIBRATION_LUT_H",
+        "",
+        "#include <stdint.h>",
+        "",
+    ]
+    for lut in luts:
+        upper = lut.name.upper()
+        unit = OUTPUT_UNITS.get(SENSOR_PAIRS[lut.pair][0], "") if lut.pair in SENSOR_PAIRS else ""
+        values = [str(int(v)) for v in lut.values]
+        rows = [", ".join(values[i:i + 12]) for i in range(0, len(values), 12)]
+        lines += [
+            f"// {lut.pair}: {unit} in Q{15 - lut.fraction_bits}.{lut.fraction_bits}, "
+            f"{len(lut.values)} entries every {1 << lut.shift} codes",
+            f"#define {upper}_LUT_SIZE {len(lut.values)}",
+            f"#define {upper}_IN_MIN {lut.in_min}u",
+            f"#define {upper}_SHIFT {lut.shift}",
+            f"#define {upper}_FRACTION_BITS {lut.fraction_bits}",
+            "",
+            f"static const int16_t {lut.name}_lut[{upper}_LUT_SIZE] = {{",
+            *(f"    {row}," for row in rows),
+            "};",
+            "",
+            f"static inline int16_t {lut.name}_from_code(uint16_t code) {{",
+            f"    if (code <= {upper}_IN_MIN) return {lut.name}_lut[0];",
+            f"    uint32_t offset = code - {upper}_IN_MIN;",
+            f"    uint32_t i = offset >> {upper}_SHIFT;",
+            f"    if (i >= {upper}_LUT_SIZE - 1) return {lut.name}_lut[{upper}_LUT_SIZE - 1];",
+            f"    int32_t frac = (int32_t)(offset & ((1u << {upper}_SHIFT) - 1));",
+            f"    int32_t a = {lut.name}_lut[i];",
+            f"    int32_t b = {lut.name}_lut[i + 1];",
+            f"    return (int16_t)(a + (((b - a) * frac + ((1 << {upper}_SHIFT) >> 1)) >> {upper}_SHIFT));",
+            "}",
+            "",
+        ]
+    lines += ["#endif // RECOVER_CALIBRATION_LUT_H", ""]
+    return "\n".join(lines)
+
+
+def generate_header(fits, output_path, pairs=ADC_PAIRS, source=None, **kwargs):
+    """
+    Builds the tables of the ADC pairs present in fits, writes the header and returns the error reports.
+
+    Args:
+        fits (dict): Pair name -> CalibrationFit (e.g. CalibrationRecord.fits or a fit_calibration_batch result).
+        output_path (str): Header file to write.
+        pairs (tuple): Pairs to generate tables for.
+        **kwargs: Passed to build_lut (max_entries, max_error, fraction_bits, ...).
+
+    Returns:
+        pd.DataFrame: error_report() of every table.
+    """
+    luts, reports = [], []
+    for pair in pairs:
+        if fits.get(pair) is None:
+            continue
+        lut, report = build_lut(fits[pair], **kwargs)
+        luts.append(lut)
+        reports.append(report)
+    if not luts:
+        raise ValueError(f"no fit for any of {pairs}")
+    with open(output_path, "w") as f:
+        f.write(c_header(luts, source, kwargs.get("input_scale", INPUT_SCALE)))
+    return pd.DataFrame(reports)
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_codegen.py [calibration.csv | registry.npz ADDRESS [FIRMWARE]]
+    #                                      [--output calibration_lut.h] [--size N] [--max-error E]
+    args = sys.argv[1:]
+
+    def option(name, default=None):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    output_path = option("--output", "calibration_lut.h")
+    max_entries = int(option("--size", MAX_ENTRIES))
+    max_error = option("--max-error")
+    source = args[0] if args else "DataAnalysis/ForceMapper/Real_calibration_data_ble.csv"
+    if source.endswith(".npz"):
+        from calibration_registry import UNKNOWN_FIRMWARE, load_registry
+        record = load_registry(source).get(args[1], args[2] if len(args) > 2 else UNKNOWN_FIRMWARE)
+        if record is None:
+            print(f"No calibration for {args[1:]} in {source}.")
+            sys.exit(1)
+        fits, source = record.fits, f"{record!r}"
+    else:
+        best, _ = fit_calibration_batch([pd.read_csv(source)])
+        fits, source = best[0], os.path.basename(source)
+
+    start = time.perf_counter()
+    reports = generate_header(fits, output_path, source=source, max_entries=max_entries,
+                              max_error=float(max_error) if max_error else None)
+    elapsed = time.perf_counter() - start
+    with pd.option_context("display.width", 200):
+        print(reports.round(4).to_string(index=False))
+    print(f"\nWrote {output_path} ({reports['bytes'].sum()} bytes of tables) in {elapsed * 1e3:.0f} ms; "
+          f"errors checked at every code from 0 to {ADC_MAX_MV} mV")
+    for _, report in reports[~reports["meets_max_error"]].iterrows():
+        print(f"{report['pair']}: {report['entries']} entries reach {report['max_error']:.3f}, not {max_error} "
+              f"(worst at {report['worst_mv']:.1f} mV); raise --size")
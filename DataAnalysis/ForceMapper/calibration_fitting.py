@@ -0,0 +1,378 @@
+import glob
+import sys
+import time
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Sensor pairs fitted for every calibration file: name -> (x column, y column).
+# The potentiometer has its own reference input, the finger angle or the rope extension; a pair
+# whose columns are missing or empty in a file is skipped (its fit is None)
+SENSOR_PAIRS = {
+    "fsr_vs_weight": ("weight_g", "fsr_value"),
+    "tof_vs_weight": ("weight_g", "tof_distance_mm"),
+    "fsr_vs_tof": ("tof_distance_mm", "fsr_value"),
+    "pot_vs_angle": ("angle_deg", "pot_value"),
+    "pot_vs_extension": ("extension_mm", "pot_value"),
+}
+POT_REFERENCES = ("angle_deg", "extension_mm")
+
+# Candidate models, simplest first (ties in the cross-validated error go to the simpler model)
+MODELS = ("linear", "quadratic", "cubic", "power", "spline")
+MODEL_PARAMS = {"linear": 2, "quadratic": 3, "cubic": 4, "power": 2}
+
+CV_FOLDS = 5
+PARSIMONY_TOLERANCE = 0.02  # A simpler model wins if its CV RMSE is within 2% of the best one
+
+POWER_LAW_SHIFT = 1.0       # y = A * (x + shift)^k, the shift keeps the log defined at 0 g
+SPLINE_KNOTS = 5            # Equally spaced knots of the monotone linear spline
+SPLINE_SMOOTHING = 0.01     # Second-difference penalty per sample, bridges knots without data
+
+_P = max(SPLINE_KNOTS, *MODEL_PARAMS.values())  # Parameters per model after padding
+
+
+class CalibrationFit:
+    """
+    One fitted calibration model for a sensor pair.
+
+    Polynomial coefficients are in raw units, highest power first like np.polyfit (so a quadratic
+    is a, b, c of quadratic_func in BLE_Force_mapping.py). The power law stores (A, k) of
+    y = A * (x + POWER_LAW_SHIFT)^k, the spline its knot values at `knots`.
+    """
+
+    def __init__(self, pair, model, coefficients, x_range, r2, rmse, cv_rmse, residuals, knots=None):
+        self.pair = pair
+        self.model = model
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.x_range = x_range
+        self.r2 = r2
+        self.rmse = rmse
+        self.cv_rmse = cv_rmse
+        self.residuals = residuals
+        self.knots = knots
+
+    def predict(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.model == "power":
+            return self.coefficients[0] * (x + POWER_LAW_SHIFT) ** self.coefficients[1]
+        if self.model == "spline":
+            return np.interp(x, self.knots, self.coefficients)  # Constant outside the knots
+        return np.polyval(self.coefficients, x)
+
+    def __repr__(self):
+        return (f"CalibrationFit({self.pair}: {self.model}, R^2={self.r2:.4f}, RMSE={self.rmse:.3g}, "
+                f"CV RMSE={self.cv_rmse:.3g})")
+
+
+# --- Design matrices ---
+def design_matrices(x, y, lo, width):
+    """
+    Basis functions and targets of all models, padded to _P parameters.
+
+    Polynomials and the spline use x scaled to [0, 1] over the series range for conditioning;
+    the power law is linear in log space.
+
+    Returns:
+        tuple: (phi (n, models, _P), target (n, models))
+    """
+    n = len(x)
+    u = (x - lo) / width
+    phi = np.zeros((n, len(MODELS), _P))
+    target = np.repeat(y[:, None], len(MODELS), axis=1)
+
+    powers = u[:, None] ** np.arange(4)
+    for m, degree in ((0, 1), (1, 2), (2, 3)):
+        phi[:, m, :degree + 1] = powers[:, :degree + 1]
+
+    phi[:, 3, 0] = 1.0
+    phi[:, 3, 1] = np.log(np.maximum(x + POWER_LAW_SHIFT, 1e-12))
+    target[:, 3] = np.log(np.maximum(y, 1e-12))
+
+    # Hat functions of a linear spline with equally spaced knots on [0, 1]
+    position = np.clip(u, 0.0, 1.0) * (SPLINE_KNOTS - 1)
+    left = np.minimum(position.astype(int), SPLINE_KNOTS - 2)
+    frac = position - left
+    rows = np.arange(n)
+    phi[rows, 4, left] = 1.0 - frac
+    phi[rows, 4, left + 1] = frac
+    return phi, target
+
+
+def _monotone_knots(values, weights, increasing):
+    """
+    Weighted isotonic regression of the spline knot values, vectorized over the leading axes.
+
+    Uses the max-min formula f_j = max_{i<=j} min_{k>=j} mean(v[i..k]), which for a handful of
+    knots is cheaper than running the pool-adjacent-violators loop per fit.
+    """
+    sign = np.where(increasing, 1.0, -1.0)[..., None]
+    v = values * sign
+    cw = np.concatenate([np.zeros(weights.shape[:-1] + (1,)), np.cumsum(weights, axis=-1)], axis=-1)
+    cwv = np.concatenate([np.zeros(v.shape[:-1] + (1,)), np.cumsum(weights * v, axis=-1)], axis=-1)
+    # Interval means A[..., i, k] over knots i..k (only i <= k is used)
+    i, k = np.indices((SPLINE_KNOTS, SPLINE_KNOTS))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (cwv[..., None, 1:] - cwv[..., :-1, None]) / (cw[..., None, 1:] - cw[..., :-1, None])
+    mean = np.where(i <= k, mean, np.inf)
+    fitted = np.empty_like(v)
+    for j in range(SPLINE_KNOTS):
+        fitted[..., j] = np.max(np.min(mean[..., :j + 1, j:], axis=-1), axis=-1)
+    return fitted * sign
+
+
+def raw_polynomial(coeffs_u, lo, width):
+    """Converts coefficients in u = (x - lo) / width (lowest power first) to raw x, highest first."""
+    degree = coeffs_u.shape[-1] - 1
+    transform = np.zeros(lo.shape + (degree + 1, degree + 1))
+    for k in range(degree + 1):
+        for j in range(k + 1):
+            transform[..., j, k] = comb(k, j) * (-lo) ** (k - j) / width ** k
+    return np.einsum("...jk,...k->...j", transform, coeffs_u)[..., ::-1]
+
+
+# --- Batched fitting ---
+def fit_calibration_batch(datasets, pairs=SENSOR_PAIRS, folds=CV_FOLDS):
+    """
+    Fits every model to every sensor pair of every dataset and picks the best one per pair.
+
+    All series (dataset x pair) are concatenated, the normal equations of all models, all CV folds
+    and the full fit are accumulated with one bincount, and everything is solved with a single
+    batched np.linalg.solve. Held-out predictions of the k folds (samples dealt to folds in order
+    of x, so every fold spans the whole range) give the cross-validated RMSE.
+
+    A series with fewer samples than folds is cross-validated leave-one-out. One that cannot
+    determine any model that way but has at least two distinct x levels gets the linear fit
+    without CV (cv_rmse NaN); with fewer levels its fit is None.
+
+    Args:
+        datasets (list): DataFrames with the columns named in pairs (missing columns count as empty).
+        pairs (dict): Pair name -> (x column, y column).
+        folds (int): Number of cross-validation folds.
+
+    Returns:
+        tuple: (best, scores)
+            best (list): Per dataset, dict pair -> CalibrationFit (None below two distinct x levels);
+                empty, like scores, for no datasets.
+            scores (pd.DataFrame): R^2, RMSE, CV RMSE and validity of every model and series.
+    """
+    if not datasets:
+        return [], pd.DataFrame(columns=["dataset", "pair", "model", "r2", "rmse", "cv_rmse", "valid", "best"])
+    pair_names = list(pairs)
+    series_x, series_y = [], []
+    columns = list(dict.fromkeys(col for pair in pairs.values() for col in pair))
+    for df in datasets:
+        values = {col: df[col].to_numpy(dtype=float) if col in df else np.full(len(df), np.nan) for col in columns}
+        for name in pair_names:
+            x_col, y_col = pairs[name]
+            valid = ~(np.isnan(values[x_col]) | np.isnan(values[y_col]))
+            series_x.append(values[x_col][valid])
+            series_y.append(values[y_col][valid])
+
+    n_series = len(series_x)
+    lengths = np.array([len(x) for x in series_x])
+    x = np.concatenate(series_x)
+    y = np.concatenate(series_y)
+    series = np.repeat(np.arange(n_series), lengths)
+
+    # Sort by x within each series and deal the samples to the folds
+    order = np.lexsort((x, series))
+    x, y = x[order], y[order]
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    fold = (np.arange(len(x)) - starts[series]) % folds
+
+    lo = np.full(n_series, np.nan)
+    hi = np.full(n_series, np.nan)
+    present = lengths > 0
+    lo[present] = np.minimum.reduceat(x, starts[present])
+    hi[present] = np.maximum.reduceat(x, starts[present])
+    width = np.where(hi > lo, hi - lo, 1.0)
+    new_level = np.r_[True, (np.diff(x) != 0) | (np.diff(series) != 0)]
+    distinct = np.bincount(series, weights=new_level, minlength=n_series)
+
+    phi, target = design_matrices(x, y, lo[series], width[series])
+    n_models = len(MODELS)
+
+    # Normal equations per (series, fold, model) in one bincount (float even if every series is empty,
+    # where bincount returns integers)
+    outer = phi[:, :, :, None] * phi[:, :, None, :]
+    segment = series * folds + fold
+    q = n_models * _P * _P
+    gram = np.bincount((segment[:, None] * q + np.arange(q)).ravel(), weights=outer.reshape(-1),
+                       minlength=n_series * folds * q).astype(float).reshape(n_series, folds, n_models, _P, _P)
+    r = n_models * _P
+    rhs = np.bincount((segment[:, None] * r + np.arange(r)).ravel(),
+                      weights=(phi * target[:, :, None]).reshape(-1),
+                      minlength=n_series * folds * r).astype(float).reshape(n_series, folds, n_models, _P)
+    counts = np.bincount(segment, minlength=n_series * folds).reshape(n_series, folds)
+
+    # Index 0: full fit, 1..folds: fit without that fold
+    gram = np.concatenate([gram.sum(axis=1, keepdims=True), gram.sum(axis=1, keepdims=True) - gram], axis=1)
+    rhs = np.concatenate([rhs.sum(axis=1, keepdims=True), rhs.sum(axis=1, keepdims=True) - rhs], axis=1)
+    n_fit = np.concatenate([lengths[:, None], lengths[:, None] - counts], axis=1)
+
+    # Unused padding parameters get an identity block so they solve to 0
+    for m, name in enumerate(MODELS):
+        used = SPLINE_KNOTS if name == "spline" else MODEL_PARAMS[name]
+        gram[..., m, np.arange(used, _P), np.arange(used, _P)] = 1.0
+    second_diff = np.diff(np.eye(SPLINE_KNOTS), 2, axis=0)
+    penalty = np.zeros((_P, _P))
+    penalty[:SPLINE_KNOTS, :SPLINE_KNOTS] = second_diff.T @ second_diff
+    gram[..., 4, :, :] += SPLINE_SMOOTHING * n_fit[..., None, None] * penalty
+    ridge = 1e-10 * np.trace(gram, axis1=-2, axis2=-1)[..., None, None] * np.eye(_P) + 1e-12 * np.eye(_P)
+
+    coeffs = np.linalg.solve(gram + ridge, rhs[..., None])[..., 0]  # (series, 1 + folds, models, _P)
+
+    # Monotone spline, in the direction of the linear trend of the same fit
+    spline_weights = np.diagonal(gram[..., 4, :SPLINE_KNOTS, :SPLINE_KNOTS], axis1=-2, axis2=-1) + 1e-9
+    coeffs[..., 4, :SPLINE_KNOTS] = _monotone_knots(coeffs[..., 4, :SPLINE_KNOTS], spline_weights,
+                                                    coeffs[..., 0, 1] >= 0)
+
+    # In-sample and held-out predictions
+    fitted = np.einsum("nmp,nmp->nm", phi, coeffs[series, 0])
+    held_out = np.einsum("nmp,nmp->nm", phi, coeffs[series, 1 + fold])
+    fitted[:, 3] = np.exp(fitted[:, 3])
+    held_out[:, 3] = np.exp(held_out[:, 3])
+    residuals = y[:, None] - fitted
+
+    def per_series(values):
+        return np.stack([np.bincount(series, weights=values[:, m], minlength=n_series)
+                         for m in range(n_models)], axis=1)
+
+    safe_lengths = np.maximum(lengths, 1)[:, None]
+    sse = per_series(residuals ** 2)
+    cv_sse = per_series((y[:, None] - held_out) ** 2)
+    y_mean = np.bincount(series, weights=y, minlength=n_series) / safe_lengths[:, 0]
+    sst = np.bincount(series, weights=(y - y_mean[series]) ** 2, minlength=n_series)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(sst > 0, 1.0 - sse / sst, np.nan)
+    rmse = np.sqrt(sse / safe_lengths)
+    cv_rmse = np.sqrt(cv_sse / safe_lengths)
+
+    # A model is only eligible where the data can actually determine it. A series shorter than
+    # `folds` has one sample per fold (leave-one-out), so every held-out fit still needs enough levels
+    needed = np.array([MODEL_PARAMS.get(name, 2) for name in MODELS])
+    valid = (distinct[:, None] >= needed) & ((lengths[:, None] >= folds) | (distinct[:, None] > needed))
+    min_y = np.full(n_series, np.nan)
+    min_y[present] = np.minimum.reduceat(y, starts[present])
+    valid[:, 3] &= (min_y > 0) & (lo + POWER_LAW_SHIFT > 0)
+    valid &= np.isfinite(cv_rmse)
+
+    # Too short for any cross-validated model (e.g. two weights): the linear fit, without CV RMSE
+    no_cv = ~valid.any(axis=1) & (distinct >= MODEL_PARAMS["linear"])
+    valid[no_cv, MODELS.index("linear")] = True
+    cv_rmse[no_cv] = np.nan
+
+    # Best model: lowest CV RMSE, the simplest one within PARSIMONY_TOLERANCE of it
+    masked = np.where(valid & np.isfinite(cv_rmse), cv_rmse, np.inf)
+    within = masked <= masked.min(axis=1, keepdims=True) * (1.0 + PARSIMONY_TOLERANCE)
+    best_model = np.where(no_cv, MODELS.index("linear"), np.argmax(within, axis=1))
+
+    raw_poly = raw_polynomial(coeffs[:, 0, :3, :4], lo[:, None], width[:, None])  # (series, 3, 4)
+    knots = lo[:, None] + np.linspace(0.0, 1.0, SPLINE_KNOTS) * width[:, None]
+    residual_split = np.split(residuals, np.cumsum(lengths)[:-1])
+
+    best = []
+    for s in range(n_series):
+        if s % len(pair_names) == 0:
+            best.append({})
+        pair = pair_names[s % len(pair_names)]
+        if not valid[s].any():
+            best[-1][pair] = None
+            continue
+        m = best_model[s]
+        name = MODELS[m]
+        if name == "power":
+            coefficients = [np.exp(coeffs[s, 0, 3, 0]), coeffs[s, 0, 3, 1]]
+        elif name == "spline":
+            coefficients = coeffs[s, 0, 4, :SPLINE_KNOTS]
+        else:
+            coefficients = raw_poly[s, m, 3 - MODEL_PARAMS[name] + 1:]
+        best[-1][pair] = CalibrationFit(pair, name, coefficients, (lo[s], hi[s]), r2[s, m], rmse[s, m],
+                                        cv_rmse[s, m], residual_split[s][:, m],
+                                        knots[s] if name == "spline" else None)
+
+    scores = pd.DataFrame({
+        "dataset": np.repeat(np.arange(n_series) // len(pair_names), n_models),
+        "pair": np.repeat([pair_names[s % len(pair_names)] for s in range(n_series)], n_models),
+        "model": np.tile(MODELS, n_series),
+        "r2": r2.ravel(),
+        "rmse": rmse.ravel(),
+        "cv_rmse": cv_rmse.ravel(),
+        "valid": valid.ravel(),
+        "best": (np.arange(n_models)[None, :] == best_model[:, None]).ravel() & valid.ravel(),
+    })
+    return best, scores
+
+
+def fit_calibration_files(paths, pairs=SENSOR_PAIRS, folds=CV_FOLDS):
+    """Reads calibration CSVs (weight_g, fsr_value, tof_distance_mm, optionally POT columns) and fits them in one batch."""
+    datasets = [pd.read_csv(path) for path in paths]
+    return fit_calibration_batch(datasets, pairs, folds)
+
+
+def summary_table(best, names=None):
+    """One row per dataset and pair with the selected model and its metrics."""
+    rows = []
+    for i, fits in enumerate(best):
+        for pair, fit in fits.items():
+            rows.append({
+                "dataset": names[i] if names else i,
+                "pair": pair,
+                "model": fit.model if fit else None,
+                "coefficients": np.array2string(fit.coefficients, precision=4) if fit else None,
+                "r2": fit.r2 if fit else np.nan,
+                "rmse": fit.rmse if fit else np.nan,
+                "cv_rmse": fit.cv_rmse if fit else np.nan,
+            })
+    return pd.DataFrame(rows)
+
+
+# --- Benchmark ---
+def benchmark(csv_file_path, n_files=500, seed=0):
+    """Times the batch fit on n_files perturbed copies of one calibration file."""
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(csv_file_path)
+    datasets = []
+    for _ in range(n_files):
+        df = base.copy()
+        df["fsr_value"] = df["fsr_value"] * rng.normal(1.0, 0.05) + rng.normal(0.0, 5.0, len(df))
+        df["tof_distance_mm"] = np.round(df["tof_distance_mm"] + rng.normal(0.0, 1.0) + rng.normal(0.0, 0.5, len(df)))
+        datasets.append(df)
+
+    fit_calibration_batch(datasets[:2])  # Warm-up
+    start = time.perf_counter()
+    best, scores = fit_calibration_batch(datasets)
+    batched = time.perf_counter() - start
+
+    # Baseline: the three quadratic curve_fit calls of BLE_Force_mapping.py, without any CV
+    from scipy.optimize import curve_fit
+    baseline_files = datasets[:50]
+    start = time.perf_counter()
+    for df in baseline_files:
+        for x_col, y_col in SENSOR_PAIRS.values():
+            if x_col not in df or y_col not in df:
+                continue
+            curve_fit(lambda x, a, b, c: a * x**2 + b * x + c, df[x_col], df[y_col])
+    per_file = (time.perf_counter() - start) / len(baseline_files)
+
+    print(f"{n_files} files x {len(SENSOR_PAIRS)} pairs x {len(MODELS)} models, {CV_FOLDS}-fold CV: "
+          f"{batched * 1e3:.0f} ms ({batched / n_files * 1e6:.0f} us per file)")
+    print(f"curve_fit, quadratic only: {per_file * 1e6:.0f} us per file ({per_file * n_files * 1e3:.0f} ms for {n_files})")
+    print("Selected models:")
+    print(summary_table(best).groupby("pair")["model"].value_counts().to_string())
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_fitting.py [calibration.csv | glob ...] [--benchmark]
+    args = [a for a in sys.argv[1:] if a != "--benchmark"]
+    paths = [p for pattern in args for p in sorted(glob.glob(pattern))] or \
+        ["DataAnalysis/ForceMapper/Real_calibration_data_ble.csv"]
+    best, scores = fit_calibration_files(paths)
+    with pd.option_context("display.width", 160, "display.max_colwidth", 60):
+        print(scores.round(4).to_string(index=False))
+        print()
+        print(summary_table(best, paths).round(4).to_string(index=False))
+    if "--benchmark" in sys.argv:
+        benchmark(paths[0])
@@ -0,0 +1,231 @@
+import sys
+import time
+
+import numpy as np
+
+from calibration_fitting import POWER_LAW_SHIFT, CalibrationFit
+
+# --- Configuration ---
+DEFAULT_TABLE_SIZE = 4096    # Points of the dense inverse table
+OUT_OF_RANGE_POLICIES = ("clip", "nan", "extrapolate")
+
+# Status codes returned with return_status=True
+OK = 0
+BELOW_RANGE = 1   # Weight below the calibrated range
+ABOVE_RANGE = 2   # Weight above the calibrated range
+SATURATED = 3     # Reading beyond the extremum of a non-monotone curve, no weight on the branch
+AMBIGUOUS = 4     # Reading inside the range that a weight past the extremum would also produce
+INVALID = 5       # NaN or infinite reading
+STATUS_NAMES = ("ok", "below range", "above range", "saturated", "ambiguous", "invalid")
+
+
+class InverseCalibration:
+    """
+    Weight (x) from sensor readings (y) for whole arrays.
+
+    The inverse is taken on the branch of the forward model that starts at the low end of the
+    calibrated range. If the curve turns inside the range (the FSR quadratic peaks near 92 g), the
+    branch ends at the extremum: readings beyond it are SATURATED, readings that a weight past the
+    extremum would also produce are flagged AMBIGUOUS.
+
+    Linear, quadratic and power-law models are inverted in closed form; any model (and these too,
+    for speed) can use a dense table on a uniform reading grid, looked up by index arithmetic
+    instead of a binary search.
+
+    Args:
+        fit (CalibrationFit): Forward model (see calibration_fitting.py). A ValueError is raised if
+            it is flat (not invertible) on its branch.
+        out_of_range (str): 'clip' to the branch ends, 'nan', or 'extrapolate' with the model.
+        table_size (int): Use a dense table with this many points, None for the closed form.
+    """
+
+    def __init__(self, fit, out_of_range="clip", table_size=None):
+        if out_of_range not in OUT_OF_RANGE_POLICIES:
+            raise ValueError(f"out_of_range must be one of {OUT_OF_RANGE_POLICIES}")
+        self.fit = fit
+        self.out_of_range = out_of_range
+        self.x_lo, self.x_hi = (float(v) for v in fit.x_range)
+        self._find_branch()
+        # A flat branch (e.g. a == b == 0, a zero power-law exponent) maps every weight to one reading
+        if not (np.isfinite(self.y_start) and np.isfinite(self.y_end)) or self.y_start == self.y_end:
+            raise ValueError(f"The {fit.model} fit of {fit.pair} is flat over {self.x_lo:g}..{self.branch_end:g}, "
+                             "readings cannot be converted to weights")
+        self.table = None
+        if table_size or fit.model not in ("linear", "quadratic", "power"):
+            self.build_table(table_size or DEFAULT_TABLE_SIZE)
+
+    @classmethod
+    def from_quadratic(cls, coeffs, x_range, **kwargs):
+        """Inverse of sensor = a*w^2 + b*w + c (np.polyfit order) calibrated over x_range."""
+        return cls(CalibrationFit("sensor_vs_weight", "quadratic", coeffs, x_range, np.nan, np.nan, np.nan, None),
+                   **kwargs)
+
+    def _find_branch(self):
+        """End of the monotone branch starting at x_lo, and the direction of the curve on it."""
+        self.branch_end = self.x_hi
+        if self.fit.model in ("linear", "quadratic"):
+            coeffs = np.r_[np.zeros(3 - len(self.fit.coefficients)), self.fit.coefficients]
+            self.a, self.b, self.c = coeffs
+            if self.a != 0:
+                vertex = -self.b / (2 * self.a)
+                if self.x_lo < vertex < self.x_hi:
+                    self.branch_end = vertex
+        elif self.fit.model != "power":
+            x = np.linspace(self.x_lo, self.x_hi, 8 * DEFAULT_TABLE_SIZE)
+            step = np.sign(np.diff(self.fit.predict(x)))
+            nonzero = step[step != 0]
+            turn = np.flatnonzero(step == -nonzero[0]) if len(nonzero) else []
+            if len(turn):
+                self.branch_end = x[turn[0]]
+
+        self.y_start, self.y_end = (float(v) for v in self.fit.predict(np.array([self.x_lo, self.branch_end])))
+        self.increasing = self.y_end >= self.y_start
+        self.non_monotone = self.branch_end < self.x_hi
+        self.y_far = float(self.fit.predict(self.x_hi))  # Reading at the top of the range
+
+    def build_table(self, size=DEFAULT_TABLE_SIZE):
+        """Precomputes the dense table: x at `size` evenly spaced readings along the branch."""
+        x = np.linspace(self.x_lo, self.branch_end, 8 * size)
+        y = self.fit.predict(x)
+        if not self.increasing:
+            x, y = x[::-1], y[::-1]
+        y_grid = np.linspace(y[0], y[-1], size)
+        x_grid = np.interp(y_grid, y, x)
+        self.table = (y_grid, x_grid)
+        self._table_scale = (size - 1) / (y_grid[-1] - y_grid[0]) if y_grid[-1] > y_grid[0] else 0.0
+        self._table_slope = np.r_[np.diff(x_grid), 0.0]
+        return self.table
+
+    # --- Inversion ---
+    def _closed_form(self, y):
+        """Root on the branch, NaN where there is none."""
+        if self.fit.model == "power":
+            amplitude, exponent = self.fit.coefficients
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return (y / amplitude) ** (1.0 / exponent) - POWER_LAW_SHIFT
+        a, b, c = self.a, self.b, self.c
+        if a == 0:
+            return (y - c) / b
+        # Root on the same side of the vertex as x_lo: w = vertex + side * sqrt(D) / (2|a|),
+        # evaluated in the form without cancellation
+        vertex = -b / (2 * a)
+        side = 1.0 if vertex <= self.x_lo else -1.0
+        sigma = side * np.sign(a)
+        c_shift = c - y
+        with np.errstate(invalid="ignore"):
+            root_d = np.sqrt(b * b - 4 * a * c_shift)  # NaN if there is no real root
+        if sigma == np.sign(b):
+            return 2 * c_shift / (-b - sigma * root_d)
+        return (-b + sigma * root_d) / (2 * a)
+
+    def _table_lookup(self, y):
+        """Linear interpolation in the uniform table, clamped to its ends (NaN maps to the start)."""
+        y_grid, x_grid = self.table
+        t = np.fmin(np.fmax((y - y_grid[0]) * self._table_scale, 0.0), len(y_grid) - 1)
+        i = t.astype(np.int32)
+        return x_grid[i] + (t - i) * self._table_slope[i]
+
+    def weight(self, values, return_status=False):
+        """
+        Converts readings to weights.
+
+        Args:
+            values (array-like): Sensor readings, any shape.
+            return_status (bool): Also return the status code per reading (see STATUS_NAMES).
+
+        Returns:
+            np.ndarray: Weights in grams (or tuple (weights, status) with return_status).
+        """
+        y = np.asarray(values, dtype=float)
+        if y.ndim == 0:
+            x, status = self.weight(y[None], return_status=True)
+            return (x[0], status[0]) if return_status else x[0]
+        direction = 1.0 if self.increasing else -1.0
+        before = (y - self.y_start) * direction < 0
+        beyond = (y - self.y_end) * direction > 0
+        outside = before | beyond
+
+        if self.table is not None:
+            x = self._table_lookup(y)  # Already clipped to the branch
+            if self.out_of_range == "extrapolate" and np.any(outside):
+                closed_form = self.fit.model in ("linear", "quadratic", "power")
+                x[outside] = self._closed_form(y[outside]) if closed_form else np.nan
+        else:
+            x = self._closed_form(y)
+            if self.out_of_range == "clip":
+                x[before] = self.x_lo
+                x[beyond] = self.branch_end
+        if self.out_of_range == "nan":
+            x[outside] = np.nan
+        elif self.non_monotone:
+            x[beyond & np.isnan(x)] = np.nan if self.out_of_range == "extrapolate" else self.branch_end
+        x[~np.isfinite(y)] = np.nan
+
+        if not return_status:
+            return x
+        status = np.zeros(y.shape, dtype=np.uint8)
+        status[before] = BELOW_RANGE
+        status[beyond] = SATURATED if self.non_monotone else ABOVE_RANGE
+        if self.non_monotone:
+            status[~outside & ((y - self.y_far) * direction >= 0)] = AMBIGUOUS
+        status[~np.isfinite(y)] = INVALID
+        return x, status
+
+    __call__ = weight
+
+
+def status_counts(status):
+    """Number of readings per status name."""
+    counts = np.bincount(status.ravel(), minlength=len(STATUS_NAMES))
+    return {name: int(n) for name, n in zip(STATUS_NAMES, counts) if n}
+
+
+# --- Benchmark ---
+def benchmark(csv_file_path, n_samples=10_000_000, seed=0):
+    """Converts n_samples synthetic FSR and ToF readings to grams with every method."""
+    import pandas as pd
+    from calibration_fitting import fit_calibration_batch
+
+    best, _ = fit_calibration_batch([pd.read_csv(csv_file_path)])
+    rng = np.random.default_rng(seed)
+    true_weight = rng.uniform(-5.0, 110.0, n_samples)
+
+    for pair in ("fsr_vs_weight", "tof_vs_weight"):
+        fit = best[0][pair]
+        readings = (fit.predict(true_weight) + rng.normal(0.0, fit.rmse, n_samples)).astype(np.float32)
+        print(f"\n{pair} ({fit.model}, calibrated {fit.x_range[0]:g}-{fit.x_range[1]:g} g), "
+              f"{n_samples:,} readings")
+
+        # Baseline: np.roots per reading, timed on a slice
+        slice_n = 10_000
+        start = time.perf_counter()
+        for value in readings[:slice_n]:
+            roots = np.roots(fit.coefficients - np.r_[np.zeros(len(fit.coefficients) - 1), value])
+            roots = roots[np.isreal(roots)].real
+        per_sample = (time.perf_counter() - start) / slice_n
+        print(f"  {'np.roots per sample':<24}{per_sample * n_samples:>9.2f} s (extrapolated)")
+
+        closed = InverseCalibration(fit)
+        tabled = InverseCalibration(fit, table_size=DEFAULT_TABLE_SIZE)
+        table_y, table_x = tabled.table
+        methods = [("closed form", lambda v: closed.weight(v, return_status=True)),
+                   ("dense table", lambda v: tabled.weight(v, return_status=True)),
+                   ("np.interp on the table", lambda v: np.interp(v, table_y, table_x))]
+        results = {}
+        for name, method in methods:
+            start = time.perf_counter()
+            results[name] = method(readings)
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<24}{elapsed:>9.2f} s ({n_samples / elapsed / 1e6:.0f} M samples/s)")
+
+        weights, status = results["closed form"]
+        table_error = np.abs(results["dense table"][0] - weights)[status == OK]
+        print(f"  table vs closed form (status ok): max {table_error.max():.2e} g, "
+              f"99.9th percentile {np.percentile(table_error, 99.9):.2e} g")
+        print(f"  status: {status_counts(status)}")
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_inverse.py [calibration.csv] [n_samples]
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "DataAnalysis/ForceMapper/Real_calibration_data_ble.csv",
+              int(float(sys.argv[2])) if len(sys.argv) > 2 else 10_000_000)
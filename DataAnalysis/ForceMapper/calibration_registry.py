@@ -0,0 +1,241 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from calibration_fitting import SENSOR_PAIRS, CalibrationFit, fit_calibration_batch
+from calibration_inverse import InverseCalibration
+
+# --- Configuration ---
+REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_registry.npz")
+REGISTRY_FORMAT = 1
+LUT_SIZE = 1024              # Points of each precomputed inverse lookup table
+MAX_COEFFICIENTS = 5         # Cubic: 4, spline: SPLINE_KNOTS
+UNKNOWN_FIRMWARE = "unknown"  # Devices without a Firmware Revision String
+
+# Device Information Service "Firmware Revision String" characteristic
+FIRMWARE_REVISION_UUID = "00002a26-0000-1000-8000-00805f9b34fb"
+
+
+class CalibrationRecord:
+    """
+    One calibration version of one device.
+
+    Args:
+        address (str): BLE address of the device.
+        firmware (str): Firmware version the calibration was taken with.
+        version (int): Calibration version for this device and firmware, starting at 1.
+        fits (dict): Pair name -> CalibrationFit (see calibration_fitting.py).
+        luts (dict): Pair name -> (y grid, x grid) inverse lookup table, y ascending.
+        created (str): Time of registration.
+        source (str): Where the calibration data came from (e.g. the CSV file).
+    """
+
+    def __init__(self, address, firmware, version, fits, luts, created, source=None):
+        self.address = address
+        self.firmware = firmware
+        self.version = version
+        self.fits = fits
+        self.luts = luts
+        self.created = created
+        self.source = source
+
+    def weight_from(self, pair, values):
+        """Inverts a sensor pair with its lookup table, e.g. weight_from('tof_vs_weight', tof)."""
+        y_grid, x_grid = self.luts[pair]
+        return np.interp(values, y_grid, x_grid)
+
+    def __repr__(self):
+        models = ", ".join(f"{pair}={fit.model}" for pair, fit in self.fits.items())
+        return f"CalibrationRecord({self.address}, fw {self.firmware}, v{self.version}: {models})"
+
+
+def inverse_lut(fit, size=LUT_SIZE):
+    """
+    Lookup table from y back to x over the monotone branch of the fit that starts at the low end
+    of the calibrated range (see calibration_inverse.InverseCalibration).
+
+    Returns:
+        tuple: (y grid ascending, matching x grid) as float32 arrays, all NaN for a flat fit
+        (no weight can be read back from it, weight_from returns NaN).
+    """
+    try:
+        y_grid, x_grid = InverseCalibration(fit).build_table(size)
+    except ValueError:
+        y_grid = x_grid = np.full(size, np.nan)
+    return y_grid.astype(np.float32), x_grid.astype(np.float32)
+
+
+class CalibrationRegistry:
+    """
+    Versioned calibrations of all devices, keyed by (address, firmware version).
+
+    The file is a single .npz with a JSON index and three stacked arrays (coefficients, spline
+    knots and inverse lookup tables), so reading it is a handful of array loads. Use
+    load_registry() instead of the constructor to share one in-memory copy per file.
+    """
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self.pairs = list(SENSOR_PAIRS)
+        self.records = {}  # (address, firmware) -> [CalibrationRecord, ...] by version
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with np.load(self.path) as data:
+            index = json.loads(str(data["index"]))
+            coefficients = data["coefficients"]
+            knots = data["knots"]
+            luts = data["luts"]
+        if index["format"] != REGISTRY_FORMAT:
+            raise ValueError(f"{self.path}: unsupported registry format {index['format']}")
+
+        self.pairs = index["pairs"]
+        for row, entry in enumerate(index["records"]):
+            fits, record_luts = {}, {}
+            for p, pair in enumerate(self.pairs):
+                meta = entry["fits"].get(pair)
+                if meta is None:
+                    continue
+                n = meta["n_coefficients"]
+                fits[pair] = CalibrationFit(pair, meta["model"], coefficients[row, p, :n], tuple(meta["x_range"]),
+                                            meta["r2"], meta["rmse"], meta["cv_rmse"], residuals=None,
+                                            knots=knots[row, p, :n] if meta["model"] == "spline" else None)
+                record_luts[pair] = (luts[row, p, 0], luts[row, p, 1])
+            record = CalibrationRecord(entry["address"], entry["firmware"], entry["version"], fits, record_luts,
+                                       entry["created"], entry.get("source"))
+            self.records.setdefault((record.address, record.firmware), []).append(record)
+        for versions in self.records.values():
+            versions.sort(key=lambda r: r.version)
+
+    def save(self):
+        """Writes the whole registry (atomically, through a temporary file)."""
+        records = [r for versions in self.records.values() for r in versions]
+        coefficients = np.full((len(records), len(self.pairs), MAX_COEFFICIENTS), np.nan)
+        knots = np.full_like(coefficients, np.nan)
+        luts = np.zeros((len(records), len(self.pairs), 2, LUT_SIZE), dtype=np.float32)
+        entries = []
+        for row, record in enumerate(records):
+            fits_meta = {}
+            for p, pair in enumerate(self.pairs):
+                fit = record.fits.get(pair)
+                if fit is None:
+                    continue
+                n = len(fit.coefficients)
+                coefficients[row, p, :n] = fit.coefficients
+                if fit.knots is not None:
+                    knots[row, p, :n] = fit.knots
+                luts[row, p] = record.luts[pair]
+                fits_meta[pair] = {"model": fit.model, "n_coefficients": n,
+                                   "x_range": [float(v) for v in fit.x_range],
+                                   "r2": float(fit.r2), "rmse": float(fit.rmse), "cv_rmse": float(fit.cv_rmse)}
+            entries.append({"address": record.address, "firmware": record.firmware, "version": record.version,
+                            "created": record.created, "source": record.source, "fits": fits_meta})
+
+        index = {"format": REGISTRY_FORMAT, "pairs": self.pairs, "records": entries}
+        tmp_path = self.path + ".tmp.npz"
+        np.savez_compressed(tmp_path, index=np.array(json.dumps(index)), coefficients=coefficients,
+                            knots=knots, luts=luts)
+        os.replace(tmp_path, self.path)
+        _cache[self.path] = (os.path.getmtime(self.path), self)
+
+    def register(self, address, firmware, fits, source=None, save=True):
+        """
+        Adds a new calibration version for a device.
+
+        Args:
+            address (str): BLE address.
+            firmware (str): Firmware version, UNKNOWN_FIRMWARE if the device does not report one.
+            fits (dict): Pair name -> CalibrationFit (None entries are skipped).
+            source (str): Origin of the data, stored for reference.
+            save (bool): Write the file right away.
+
+        Returns:
+            CalibrationRecord: The new record.
+        """
+        key = (address.upper(), firmware or UNKNOWN_FIRMWARE)
+        versions = self.records.setdefault(key, [])
+        fits = {pair: fit for pair, fit in fits.items() if fit is not None}
+        self.pairs += [pair for pair in fits if pair not in self.pairs]  # e.g. POT pairs in an older registry
+        luts = {pair: inverse_lut(fit) for pair, fit in fits.items()}
+        record = CalibrationRecord(key[0], key[1], versions[-1].version + 1 if versions else 1, fits, luts,
+                                   time.strftime("%Y-%m-%d %H:%M:%S"), source)
+        versions.append(record)
+        if save:
+            self.save()
+        return record
+
+    def register_csv(self, address, firmware, csv_file_path, save=True):
+        """Fits a calibration CSV (see calibration_fitting.py) and registers the best models."""
+        best, _ = fit_calibration_batch([pd.read_csv(csv_file_path)])
+        return self.register(address, firmware, best[0], source=os.path.basename(csv_file_path), save=save)
+
+    def get(self, address, firmware=None, version=None):
+        """
+        Calibration of a device, None if it has never been calibrated.
+
+        Without a firmware version the most recently created record of the device is used (any
+        firmware); without a version the latest version.
+        """
+        address = address.upper()
+        if firmware is None:
+            candidates = [v[-1] for (a, _), v in self.records.items() if a == address]
+            return max(candidates, key=lambda r: r.created) if candidates else None
+        versions = self.records.get((address, firmware), [])
+        if version is None:
+            return versions[-1] if versions else None
+        return next((r for r in versions if r.version == version), None)
+
+    def devices(self):
+        """One row per (device, firmware) with the latest version and its models."""
+        rows = []
+        for (address, firmware), versions in sorted(self.records.items()):
+            latest = versions[-1]
+            row = {"address": address, "firmware": firmware, "versions": len(versions), "created": latest.created}
+            row.update({pair: f"{fit.model} (R^2 {fit.r2:.3f})" for pair, fit in latest.fits.items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+async def read_firmware_version(client):
+    """Firmware Revision String of a connected BleakClient, UNKNOWN_FIRMWARE if not exposed."""
+    try:
+        value = await client.read_gatt_char(FIRMWARE_REVISION_UUID)
+        return bytes(value).decode(errors="replace").strip("\x00 ") or UNKNOWN_FIRMWARE
+    except Exception:
+        return UNKNOWN_FIRMWARE
+
+
+# --- In-memory cache ---
+_cache = {}  # path -> (mtime at load, CalibrationRegistry)
+
+
+def load_registry(path=REGISTRY_FILE):
+    """Returns the registry for path, reading the file only if it changed since the last call."""
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    cached = _cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, CalibrationRegistry(path))
+        _cache[path] = cached
+    return cached[1]
+
+
+def lookup_calibration(address, firmware=None, path=REGISTRY_FILE):
+    """Latest calibration of a device through the in-memory cache, None if unknown."""
+    return load_registry(path).get(address, firmware)
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_registry.py                                 (list devices)
+    #        python calibration_registry.py ADDRESS FIRMWARE calibration.csv (register a calibration)
+    if len(sys.argv) == 4:
+        record = load_registry().register_csv(*sys.argv[1:])
+        print(f"Registered {record}")
+    start = time.perf_counter()
+    registry = CalibrationRegistry()
+    print(f"Loaded {REGISTRY_FILE} in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    print(registry.devices().to_string(index=False) if registry.records else "No calibrations registered.")
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # Render to files only: no display needed, nothing blocks
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from calibration_bootstrap import bootstrap_polynomial, weight_uncertainty
+from calibration_fitting import POT_REFERENCES
+
+# --- Configuration ---
+IMAGE_FORMAT = "png"
+DPI = 120
+FIGURE_SIZE = (10, 6)
+PLOT_STYLE = "seaborn-v0_8-darkgrid"
+N_BOOTSTRAP = 500  # Resamples for the confidence bands (figures only need the 2.5/97.5 % quantiles)
+
+# Scatter + quadratic fit figures: name -> (x column, y column, title, x label, y label, point colour, fit colour)
+FIT_FIGURES = {
+    "fsr_vs_weight": ("weight_g", "fsr_value", "FSR Value vs. Applied Weight",
+                      "Applied Weight (g)", "FSR Analog Value (0-4095)", "blue", "red"),
+    "tof_vs_weight": ("weight_g", "tof_distance_mm", "ToF Distance vs. Applied Weight",
+                      "Applied Weight (g)", "ToF Distance (mm)", "green", "orange"),
+    "fsr_vs_tof": ("tof_distance_mm", "fsr_value", "FSR Value vs. ToF Distance",
+                   "ToF Distance (mm)", "FSR Analog Value (0-4095)", "purple", "brown"),
+    "pot_vs_angle": ("angle_deg", "pot_value", "POT Value vs. Finger Angle",
+                     "Finger Angle (deg)", "POT Analog Value (0-4095)", "teal", "crimson"),
+    "pot_vs_extension": ("extension_mm", "pot_value", "POT Value vs. Rope Extension",
+                         "Rope Extension (mm)", "POT Analog Value (0-4095)", "olive", "crimson"),
+}
+FIGURES = tuple(FIT_FIGURES) + ("residuals", "weight_uncertainty")
+
+
+def available_figures(df, figures=FIGURES):
+    """The figures the data can fill: fit figures need their columns (the POT ones a reference)."""
+    def has_data(name):
+        x_col, y_col = FIT_FIGURES[name][:2]
+        return x_col in df.columns and y_col in df.columns and df[[x_col, y_col]].notna().all(axis=1).any()
+    return tuple(name for name in figures if name not in FIT_FIGURES or has_data(name))
+
+
+# --- Figures ---
+def _fit_figure(df, name):
+    x_col, y_col, title, x_label, y_label, color, fit_color = FIT_FIGURES[name]
+    group_col = x_col if x_col in POT_REFERENCES else "weight_g"
+    data = df[list(dict.fromkeys([x_col, y_col, group_col]))].dropna()
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    ax.scatter(data[x_col], data[y_col], color=color, label='Data Points', alpha=0.7)
+    if data[group_col].nunique() >= 3:
+        result = bootstrap_polynomial(data[x_col], data[y_col], groups=data[group_col], n_boot=N_BOOTSTRAP)
+        r_squared = np.corrcoef(data[y_col], np.polyval(result["coefficients"], data[x_col]))[0, 1] ** 2
+        ax.plot(result["x"], result["curve"], color=fit_color, linestyle='--',
+                label=f'Quadratic Fit ($R^2$: {r_squared:.2f})')
+        ax.fill_between(result["x"], *result["curve_ci"], color=fit_color, alpha=0.2, label='95% Confidence Band')
+    ax.set_title(title, fontsize=16)
+    ax.set_xlabel(x_label, fontsize=12)
+    ax.set_ylabel(y_label, fontsize=12)
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend()
+    return fig
+
+
+def _residuals_figure(df):
+    names = [name for name in available_figures(df) if name in FIT_FIGURES]
+    fig, axes = plt.subplots(1, len(names), figsize=(FIGURE_SIZE[0] * 1.5, FIGURE_SIZE[1] * 0.7), squeeze=False)
+    for ax, name in zip(axes[0], names):
+        x_col, y_col, title, x_label, y_label, color, _ = FIT_FIGURES[name]
+        data = df[[x_col, y_col]].dropna()
+        if data[x_col].nunique() >= 3:
+            coeffs = np.polyfit(data[x_col], data[y_col], 2)
+            ax.scatter(data[x_col], data[y_col] - np.polyval(coeffs, data[x_col]), color=color, alpha=0.7)
+        ax.axhline(0.0, color='black', linewidth=0.8)
+        ax.set_title(f"Residuals: {name}", fontsize=12)
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(y_label)
+    return fig
+
+
+def _weight_uncertainty_figure(df):
+    fig, ax = plt.subplots(figsize=FIGURE_SIZE)
+    for name in ("fsr_vs_weight", "tof_vs_weight"):
+        x_col, y_col, _, _, _, color, _ = FIT_FIGURES[name]
+        data = df[[x_col, y_col]].dropna()
+        if data[x_col].nunique() < 3:
+            continue
+        result = bootstrap_polynomial(data[x_col], data[y_col], n_boot=N_BOOTSTRAP)
+        grams = weight_uncertainty(result)
+        ax.plot(result["x"], np.where(np.isfinite(grams), grams, np.nan), color=color, label=name)
+    ax.set_yscale('log')
+    ax.set_title('Weight Uncertainty along the Calibration (95% half-width)', fontsize=16)
+    ax.set_xlabel('Applied Weight (g)', fontsize=12)
+    ax.set_ylabel('Weight Uncertainty (g)', fontsize=12)
+    ax.grid(True, linestyle='--', alpha=0.6)
+    ax.legend()
+    return fig
+
+
+def render_figure(csv_file_path, name, output_path, dpi=DPI):
+    """
+    Renders one figure of a calibration CSV to an image file. Runs in a worker process.
+
+    Returns:
+        tuple: (output_path, error message or None)
+    """
+    try:
+        df = pd.read_csv(csv_file_path)
+        with plt.style.context(PLOT_STYLE):
+            if name in FIT_FIGURES:
+                fig = _fit_figure(df, name)
+            elif name == "residuals":
+                fig = _residuals_figure(df)
+            elif name == "weight_uncertainty":
+                fig = _weight_uncertainty_figure(df)
+            else:
+                raise ValueError(f"unknown figure '{name}', expected one of {FIGURES}")
+            fig.tight_layout()
+            fig.savefig(output_path, dpi=dpi)
+        plt.close(fig)
+        return output_path, None
+    except Exception as e:
+        return output_path, f"{type(e).__name__}: {e}"
+
+
+# --- Report stage ---
+def report_paths(csv_file_path, figures=FIGURES, output_directory=None, image_format=IMAGE_FORMAT):
+    """Image file of every figure: next to the CSV by default, e.g. calibration_data_ble_fsr_vs_weight.png."""
+    stem = os.path.splitext(os.path.basename(csv_file_path))[0]
+    directory = output_directory or os.path.dirname(os.path.abspath(csv_file_path))
+    return {name: os.path.join(directory, f"{stem}_{name}.{image_format}") for name in figures}
+
+
+def write_calibration_reports(csv_file_paths, figures=FIGURES, output_directory=None, image_format=IMAGE_FORMAT,
+                              max_workers=None):
+    """
+    Renders the figures of one or more calibration CSVs in a process pool.
+
+    Every (file, figure) pair is an independent task, so a single calibration already spreads its
+    figures over the workers and a batch keeps all of them busy. Figures a file has no data for
+    (e.g. the POT without reference angles) are left out.
+
+    Args:
+        csv_file_paths (list): Calibration CSVs.
+        figures (tuple): Names from FIGURES.
+        output_directory (str): Where to write the images, None to write them next to each CSV.
+        image_format (str): Any format matplotlib can save (png, svg, pdf).
+        max_workers (int): Worker processes, defaults to the number of CPUs; 1 renders in-process.
+
+    Returns:
+        tuple: (written image paths, list of (path, error) for the figures that failed)
+    """
+    tasks = []
+    for csv_file_path in csv_file_paths:
+        try:
+            file_figures = available_figures(pd.read_csv(csv_file_path), figures)
+        except Exception:
+            file_figures = figures  # Unreadable: render_figure reports the error per figure
+        tasks += [(csv_file_path, name, path) for name, path
+                  in report_paths(csv_file_path, file_figures, output_directory, image_format).items()]
+    if output_directory:
+        os.makedirs(output_directory, exist_ok=True)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks)) or 1
+    if max_workers == 1:
+        results = [render_figure(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(render_figure, *zip(*tasks)))
+    written = [path for path, error in results if error is None]
+    failed = [(path, error) for path, error in results if error is not None]
+    return written, failed
+
+
+def write_calibration_report(csv_file_path, figures=FIGURES, output_directory=None, max_workers=None):
+    """Report stage of one calibration: renders its figures and prints where they went."""
+    start = time.perf_counter()
+    written, failed = write_calibration_reports([csv_file_path], figures, output_directory, max_workers=max_workers)
+    for path, error in failed:
+        print(f"Could not render {path}: {error}")
+    print(f"Wrote {len(written)} figures in {time.perf_counter() - start:.2f} s:")
+    for path in written:
+        print(f"  {path}")
+    return written
+
+
+if __name__ == "__main__":
+    # Usage: python calibration_report.py <calibration.csv | directory | glob> [...] [--output DIR] [--workers N]
+    from calibration_batch import find_calibration_files
+    args = sys.argv[1:]
+
+    def option(name, default=None):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    output_directory = option("--output")
+    workers = option("--workers")
+    paths = find_calibration_files(args or ["DataAnalysis/ForceMapper/Real_calibration_data_ble.csv"])
+    if not paths:
+        print("No calibration files found.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    written, failed = write_calibration_reports(paths, output_directory=output_directory,
+                                                max_workers=int(workers) if workers else None)
+    elapsed = time.perf_counter() - start
+    for path, error in failed:
+        print(f"Could not render {path}: {error}")
+    print(f"Report: {len(written)} figures for {len(paths)} file(s) in {elapsed:.2f} s "
+          f"({elapsed / max(len(paths), 1) * 1e3:.0f} ms per file, {len(failed)} failed)")
@@ -0,0 +1,159 @@
+import csv
+import math
+import os
+import time
+
+# --- Configuration ---
+SESSION_DIR = "."  # Where in-progress session files are kept
+# One calibration row: the references (weight, POT angle or extension) and the decoded channels
+SAMPLE_COLUMNS = ["weight_g", "fsr_value", "tof_distance_mm", "pot_value", "angle_deg", "extension_mm"]
+CHANNEL_COLUMNS = ["fsr_value", "tof_distance_mm", "pot_value"]
+SESSION_COLUMNS = ["step", "step_samples"] + SAMPLE_COLUMNS + ["captured_at"]
+# Files written before the POT was recorded have only these; they are still read and appended to
+REQUIRED_SESSION_COLUMNS = ["step", "step_samples", "weight_g", "fsr_value", "tof_distance_mm"]
+
+
+def session_path(device_address, directory=SESSION_DIR):
+    """In-progress session file of a device, e.g. calibration_session_68F7B8E3A694.csv."""
+    return os.path.join(directory, f"calibration_session_{device_address.replace(':', '').upper()}.csv")
+
+
+def sample_rows(weight, samples, references=None):
+    """Calibration rows (all SAMPLE_COLUMNS, NaN where unknown) of the frames of one step."""
+    rows = []
+    for sample in samples:
+        row = {column: math.nan for column in SAMPLE_COLUMNS}
+        row.update(references or {})
+        row["weight_g"] = weight
+        row.update((channel, sample[channel]) for channel in CHANNEL_COLUMNS if channel in sample)
+        rows.append(row)
+    return rows
+
+
+def _format(value):
+    """CSV cell of a session row, empty for a missing value."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value)
+
+
+class CalibrationSession:
+    """
+    Append-only record of the completed weight steps of one calibration.
+
+    Every step is written as one block of CSV rows and flushed to disk (fsync) before the next
+    weight is requested, so a crash, a BLE error or Ctrl-C loses at most the step in progress.
+    Each row carries its step number and the number of rows of that step: when the file is opened
+    again, a step cut short by a crash is detected and cut off (truncate, no rewrite) and the
+    calibration resumes after the last complete step.
+
+    Args:
+        path (str): Session file, created on the first step.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.steps = []   # (step number, weight_g) of the complete steps
+        self.rows = []    # Samples of the complete steps, as in calibration_data
+        self.columns = SESSION_COLUMNS  # Those of the file when resuming an older one
+        self.recovered_bytes = 0
+        self._file = None
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            content = f.read()
+
+        valid_end = 0
+        offset = 0
+        pending = []
+        header_seen = False
+        for raw_line in content.splitlines(keepends=True):
+            offset += len(raw_line)
+            if not raw_line.endswith(b"\n"):
+                break  # Last line was cut off mid-write
+            line = raw_line.decode(errors="replace").strip()
+            if not header_seen:
+                self.columns = line.split(",")
+                header_seen = all(column in self.columns for column in REQUIRED_SESSION_COLUMNS)
+                if not header_seen:
+                    raise ValueError(f"{self.path} is not a calibration session file")
+                valid_end = offset
+                continue
+            try:
+                values = next(csv.reader([line]))
+                if len(values) != len(self.columns):
+                    break
+                row = dict(zip(self.columns, values))
+                step, step_samples = int(row["step"]), int(row["step_samples"])
+                sample = {column: float(row[column]) if row.get(column) else math.nan for column in SAMPLE_COLUMNS}
+            except (StopIteration, KeyError, ValueError):
+                break
+            if pending and pending[0][0] != step:
+                break  # A new step started before the previous one was complete
+            pending.append((step, step_samples, sample))
+            if len(pending) == step_samples:
+                self.steps.append((step, sample["weight_g"]))
+                self.rows.extend(s for _, _, s in pending)
+                pending = []
+                valid_end = offset
+
+        self.recovered_bytes = len(content) - valid_end
+        if self.recovered_bytes:
+            # Drop the incomplete step so the next one is appended after a clean line
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+        if valid_end == 0:
+            os.remove(self.path)
+
+    @property
+    def next_step(self):
+        return self.steps[-1][0] + 1 if self.steps else 1
+
+    def append_step(self, weight, samples, step=None, references=None):
+        """
+        Writes the samples of one completed weight step and forces them to disk.
+
+        Args:
+            weight (float): Applied weight in grams.
+            samples (list): Dicts with 'fsr_value', 'tof_distance_mm' and 'pot_value'.
+            step (int): Step number (e.g. the protocol step), defaults to the next one.
+            references (dict): POT reference of the step, e.g. {'angle_deg': 30.0}.
+
+        Returns:
+            int: The step number.
+        """
+        if self._file is None:
+            new_file = not os.path.exists(self.path)
+            self._file = open(self.path, "a", newline="")
+            if new_file:
+                self._file.write(",".join(self.columns) + "\n")
+        step = self.next_step if step is None else step
+        rows = sample_rows(weight, samples, references)
+        fields = {"step": step, "step_samples": len(samples), "captured_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        block = "".join(",".join(_format({**row, **fields}.get(column)) for column in self.columns) + "\n"
+                        for row in rows)
+        self._file.write(block)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self.steps.append((step, weight))
+        self.rows.extend(rows)
+        return step
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """Closes and removes the session file once the calibration has been exported."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def discard(self):
+        """Forgets the recorded steps and removes the file, to start the calibration over."""
+        self.finish()
+        self.steps, self.rows = [], []
@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+
+# --- Configuration ---
+DEGREE = 2                   # Quadratic, like the calibration fits
+WEIGHT_SCALE = 100.0         # Weights are fitted in units of 100 g to keep P well conditioned
+INITIAL_COVARIANCE = 1e6     # Large P0: the (almost) unregularised least-squares solution
+PREDICTION_Z = 1.96          # 95% prediction interval
+CURVE_POINTS = 50            # Grid the curve change between steps is measured on
+
+# The curve has converged once a step changes it (anywhere over the weights seen) by less than
+# this, for CONVERGED_STEPS steps in a row
+CONVERGENCE_TOLERANCE = {"fsr_value": 5.0, "tof_distance_mm": 0.5}
+CONVERGED_STEPS = 2
+LIVE_FIT_CHANNELS = ("fsr_value", "tof_distance_mm")
+
+
+class RecursiveLeastSquares:
+    """
+    Polynomial least-squares fit updated one sample at a time.
+
+    Each update is a rank-one correction of the (p x p) inverse normal matrix P and of the
+    coefficients, so it costs O(p^2) regardless of how many samples came before (p = degree + 1).
+    The residual sum of squares is updated exactly from the a-priori error, which gives the
+    residual variance and the prediction interval without revisiting old samples.
+
+    Args:
+        degree (int): Polynomial degree.
+        x_scale (float): x is divided by this before fitting.
+        initial_covariance (float): Diagonal of the initial P.
+    """
+
+    def __init__(self, degree=DEGREE, x_scale=WEIGHT_SCALE, initial_covariance=INITIAL_COVARIANCE):
+        self.p = degree + 1
+        self.x_scale = x_scale
+        self.theta = np.zeros(self.p)                # Coefficients in increasing powers of x / x_scale
+        self.P = np.eye(self.p) * initial_covariance
+        self.n = 0
+        self.rss = 0.0
+        self.x_min, self.x_max = math.inf, -math.inf
+
+    def _regressor(self, x):
+        return (x / self.x_scale) ** np.arange(self.p)
+
+    def update(self, x, y):
+        """Adds one sample (x, y) in O(p^2)."""
+        phi = self._regressor(x)
+        P_phi = self.P @ phi
+        denominator = 1.0 + phi @ P_phi
+        error = y - phi @ self.theta                 # A-priori error
+        gain = P_phi / denominator
+        self.theta = self.theta + gain * error
+        self.P = self.P - np.outer(gain, P_phi)
+        self.rss += error * error / denominator
+        self.n += 1
+        self.x_min, self.x_max = min(self.x_min, x), max(self.x_max, x)
+
+    @property
+    def residual_variance(self):
+        dof = self.n - self.p
+        return self.rss / dof if dof > 0 else math.inf
+
+    def coefficients(self):
+        """Coefficients in np.polyfit order (highest power first), in unscaled x."""
+        return (self.theta / self.x_scale ** np.arange(self.p))[::-1]
+
+    def predict(self, x, interval=False, theta=None):
+        """
+        Fitted value at x (scalar or array); with interval=True also the half-width of the
+        PREDICTION_Z prediction interval for a new reading. theta evaluates earlier coefficients
+        (a copy of self.theta) instead of the current ones.
+        """
+        x = np.asarray(x, dtype=float)
+        phi = (x[..., None] / self.x_scale) ** np.arange(self.p)
+        y = phi @ (self.theta if theta is None else theta)
+        if not interval:
+            return y
+        leverage = np.einsum("...i,ij,...j->...", phi, self.P, phi)
+        return y, PREDICTION_Z * np.sqrt(self.residual_variance * (1.0 + leverage))
+
+
+class LiveFitPreview:
+    """
+    Live calibration curves (sensor vs weight) for the operator, updated with every sample.
+
+    After each weight step, step_done() measures how much the step moved each curve over the
+    weights seen so far; once every channel moved less than CONVERGENCE_TOLERANCE for
+    CONVERGED_STEPS steps in a row (with at least DEGREE + 1 weight levels), the curve is
+    reported as converged and the calibration can be stopped.
+
+    Args:
+        channels (tuple): Sensor columns to fit against weight_g.
+    """
+
+    def __init__(self, channels=LIVE_FIT_CHANNELS, degree=DEGREE):
+        self.degree = degree
+        self.fits = {channel: RecursiveLeastSquares(degree) for channel in channels}
+        self.weights = set()
+        self.stable_steps = 0
+        self.last_change = {}
+        self._previous_thetas = None
+
+    def update(self, weight, sample):
+        """Adds one sample (dict with the channel values) taken at weight (grams), O(1)."""
+        self.weights.add(weight)
+        for channel, fit in self.fits.items():
+            fit.update(weight, sample[channel])
+
+    def update_many(self, rows):
+        """Adds recorded rows (dicts with weight_g and the channels), e.g. a resumed session."""
+        for row in rows:
+            self.update(row["weight_g"], row)
+        if rows:
+            self.step_done()
+
+    def step_done(self):
+        """
+        Call after each weight step: updates the convergence state.
+
+        The fits before and after the step are both evaluated on the current weight range, so a
+        step that extends the range compares the old curve extrapolated there with the new one.
+        """
+        if not self.weights:
+            return
+        grid = np.linspace(min(self.weights), max(self.weights), CURVE_POINTS)
+        if self._previous_thetas is not None and len(self.weights) > self.degree:
+            previous = self._previous_thetas
+            self.last_change = {channel: float(np.max(np.abs(fit.predict(grid) - fit.predict(grid, theta=previous[channel]))))
+                                for channel, fit in self.fits.items()}
+            within = all(change < CONVERGENCE_TOLERANCE.get(channel, 0.0)
+                         for channel, change in self.last_change.items())
+            self.stable_steps = self.stable_steps + 1 if within else 0
+        self._previous_thetas = {channel: fit.theta.copy() for channel, fit in self.fits.items()}
+
+    @property
+    def converged(self):
+        return self.stable_steps >= CONVERGED_STEPS
+
+    def describe(self):
+        """One line per channel: current curve, prediction interval and change at the last step."""
+        lines = []
+        for channel, fit in self.fits.items():
+            if fit.n <= fit.p or len(self.weights) <= self.degree:
+                lines.append(f"{channel}: {fit.n} samples at {len(self.weights)} weight(s), "
+                             f"need {self.degree + 1} weights for a curve")
+                continue
+            terms = " ".join(f"{c:+.4g}" + (f" w^{k}" if k > 1 else " w" if k == 1 else "")
+                             for k, c in zip(range(fit.p - 1, -1, -1), fit.coefficients()))
+            _, half_width = fit.predict(np.array([min(self.weights), max(self.weights)]), interval=True)
+            change = self.last_change.get(channel)
+            lines.append(f"{channel} = {terms}  (95% prediction +/-{half_width.max():.3g}"
+                         + (f", last step moved it {change:.3g}" if change is not None else "") + ")")
+        if self.converged:
+            lines.append(f"Curve stable for {self.stable_steps} steps: further weights barely change it.")
+        return lines
@@ -0,0 +1,74 @@
+from collections import deque
+
+import numpy as np
+
+# --- Configuration ---
+SAMPLE_PERIOD_S = 0.05   # Firmware send_delay, used to express slopes per second
+PLATEAU_WINDOW = 10      # Frames in the rolling window (0.5 s at 20 Hz)
+
+# A channel has settled when, over the window, both its standard deviation and its
+# least-squares slope stay below these limits
+PLATEAU_LIMITS = {
+    "fsr_value": {"max_std": 8.0, "max_slope": 20.0},        # FSR units, FSR units/s
+    "tof_distance_mm": {"max_std": 1.5, "max_slope": 4.0},   # mm, mm/s
+}
+
+# Minimum move away from the previous plateau (in multiples of max_std) before a new weight
+# counts as applied
+CHANGE_FACTOR = 4.0
+
+
+class PlateauDetector:
+    """
+    Detects when the FSR and ToF readings have settled after a weight change.
+
+    Feed every frame to update(); it returns True once the rolling variance and slope of all
+    channels are within PLATEAU_LIMITS. If a previous plateau level is given, the signal must
+    first have moved away from it, so a weight that has not been applied yet is not mistaken for
+    a settled one.
+
+    Args:
+        previous_level (dict): Channel means of the previous plateau, or None.
+        window (int): Frames in the rolling window.
+        limits (dict): Channel -> {'max_std', 'max_slope'}.
+        dt (float): Seconds between frames.
+    """
+
+    def __init__(self, previous_level=None, window=PLATEAU_WINDOW, limits=PLATEAU_LIMITS, dt=SAMPLE_PERIOD_S):
+        self.limits = limits
+        self.window = window
+        self.previous_level = previous_level
+        self.changed = previous_level is None
+        self.buffers = {channel: deque(maxlen=window) for channel in limits}
+        # Least-squares slope over a fixed window is a dot product with centred sample times
+        times = (np.arange(window) - (window - 1) / 2.0) * dt
+        self._slope_weights = times / np.sum(times ** 2)
+        self.frames_seen = 0
+
+    def update(self, sample):
+        """
+        Adds one frame (dict with the channel values).
+
+        Returns:
+            bool: True if the signal has settled.
+        """
+        self.frames_seen += 1
+        for channel, buffer in self.buffers.items():
+            buffer.append(sample[channel])
+        if len(self.buffers[next(iter(self.buffers))]) < self.window:
+            return False
+
+        stable = True
+        for channel, buffer in self.buffers.items():
+            values = np.fromiter(buffer, dtype=float, count=self.window)
+            limit = self.limits[channel]
+            if not self.changed:
+                moved = abs(values.mean() - self.previous_level[channel]) > CHANGE_FACTOR * limit["max_std"]
+                self.changed = self.changed or moved
+            if values.std() > limit["max_std"] or abs(values @ self._slope_weights) > limit["max_slope"]:
+                stable = False
+        return stable and self.changed
+
+    def level(self):
+        """Channel means over the current window."""
+        return {channel: float(np.mean(buffer)) for channel, buffer in self.buffers.items()}
@@ -2,6 +2,8 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from game_log import CALIBRATION_COLUMNS, propagate_calibration_bounds, repair_shifted_rows
+
 def plot_sensor_data_subplots(csv_file):
     """
     Plots FSR vs time, POT vs time, and ToF vs time from sensor data
@@ -27,6 +29,9 @@ def plot_sensor_data_subplots(csv_file):
         print(f"Error: The CSV file must contain all of the following columns: {required_columns}")
         return
 
+    # Rows the Unity logger wrote one field short carry their LogType in 'MaxTof'
+    repair_shifted_rows(df)
+
     # Convert 'Timestamp' to datetime objects for proper time-series plotting
     try:
         df['Timestamp'] = pd.to_datetime(df['Timestamp'])
@@ -36,19 +41,9 @@ def plot_sensor_data_subplots(csv_file):
     # Sort by Timestamp to ensure correct forward fill of calibration data
     df = df.sort_values(by='Timestamp').reset_index(drop=True)
 
-    # Define columns that hold calibration boundary values
-    calibration_value_cols = ['MinFsr', 'MaxFsr', 'MinPot', 'MaxPot', 'MinTof', 'MaxTof']
-    
-    # Create new columns for propagated calibration values
-    # Initialize them by setting non-calibration rows to NaN for these specific columns
-    for col in calibration_value_cols:
-        df[f'Propagated_{col}'] = df.apply(
-            lambda row: row[col] if row['LogType'] == 'CalibrationData' else pd.NA, axis=1
-        )
-    
-    # Forward fill the propagated calibration columns.
-    # This will carry forward the last seen calibration value until a new one appears.
-    df[[f'Propagated_{col}' for col in calibration_value_cols]] = df[[f'Propagated_{col}' for col in calibration_value_cols]].ffill()
+    # Carry each calibration's boundary values forward until the next calibration (see game_log.py)
+    propagated = propagate_calibration_bounds(df, CALIBRATION_COLUMNS)
+    df[propagated.columns] = propagated
 
     # Filter SensorData for plotting (it now implicitly carries the propagated calibration values)
     Sensor_df = df[df['LogType'] == 'SensorData'].copy()
@@ -0,0 +1,122 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+LOG_COLUMNS = ['Timestamp', 'SceneName', 'FSR', 'POT', 'ToF', 'MouthState',
+               'MinPot', 'MaxPot', 'MinFsr', 'MaxFsr', 'MinTof', 'MaxTof', 'LogType']
+CALIBRATION_COLUMNS = ['MinPot', 'MaxPot', 'MinFsr', 'MaxFsr', 'MinTof', 'MaxTof']
+LOG_TYPES = ('SceneLoad', 'CalibrationData', 'SensorData')
+
+
+# --- Layout ---
+def repair_shifted_rows(df):
+    """
+    Fixes the rows the Unity logger writes one field short, in place.
+
+    SensorData and CalibrationData rows lack one field, so pandas puts their log type into
+    'MaxTof'. SensorData rows miss an (empty) bound, CalibrationData rows the (empty)
+    MouthState, which moves their bounds one column to the left. Files in the full layout are
+    returned unchanged.
+
+    Returns:
+        pd.DataFrame: df, with 'LogType' set on every row and the bounds of calibration rows realigned.
+    """
+    shifted = df['LogType'].isna() & df['MaxTof'].isin(LOG_TYPES)
+    if not shifted.any():
+        return df
+    df['LogType'] = df['LogType'].where(~shifted, df['MaxTof'])
+    calibration = shifted & (df['LogType'] == 'CalibrationData')
+    df['MaxTof'] = df['MaxTof'].mask(shifted)
+    bounds = df[CALIBRATION_COLUMNS].apply(pd.to_numeric, errors='coerce').astype(float)
+    if calibration.any():
+        realigned = df.loc[calibration, ['MouthState'] + CALIBRATION_COLUMNS[:-1]]
+        bounds.loc[calibration] = realigned.apply(pd.to_numeric, errors='coerce').to_numpy()
+        df.loc[calibration, 'MouthState'] = np.nan
+    df[CALIBRATION_COLUMNS] = bounds
+    return df
+
+
+# --- Calibration bounds ---
+def propagate_calibration_bounds(df, columns=CALIBRATION_COLUMNS, log_type=None):
+    """
+    Carries the bounds of every CalibrationData row forward until the next one.
+
+    Selects the calibration rows once for all columns (a boolean mask instead of one Python call
+    per row and column), spreads them back over the full index and forward fills, so the work is
+    a few vectorized passes regardless of the number of bound columns. Rows before the first
+    calibration are NaN, like a calibration value that is missing itself (the previous one is
+    carried over it).
+
+    Args:
+        df (pd.DataFrame): Game log sorted by time, with a unique index.
+        columns (list): Bound columns to propagate.
+        log_type (pd.Series): Log type per row, defaults to df['LogType'].
+
+    Returns:
+        pd.DataFrame: Float columns 'Propagated_<column>' on the index of df.
+    """
+    log_type = df['LogType'] if log_type is None else log_type
+    is_calibration = (log_type == 'CalibrationData').to_numpy()
+    bounds = df.loc[is_calibration, list(columns)].apply(pd.to_numeric, errors='coerce')
+    return bounds.reindex(df.index).ffill().add_prefix('Propagated_')
+
+
+def propagate_calibration_bounds_rowwise(df, columns=CALIBRATION_COLUMNS):
+    """Previous implementation (one df.apply per column), kept as the benchmark baseline."""
+    propagated = pd.DataFrame(index=df.index)
+    for col in columns:
+        propagated[f'Propagated_{col}'] = df.apply(
+            lambda row: row[col] if row['LogType'] == 'CalibrationData' else pd.NA, axis=1
+        )
+    return propagated.ffill()
+
+
+# --- Benchmark ---
+def synthetic_game_log(n_rows, calibration_every=50_000, scene_every=20_000, seed=0):
+    """Game log with ~30 Hz SensorData, a scene change and a recalibration every so many rows."""
+    rng = np.random.default_rng(seed)
+    log_type = np.full(n_rows, 'SensorData', dtype=object)
+    log_type[::scene_every] = 'SceneLoad'
+    log_type[1::calibration_every] = 'CalibrationData'
+    is_sensor = log_type == 'SensorData'
+    is_calibration = log_type == 'CalibrationData'
+
+    df = pd.DataFrame({
+        'Timestamp': pd.Timestamp('2025-05-27 10:45:30') + pd.to_timedelta(np.arange(n_rows) * 33, unit='ms'),
+        'SceneName': np.where(np.arange(n_rows) // scene_every % 2 == 0, 'Main Menu', 'Rungame'),
+    })
+    for name, center, spread in (('FSR', 1500.0, 300.0), ('POT', 1900.0, 400.0), ('ToF', 30.0, 10.0)):
+        df[name] = np.where(is_sensor, np.round(center + spread * rng.standard_normal(n_rows)), np.nan)
+    df['MouthState'] = np.where(is_sensor, np.where(rng.random(n_rows) < 0.5, 'Open', 'Closed'), None)
+    for name, center in zip(CALIBRATION_COLUMNS, (600.0, 3300.0, 980.0, 1970.0, 12.0, 58.0)):
+        df[name] = np.where(is_calibration, np.round(center + rng.normal(0.0, 20.0, n_rows), 2), np.nan)
+    df['LogType'] = log_type
+    return df
+
+
+def benchmark(sizes=(1_000_000, 10_000_000), baseline_rows=100_000):
+    """Times the vectorized propagation against the row-wise one (extrapolated from baseline_rows)."""
+    sample = synthetic_game_log(baseline_rows)
+    start = time.perf_counter()
+    expected = propagate_calibration_bounds_rowwise(sample)
+    rowwise_per_row = (time.perf_counter() - start) / baseline_rows
+    expected = expected.apply(pd.to_numeric, errors='coerce').to_numpy()
+    same = np.allclose(expected, propagate_calibration_bounds(sample).to_numpy(), equal_nan=True)
+    print(f"Row-wise and vectorized results identical on {baseline_rows:,} rows: {same}")
+
+    for n_rows in sizes:
+        df = synthetic_game_log(n_rows)
+        start = time.perf_counter()
+        propagate_calibration_bounds(df)
+        elapsed = time.perf_counter() - start
+        rowwise = rowwise_per_row * n_rows
+        print(f"{n_rows:>12,} rows: vectorized {elapsed:.3f} s ({n_rows / elapsed / 1e6:.0f} M rows/s), "
+              f"row-wise {rowwise:.0f} s (extrapolated), {rowwise / elapsed:.0f}x faster")
+
+
+if __name__ == "__main__":
+    # Usage: python game_log.py [n_rows ...]
+    benchmark(tuple(int(float(n)) for n in sys.argv[1:]) or (1_000_000, 10_000_000))
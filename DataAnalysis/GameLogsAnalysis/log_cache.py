@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # Without pyarrow every load parses the CSV
+    pa = None
+
+from game_log import CALIBRATION_COLUMNS, LOG_COLUMNS, repair_shifted_rows
+
+# --- Configuration ---
+CACHE_FORMAT = "feather"      # "feather" (fastest reload) or "parquet" (smaller file)
+CACHE_EXTENSIONS = {"feather": ".feather", "parquet": ".parquet"}
+CACHE_VERSION = 2             # Bump when the schema changes: older caches are rebuilt
+CACHE_METADATA_KEY = b"recover_log_cache"
+HASH_BLOCK_BYTES = 1 << 20
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# Explicit schema of a parsed game log
+CATEGORY_COLUMNS = ['SceneName', 'MouthState', 'LogType']
+SENSOR_COLUMNS = ['FSR', 'POT', 'ToF']    # float32: the readings fit exactly, they fill most rows
+BOUND_COLUMNS = CALIBRATION_COLUMNS       # float64: the bounds have decimals float32 would alter
+# What read_csv parses the text as. Calibration rows put a bound into MouthState and short rows
+# their log type into MaxTof (see game_log.repair_shifted_rows), so those stay text until the
+# rows are realigned
+CSV_DTYPES = {'SceneName': 'category', 'MouthState': str, 'LogType': str, 'MaxTof': str,
+              **{column: np.float32 for column in SENSOR_COLUMNS},
+              **{column: np.float64 for column in BOUND_COLUMNS if column != 'MaxTof'}}
+
+
+# --- Parsing ---
+def parse_game_log(csv_file_path):
+    """
+    Parses a game log with the explicit schema.
+
+    Timestamps use TIMESTAMP_FORMAT (no format inference), SceneName / MouthState / LogType
+    become categoricals, the sensor columns float32 and the calibration bounds float64 (their
+    decimals, e.g. 592.79, are kept as written).
+
+    Returns:
+        pd.DataFrame: Columns LOG_COLUMNS, typed.
+    """
+    df = pd.read_csv(csv_file_path, dtype=CSV_DTYPES, skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+    repair_shifted_rows(df)
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format=TIMESTAMP_FORMAT)
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category').cat.remove_unused_categories()
+    df['MaxTof'] = pd.to_numeric(df['MaxTof'], errors='coerce')
+    df[SENSOR_COLUMNS] = df[SENSOR_COLUMNS].astype(np.float32)
+    df[BOUND_COLUMNS] = df[BOUND_COLUMNS].astype(np.float64)
+    return df[LOG_COLUMNS]
+
+
+# --- Cache ---
+def cache_path(csv_file_path, cache_format=CACHE_FORMAT):
+    """Cache file next to the CSV, e.g. test2.csv -> test2.feather."""
+    return os.path.splitext(csv_file_path)[0] + CACHE_EXTENSIONS[cache_format]
+
+
+def file_hash(path):
+    """BLAKE2b of the file contents, read in blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(csv_file_path, content_hash=None):
+    """Identity of the CSV: size, modification time, content hash and the schema version."""
+    stat = os.stat(csv_file_path)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash or file_hash(csv_file_path)}
+
+
+def _read_cache(path, cache_format):
+    """(DataFrame, stored key), or (None, None) if there is no readable cache."""
+    if pa is None or not os.path.exists(path):
+        return None, None
+    try:
+        table = feather.read_table(path) if cache_format == "feather" else pq.read_table(path)
+        key = json.loads((table.schema.metadata or {}).get(CACHE_METADATA_KEY, b"null"))
+        return table.to_pandas(), key
+    except Exception as e:
+        print(f"Ignoring unreadable cache '{path}': {e}")
+        return None, None
+
+
+def _write_cache(df, path, key, cache_format):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[CACHE_METADATA_KEY] = json.dumps(key).encode()
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = path + ".tmp"
+    if cache_format == "feather":
+        feather.write_feather(table, tmp_path, compression="lz4")
+    else:
+        pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def load_game_log(csv_file_path, use_cache=True, cache_format=CACHE_FORMAT):
+    """
+    Loads a game log, from its columnar cache when the CSV has not changed.
+
+    The cache is valid if its schema version matches and the CSV has the stored size and
+    modification time. If only the modification time differs (the file was copied or touched),
+    the content hash decides, and a matching cache is re-stamped instead of rebuilt. Otherwise the
+    CSV is parsed (parse_game_log) and the cache rewritten.
+
+    Args:
+        csv_file_path (str): Game log CSV.
+        use_cache (bool): False parses the CSV and leaves the cache alone.
+        cache_format (str): 'feather' or 'parquet'.
+
+    Returns:
+        pd.DataFrame: Typed game log (see parse_game_log).
+    """
+    if not use_cache or pa is None:
+        return parse_game_log(csv_file_path)
+    path = cache_path(csv_file_path, cache_format)
+    df, stored = _read_cache(path, cache_format)
+    stat = os.stat(csv_file_path)
+    if df is not None and stored and stored.get("version") == CACHE_VERSION and stored.get("size") == stat.st_size:
+        if stored.get("mtime_ns") == stat.st_mtime_ns:
+            return df
+        content_hash = file_hash(csv_file_path)
+        if stored.get("hash") == content_hash:
+            _write_cache(df, path, cache_key(csv_file_path, content_hash), cache_format)
+            return df
+
+    df = parse_game_log(csv_file_path)
+    try:
+        _write_cache(df, path, cache_key(csv_file_path), cache_format)
+    except OSError as e:
+        print(f"Could not write the cache '{path}': {e}")
+    return df
+
+
+# --- Benchmark ---
+def _legacy_load(csv_file_path):
+    """How DataAnalysis.py parses a log: strip every text column, infer the timestamp format, coerce."""
+    df = pd.read_csv(csv_file_path)
+    df.columns = df.columns.str.strip()
+    df = df.apply(lambda col: col.str.strip() if col.dtype == 'object' else col)
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    for column in ['FSR', 'POT', 'ToF'] + CALIBRATION_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+def benchmark(n_rows=2_000_000, path="benchmark_game_log.csv"):
+    """Load time and in-memory size: text parsing against the typed parse and the cache reloads."""
+    from log_stream import write_synthetic_log
+
+    write_synthetic_log(path, n_rows)
+    print(f"{path}: {n_rows:,} rows, {os.path.getsize(path) / 1e6:.0f} MB")
+    runs = [("CSV, as DataAnalysis.py parses it", lambda: _legacy_load(path)),
+            ("CSV, explicit schema (cache miss)", lambda: parse_game_log(path))]
+    for cache_format in CACHE_EXTENSIONS:
+        runs.append((f"{cache_format} cache, first load", lambda f=cache_format: load_game_log(path, cache_format=f)))
+        runs.append((f"{cache_format} cache, reload", lambda f=cache_format: load_game_log(path, cache_format=f)))
+    try:
+        for name, run in runs:
+            start = time.perf_counter()
+            df = run()
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<36}{elapsed:>7.2f} s, {df.memory_usage(deep=True).sum() / 1e6:>6.0f} MB in memory")
+        for cache_format in CACHE_EXTENSIONS:
+            print(f"  {cache_format} file: {os.path.getsize(cache_path(path, cache_format)) / 1e6:.0f} MB")
+    finally:
+        for p in [path] + [cache_path(path, f) for f in CACHE_EXTENSIONS]:
+            if os.path.exists(p):
+                os.remove(p)
+
+
+if __name__ == "__main__":
+    # Usage: python log_cache.py [game_log.csv ...] [--benchmark N_ROWS]
+    if "--benchmark" in sys.argv:
+        i = sys.argv.index("--benchmark")
+        benchmark(int(float(sys.argv[i + 1])) if len(sys.argv) > i + 1 else 2_000_000)
+        sys.exit(0)
+    if pa is None:
+        print("pyarrow is not installed: logs are parsed from the CSV every time.")
+    for csv_file in sys.argv[1:] or ["test2.csv"]:
+        start = time.perf_counter()
+        df = load_game_log(csv_file)
+        print(f"{csv_file}: {len(df)} rows in {(time.perf_counter() - start) * 1e3:.0f} ms "
+              f"({df.memory_usage(deep=True).sum() / 1e3:.0f} kB) -> {cache_path(csv_file)}")
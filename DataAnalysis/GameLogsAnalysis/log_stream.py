@@ -0,0 +1,345 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from game_log import CALIBRATION_COLUMNS, propagate_calibration_bounds, repair_shifted_rows, synthetic_game_log
+
+# --- Configuration ---
+CHUNK_ROWS = 100_000          # Rows parsed at a time: memory is bounded by this, not by the log
+MAX_POINTS = 2000             # Buckets of the downsampled plot series (min/mean/max per bucket)
+INITIAL_BUCKET_MS = 100       # Bucket width to start with, doubled whenever MAX_POINTS is exceeded
+MAX_GAP_S = 0.5               # Sensor gaps longer than this are counted and not added to scene time
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+SENSOR_CHANNELS = ("FSR", "POT", "ToF")
+# Channel -> (lower bound column, upper bound column) of the calibration
+CHANNEL_BOUNDS = {"FSR": ("MinFsr", "MaxFsr"), "POT": ("MinPot", "MaxPot"), "ToF": ("MinTof", "MaxTof")}
+
+
+class RunningStats:
+    """Count, sum, sum of squares, min and max of several columns, merged chunk by chunk."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.count = np.zeros(len(self.columns))
+        self.sum = np.zeros(len(self.columns))
+        self.sum_sq = np.zeros(len(self.columns))
+        self.min = np.full(len(self.columns), np.inf)
+        self.max = np.full(len(self.columns), -np.inf)
+
+    def update(self, values):
+        """Adds a (n, len(columns)) float array; NaN values are skipped."""
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        self.count += valid.sum(axis=0)
+        self.sum += filled.sum(axis=0)
+        self.sum_sq += (filled * filled).sum(axis=0)
+        self.min = np.fmin(self.min, np.nanmin(np.where(valid, values, np.inf), axis=0, initial=np.inf))
+        self.max = np.fmax(self.max, np.nanmax(np.where(valid, values, -np.inf), axis=0, initial=-np.inf))
+
+    def table(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.sum / self.count
+            std = np.sqrt(np.maximum(self.sum_sq / self.count - mean ** 2, 0.0) * self.count / (self.count - 1))
+        return pd.DataFrame({"count": self.count.astype(int), "mean": mean, "std": std,
+                             "min": np.where(self.count > 0, self.min, np.nan),
+                             "max": np.where(self.count > 0, self.max, np.nan)}, index=self.columns)
+
+
+class MinMaxDownsampler:
+    """
+    Plot series of a stream of any length in at most max_points buckets.
+
+    Samples go into time buckets of a fixed width, keeping min, max, sum and count per channel,
+    so peaks survive the downsampling. When the buckets exceed max_points, neighbouring buckets
+    are merged pairwise and the width doubles; memory stays O(max_points) however long the log.
+    """
+
+    def __init__(self, channels=SENSOR_CHANNELS, max_points=MAX_POINTS, bucket_ms=INITIAL_BUCKET_MS):
+        self.channels = list(channels)
+        self.max_points = max_points
+        self.bucket_ms = bucket_ms
+        self.t0 = None
+        self.buckets = None  # DataFrame indexed by bucket number: <channel>_min/_max/_sum/_count
+
+    def _aggregate(self, frame):
+        grouped = frame.groupby(level=0)
+        parts = {}
+        for channel in self.channels:
+            parts[f"{channel}_min"] = grouped[f"{channel}_min"].min()
+            parts[f"{channel}_max"] = grouped[f"{channel}_max"].max()
+            parts[f"{channel}_sum"] = grouped[f"{channel}_sum"].sum()
+            parts[f"{channel}_count"] = grouped[f"{channel}_count"].sum()
+        return pd.DataFrame(parts)
+
+    def update(self, times_ms, values):
+        """Adds samples: times in ms (int64, ascending) and a (n, channels) float array."""
+        if not len(times_ms):
+            return
+        if self.t0 is None:
+            self.t0 = int(times_ms[0])
+        # Runs of equal bucket numbers, reduced with ufunc.reduceat (the log is in time order)
+        bucket = (times_ms - self.t0) // self.bucket_ms
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        valid = ~np.isnan(values)
+        chunk = pd.DataFrame(index=bucket[starts])
+        for c, channel in enumerate(self.channels):
+            chunk[f"{channel}_min"] = np.fmin.reduceat(values[:, c], starts)
+            chunk[f"{channel}_max"] = np.fmax.reduceat(values[:, c], starts)
+            chunk[f"{channel}_sum"] = np.add.reduceat(np.where(valid[:, c], values[:, c], 0.0), starts)
+            chunk[f"{channel}_count"] = np.add.reduceat(valid[:, c].astype(np.int64), starts)
+        self.buckets = chunk if self.buckets is None else self._aggregate(pd.concat([self.buckets, chunk]))
+        while len(self.buckets) > self.max_points:
+            self.bucket_ms *= 2
+            self.buckets.index = self.buckets.index // 2
+            self.buckets = self._aggregate(self.buckets)
+
+    def series(self):
+        """Downsampled series: bucket start time and min / mean / max per channel."""
+        if self.buckets is None:
+            return pd.DataFrame()
+        result = pd.DataFrame({"Timestamp": pd.to_datetime(self.t0 + self.buckets.index * self.bucket_ms, unit="ms")})
+        for channel in self.channels:
+            count = self.buckets[f"{channel}_count"].to_numpy()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result[f"{channel}_mean"] = self.buckets[f"{channel}_sum"].to_numpy() / count
+            result[f"{channel}_min"] = self.buckets[f"{channel}_min"].to_numpy()
+            result[f"{channel}_max"] = self.buckets[f"{channel}_max"].to_numpy()
+        return result
+
+
+class GameLogStream:
+    """
+    Incremental analysis of a game log, fed one chunk at a time.
+
+    Each chunk is routed by LogType: SceneLoad and CalibrationData rows are kept as (small)
+    event tables, SensorData rows update the running statistics (overall and per scene), the
+    mouth-state counts, the time per scene, the gap count, the samples outside the calibration
+    bounds and the downsampled plot series. State that spans chunks (the last timestamp, the
+    current calibration bounds) is carried over, so the result does not depend on the chunk size.
+    """
+
+    def __init__(self, max_points=MAX_POINTS, max_gap_s=MAX_GAP_S):
+        self.max_gap_ms = max_gap_s * 1000.0
+        self.rows = 0
+        self.rows_per_type = {}
+        self.scene_events = []
+        self.calibration_events = []
+        self.stats = RunningStats(SENSOR_CHANNELS)
+        self.scene_stats = {}
+        self.scene_time_ms = {}
+        self.mouth_states = {}
+        self.out_of_bounds = dict.fromkeys(SENSOR_CHANNELS, 0)
+        self.gaps = 0
+        self.first_ms = None
+        self.last_ms = None
+        self._last_sensor_ms = None
+        self._bounds = None  # Bounds of the last calibration seen
+        self.downsampler = MinMaxDownsampler(SENSOR_CHANNELS, max_points)
+
+    def feed(self, chunk):
+        """Processes one chunk of raw log rows (as read by pd.read_csv)."""
+        repair_shifted_rows(chunk)
+        chunk["Timestamp"] = pd.to_datetime(chunk["Timestamp"], format=TIMESTAMP_FORMAT, errors="coerce")
+        chunk = chunk[chunk["Timestamp"].notna()]
+        if chunk.empty:
+            return
+        self.rows += len(chunk)
+        for log_type, n in chunk["LogType"].value_counts().items():
+            self.rows_per_type[log_type] = self.rows_per_type.get(log_type, 0) + int(n)
+        times_ms = chunk["Timestamp"].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        self.first_ms = times_ms.min() if self.first_ms is None else min(self.first_ms, times_ms.min())
+        self.last_ms = times_ms.max() if self.last_ms is None else max(self.last_ms, times_ms.max())
+
+        scenes = chunk[chunk["LogType"] == "SceneLoad"]
+        self.scene_events += list(zip(scenes["Timestamp"], scenes["SceneName"].astype(str).str.strip()))
+        calibrations = chunk[chunk["LogType"] == "CalibrationData"]
+        if len(calibrations):
+            self.calibration_events.append(calibrations[["Timestamp"] + CALIBRATION_COLUMNS])
+
+        # Calibration bounds for every row, continuing the last calibration of the previous chunk
+        bounds = propagate_calibration_bounds(chunk)
+        if self._bounds is not None:
+            bounds = bounds.fillna(self._bounds)
+        if bounds.notna().any(axis=None):
+            self._bounds = bounds.ffill().iloc[-1]
+
+        is_sensor = (chunk["LogType"] == "SensorData").to_numpy()
+        self._sensor(chunk[is_sensor], times_ms[is_sensor], bounds[is_sensor])
+
+    def _sensor(self, sensor, times_ms, bounds):
+        if sensor.empty:
+            return
+        values = sensor[list(SENSOR_CHANNELS)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        self.stats.update(values)
+        self.downsampler.update(times_ms, values)
+
+        for c, channel in enumerate(SENSOR_CHANNELS):
+            low, high = CHANNEL_BOUNDS[channel]
+            lower = bounds[f"Propagated_{low}"].to_numpy()
+            upper = bounds[f"Propagated_{high}"].to_numpy()
+            self.out_of_bounds[channel] += int(np.sum((values[:, c] < lower) | (values[:, c] > upper)))
+
+        for state, n in sensor["MouthState"].value_counts().items():
+            state = str(state).strip()
+            self.mouth_states[state] = self.mouth_states.get(state, 0) + int(n)
+
+        # Time between consecutive sensor rows, across the chunk boundary; gaps are not scene time
+        previous = np.r_[self._last_sensor_ms if self._last_sensor_ms is not None else times_ms[0], times_ms[:-1]]
+        step_ms = times_ms - previous
+        self.gaps += int(np.sum(step_ms > self.max_gap_ms))
+        step_ms = np.where(step_ms > self.max_gap_ms, 0, step_ms)
+        self._last_sensor_ms = times_ms[-1]
+
+        codes, names = pd.factorize(sensor["SceneName"])
+        for code, name in enumerate(names):
+            in_scene = codes == code
+            name = str(name).strip()
+            if name not in self.scene_stats:
+                self.scene_stats[name] = RunningStats(SENSOR_CHANNELS)
+            self.scene_stats[name].update(values[in_scene])
+            self.scene_time_ms[name] = self.scene_time_ms.get(name, 0) + int(step_ms[in_scene].sum())
+
+    def result(self):
+        """
+        Returns:
+            dict: 'rows', 'rows_per_type', 'duration_s', 'gaps', 'channels' (statistics table),
+            'scenes' (per-scene time and means), 'mouth_states', 'out_of_bounds', 'scene_events',
+            'calibrations', 'series' (downsampled), 'bucket_ms'.
+        """
+        scenes = pd.DataFrame({
+            name: {"sensor_time_s": self.scene_time_ms.get(name, 0) / 1000.0,
+                   "samples": int(stats.count[0]),
+                   **{f"{channel}_mean": row["mean"] for channel, row in stats.table().iterrows()}}
+            for name, stats in self.scene_stats.items()}).T
+        calibrations = (pd.concat(self.calibration_events, ignore_index=True) if self.calibration_events
+                        else pd.DataFrame(columns=["Timestamp"] + CALIBRATION_COLUMNS))
+        return {
+            "rows": self.rows,
+            "rows_per_type": dict(self.rows_per_type),
+            "duration_s": (self.last_ms - self.first_ms) / 1000.0 if self.rows else 0.0,
+            "gaps": self.gaps,
+            "channels": self.stats.table(),
+            "scenes": scenes,
+            "mouth_states": dict(self.mouth_states),
+            "out_of_bounds": dict(self.out_of_bounds),
+            "scene_events": pd.DataFrame(self.scene_events, columns=["Timestamp", "SceneName"]),
+            "calibrations": calibrations,
+            "series": self.downsampler.series(),
+            "bucket_ms": self.downsampler.bucket_ms,
+        }
+
+
+def stream_game_log(csv_file_path, chunk_rows=CHUNK_ROWS, max_points=MAX_POINTS):
+    """
+    Analyses a game log of any length in bounded memory.
+
+    Args:
+        csv_file_path (str): Game log CSV.
+        chunk_rows (int): Rows parsed at a time.
+        max_points (int): Buckets of the downsampled series.
+
+    Returns:
+        dict: GameLogStream.result().
+    """
+    stream = GameLogStream(max_points)
+    with pd.read_csv(csv_file_path, chunksize=chunk_rows, skipinitialspace=True) as reader:
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            stream.feed(chunk)
+    return stream.result()
+
+
+def plot_stream_result(result, output_html="sensor_data_stream_plot.html"):
+    """Min/max envelope and mean of every channel, with the calibration bounds as red steps."""
+    series = result["series"]
+    fig = make_subplots(rows=len(SENSOR_CHANNELS), cols=1, shared_xaxes=True,
+                        subplot_titles=[f"{channel} vs Time" for channel in SENSOR_CHANNELS])
+    calibrations = result["calibrations"]
+    end = series["Timestamp"].iloc[-1] if len(series) else None
+    for row, channel in enumerate(SENSOR_CHANNELS, start=1):
+        fig.add_trace(go.Scatter(x=series["Timestamp"], y=series[f"{channel}_max"], mode='lines',
+                                 line=dict(width=0), showlegend=False), row=row, col=1)
+        fig.add_trace(go.Scatter(x=series["Timestamp"], y=series[f"{channel}_min"], mode='lines',
+                                 line=dict(width=0), fill='tonexty', name=f'{channel} min-max', opacity=0.3),
+                      row=row, col=1)
+        fig.add_trace(go.Scatter(x=series["Timestamp"], y=series[f"{channel}_mean"], mode='lines',
+                                 name=f'{channel} mean'), row=row, col=1)
+        for bound in CHANNEL_BOUNDS[channel]:
+            if len(calibrations) and end is not None:
+                fig.add_trace(go.Scatter(x=list(calibrations["Timestamp"]) + [end],
+                                         y=list(calibrations[bound]) + [calibrations[bound].iloc[-1]],
+                                         mode='lines', line=dict(color="Red", width=2, dash="dash", shape="hv"),
+                                         showlegend=False), row=row, col=1)
+        fig.update_yaxes(title_text=channel, row=row, col=1)
+    fig.update_layout(title_text=f"Sensor Data over Time ({result['bucket_ms'] / 1000:g} s buckets)",
+                      height=900, width=900)
+    fig.write_html(output_html)
+    return output_html
+
+
+# --- Benchmark ---
+def write_synthetic_log(path, n_rows, chunk_rows=1_000_000):
+    """Writes a synthetic game log (see game_log.synthetic_game_log) chunk by chunk."""
+    for start in range(0, n_rows, chunk_rows):
+        df = synthetic_game_log(min(chunk_rows, n_rows - start), seed=start)
+        df["Timestamp"] = df["Timestamp"] + pd.to_timedelta(start * 33, unit="ms")
+        df.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False,
+                  date_format="%Y-%m-%d %H:%M:%S.%f")
+
+
+def _full_load(csv_file_path):
+    """What plot_sensor_data does before plotting: the whole log in memory, then filtered copies."""
+    df = pd.read_csv(csv_file_path)
+    df.columns = df.columns.str.strip()
+    df = df.apply(lambda col: col.str.strip() if col.dtype == 'object' else col)
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    sensor_df = df[df['LogType'] == 'SensorData'].copy()
+    return sensor_df[list(SENSOR_CHANNELS)].describe()
+
+
+def benchmark(n_rows=2_000_000, path="benchmark_game_log.csv"):
+    """
+    Time and peak traced memory of the streaming reader against loading the whole log.
+
+    Memory is traced in a second run: tracemalloc slows down allocation-heavy code, which would
+    distort the timings.
+    """
+    write_synthetic_log(path, n_rows)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"{path}: {n_rows:,} rows, {size_mb:.0f} MB")
+    try:
+        for name, run in (("whole file (read_csv)", lambda: _full_load(path)),
+                          (f"streaming ({CHUNK_ROWS:,}-row chunks)", lambda: stream_game_log(path))):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {name:<32}{elapsed:>7.2f} s, peak memory {peak / 1e6:>7.0f} MB")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    # Usage: python log_stream.py [game_log.csv] [--benchmark N_ROWS]
+    if "--benchmark" in sys.argv:
+        i = sys.argv.index("--benchmark")
+        benchmark(int(float(sys.argv[i + 1])) if len(sys.argv) > i + 1 else 2_000_000)
+        sys.exit(0)
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "test2.csv"
+    start = time.perf_counter()
+    result = stream_game_log(csv_file)
+    print(f"{csv_file}: {result['rows']} rows {result['rows_per_type']} in {time.perf_counter() - start:.2f} s, "
+          f"{result['duration_s']:.1f} s of log, {result['gaps']} gaps > {MAX_GAP_S} s")
+    print(result["channels"].round(2).to_string())
+    print(result["scenes"].round(2).to_string())
+    print(f"Mouth states: {result['mouth_states']}, samples outside the calibration: {result['out_of_bounds']}")
+    print(f"Saved downsampled plot to {plot_stream_result(result)}")
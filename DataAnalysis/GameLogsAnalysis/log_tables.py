@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from game_log import CALIBRATION_COLUMNS
+from log_cache import load_game_log, parse_game_log
+
+# --- Configuration ---
+SENSOR_COLUMNS = ['Timestamp', 'FSR', 'POT', 'ToF', 'MouthState']
+NO_EVENT = -1                 # scene_id / calibration_id of sensor rows before the first event
+
+
+class GameLogTables:
+    """
+    A game log split into dense tables, one per log type.
+
+    sensor:       Timestamp, FSR, POT, ToF, MouthState, scene_id, calibration_id
+    calibrations: Timestamp and the six bounds, one row per CalibrationData event
+    scenes:       Timestamp and SceneName, one row per SceneLoad event
+
+    scene_id and calibration_id are the rows of the scene and calibration in effect at each
+    sample (the last event at or before its timestamp, NO_EVENT before the first), so the
+    sparse event columns are joined back only when an analysis needs them.
+    """
+
+    def __init__(self, sensor, calibrations, scenes):
+        self.sensor = sensor
+        self.calibrations = calibrations
+        self.scenes = scenes
+
+    def sensor_with_bounds(self):
+        """Sensor table with the bounds of its calibration (like game_log.propagate_calibration_bounds)."""
+        bounds = self.calibrations[CALIBRATION_COLUMNS].ffill().to_numpy()
+        ids = self.sensor['calibration_id'].to_numpy()
+        joined = np.where((ids >= 0)[:, None], bounds[np.maximum(ids, 0)] if len(bounds) else np.nan, np.nan)
+        return self.sensor.assign(**{column: joined[:, c] for c, column in enumerate(CALIBRATION_COLUMNS)})
+
+    def sensor_with_scenes(self):
+        """Sensor table with the SceneName of its scene."""
+        ids = self.sensor['scene_id'].to_numpy()
+        names = self.scenes['SceneName'].to_numpy()
+        scene = pd.Categorical(np.where(ids >= 0, names[np.maximum(ids, 0)] if len(names) else None, None))
+        return self.sensor.assign(SceneName=scene)
+
+    def memory_usage(self):
+        """Bytes per table."""
+        return {name: int(getattr(self, name).memory_usage(deep=True).sum())
+                for name in ("sensor", "calibrations", "scenes")}
+
+    def __repr__(self):
+        return (f"GameLogTables({len(self.sensor)} samples, {len(self.calibrations)} calibrations, "
+                f"{len(self.scenes)} scene loads)")
+
+
+def _event_ids(event_times, times):
+    """Row of the last event at or before each time, NO_EVENT before the first."""
+    return (np.searchsorted(event_times, times, side='right') - 1).astype(np.int32)
+
+
+def split_game_log(df):
+    """
+    Splits a parsed game log (see log_cache.parse_game_log) into GameLogTables.
+
+    Every table keeps only the columns its log type fills. Rows are ordered by timestamp first
+    (stable, so an event logged just before a sample with the same timestamp still applies to it).
+    """
+    if not df['Timestamp'].is_monotonic_increasing:
+        df = df.sort_values('Timestamp', kind='stable')
+    log_type = df['LogType']
+    scenes = df.loc[log_type == 'SceneLoad', ['Timestamp', 'SceneName']].reset_index(drop=True)
+    calibrations = df.loc[log_type == 'CalibrationData', ['Timestamp'] + CALIBRATION_COLUMNS].reset_index(drop=True)
+    sensor = df.loc[log_type == 'SensorData', SENSOR_COLUMNS].reset_index(drop=True)
+    for table, column in ((sensor, 'MouthState'), (scenes, 'SceneName')):
+        if isinstance(table[column].dtype, pd.CategoricalDtype):
+            table[column] = table[column].cat.remove_unused_categories()
+
+    times = sensor['Timestamp'].to_numpy()
+    sensor['scene_id'] = _event_ids(scenes['Timestamp'].to_numpy(), times)
+    sensor['calibration_id'] = _event_ids(calibrations['Timestamp'].to_numpy(), times)
+    return GameLogTables(sensor, calibrations, scenes)
+
+
+def load_game_log_tables(csv_file_path, use_cache=True):
+    """Loads a game log (through the columnar cache, see log_cache.py) and splits it."""
+    return split_game_log(load_game_log(csv_file_path, use_cache=use_cache))
+
+
+# --- Benchmark ---
+def benchmark(n_rows=2_000_000, path="benchmark_game_log.csv"):
+    """Memory of the wide log (as text columns and typed) against the split tables, and a sensor scan."""
+    from log_cache import _legacy_load
+    from log_stream import write_synthetic_log
+
+    write_synthetic_log(path, n_rows)
+    try:
+        legacy = _legacy_load(path)
+        wide = parse_game_log(path)
+    finally:
+        os.remove(path)
+    start = time.perf_counter()
+    tables = split_game_log(wide)
+    split_s = time.perf_counter() - start
+
+    legacy_bytes = legacy.memory_usage(deep=True).sum()
+    wide_bytes = wide.memory_usage(deep=True).sum()
+    table_bytes = tables.memory_usage()
+    total = sum(table_bytes.values())
+    cells = wide.drop(columns=['Timestamp', 'SceneName', 'LogType']).notna().to_numpy()
+    print(f"{n_rows:,} rows, {tables!r}, split in {split_s:.2f} s; "
+          f"{100 * (1 - cells.mean()):.0f}% of the wide value cells are empty")
+    print(f"  wide, as DataAnalysis.py loads it  {legacy_bytes / 1e6:>7.1f} MB")
+    print(f"  wide, typed (log_cache.py)         {wide_bytes / 1e6:>7.1f} MB")
+    print(f"  split tables                       {total / 1e6:>7.1f} MB "
+          f"({', '.join(f'{name} {size / 1e6:.2f}' for name, size in table_bytes.items())}), "
+          f"{legacy_bytes / total:.1f}x / {wide_bytes / total:.1f}x smaller")
+
+    # A typical sensor analysis: mean per mouth state
+    start = time.perf_counter()
+    legacy[legacy['LogType'] == 'SensorData'].groupby('MouthState')[['FSR', 'POT', 'ToF']].mean()
+    wide_s = time.perf_counter() - start
+    start = time.perf_counter()
+    tables.sensor.groupby('MouthState', observed=True)[['FSR', 'POT', 'ToF']].mean()
+    table_s = time.perf_counter() - start
+    print(f"  sensor means per mouth state: wide {wide_s * 1e3:.0f} ms, sensor table {table_s * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    # Usage: python log_tables.py [game_log.csv] [--benchmark N_ROWS]
+    if "--benchmark" in sys.argv:
+        i = sys.argv.index("--benchmark")
+        benchmark(int(float(sys.argv[i + 1])) if len(sys.argv) > i + 1 else 2_000_000)
+        sys.exit(0)
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "test2.csv"
+    tables = load_game_log_tables(csv_file)
+    print(tables)
+    for name, size in tables.memory_usage().items():
+        print(f"  {name:<13}{size / 1e3:>8.1f} kB")
+    print(tables.calibrations.to_string(index=False))
+    print(tables.scenes.to_string(index=False))
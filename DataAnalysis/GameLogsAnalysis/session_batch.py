@@ -0,0 +1,217 @@
+import glob
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from game_log import LOG_COLUMNS
+from log_tables import load_game_log_tables
+
+# --- Configuration ---
+SUMMARY_FILE = "session_summary.csv"
+IGNORED_FILES = (SUMMARY_FILE,)
+IGNORED_SUFFIXES = ("_spectral.csv",)   # Outputs of spectral_analysis.py next to the logs
+MAX_GAP_S = 0.5               # Longer pauses between samples count as gaps, not as scene time
+SENSOR_CHANNELS = ("FSR", "POT", "ToF")
+OPEN_STATE = "Open"
+
+
+def find_session_logs(sources):
+    """
+    Expands directories and glob patterns to a sorted list of game logs.
+
+    Args:
+        sources (list): Directories (all *.csv inside) and/or glob patterns.
+    """
+    paths = set()
+    for source in sources:
+        matches = glob.glob(os.path.join(source, "*.csv")) if os.path.isdir(source) else glob.glob(source)
+        paths.update(p for p in matches
+                     if os.path.basename(p) not in IGNORED_FILES and not p.endswith(IGNORED_SUFFIXES))
+    return sorted(paths)
+
+
+def session_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# --- Per-session worker ---
+def session_metrics(tables, max_gap_s=MAX_GAP_S):
+    """
+    Metrics row of one session from its tables (see log_tables.GameLogTables).
+
+    Returns:
+        dict: Duration, samples, sample rate, gaps, calibration ranges and out-of-range share,
+        channel means, time per scene and mouth-state statistics.
+    """
+    sensor = tables.sensor_with_scenes()
+    row = {"samples": len(sensor), "calibrations": len(tables.calibrations), "scene_loads": len(tables.scenes)}
+    if sensor.empty:
+        return row
+    times = sensor["Timestamp"].to_numpy(dtype="datetime64[ms]").astype(np.int64) / 1000.0
+    step = np.diff(times)
+    is_gap = step > max_gap_s
+    row.update({
+        "start": sensor["Timestamp"].iloc[0],
+        "duration_s": times[-1] - times[0],
+        "sample_rate_hz": 1.0 / np.median(step) if len(step) and np.median(step) > 0 else np.nan,
+        "gaps": int(is_gap.sum()),
+        "longest_gap_s": float(step.max()) if len(step) else 0.0,
+        "gap_time_s": float(step[is_gap].sum()),
+    })
+
+    for channel in SENSOR_CHANNELS:
+        row[f"{channel}_mean"] = sensor[channel].mean()
+        row[f"{channel}_std"] = sensor[channel].std()
+
+    # Calibration ranges: the last calibration, and the share of samples outside their own one
+    if len(tables.calibrations):
+        last = tables.calibrations.iloc[-1]
+        with_bounds = tables.sensor_with_bounds()
+        for channel, (low, high) in {"FSR": ("MinFsr", "MaxFsr"), "POT": ("MinPot", "MaxPot"),
+                                     "ToF": ("MinTof", "MaxTof")}.items():
+            row[f"{channel}_calibration_range"] = last[high] - last[low]
+            outside = (with_bounds[channel] < with_bounds[low]) | (with_bounds[channel] > with_bounds[high])
+            row[f"{channel}_outside_calibration_pct"] = 100.0 * outside.mean()
+
+    # Time per scene: the step to the next sample belongs to the scene of the sample, gaps excluded
+    scene_step = np.where(is_gap, 0.0, step)
+    per_scene = pd.Series(scene_step).groupby(sensor["SceneName"].iloc[:-1].to_numpy()).sum()
+    for scene, seconds in per_scene.items():
+        row[f"time_{scene}_s"] = float(seconds)
+
+    # Mouth state: share of samples open, open/close transitions, mean length of an open phase
+    is_open = (sensor["MouthState"] == OPEN_STATE).to_numpy()
+    changes = np.flatnonzero(is_open[1:] != is_open[:-1]) + 1
+    run_starts = np.r_[0, changes]
+    run_ends = np.r_[changes, len(is_open)] - 1
+    opened = is_open[run_starts]
+    open_runs = times[run_ends[opened]] - times[run_starts[opened]]
+    row.update({
+        "mouth_open_pct": 100.0 * is_open.mean(),
+        "mouth_transitions": len(changes),
+        "mouth_open_phases": len(open_runs),
+        "mouth_open_mean_s": float(open_runs.mean()) if len(open_runs) else 0.0,
+    })
+    return row
+
+
+def analyze_session_file(path, use_cache=True):
+    """
+    Loads, splits and summarises one game log. Runs in a worker process.
+
+    Errors are returned in the result instead of raised, so one bad file does not abort the batch.
+
+    Returns:
+        dict: 'session', 'file', 'row' (metrics), 'error', 'seconds' (processing time).
+    """
+    start = time.perf_counter()
+    result = {"session": session_name(path), "file": path, "row": {}, "error": None}
+    try:
+        header = pd.read_csv(path, nrows=0, skipinitialspace=True).columns.str.strip()
+        missing = [column for column in LOG_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"not a game log, missing column(s) {missing}")
+        result["row"] = session_metrics(load_game_log_tables(path, use_cache=use_cache))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def analyze_session_files(paths, max_workers=None, use_cache=True):
+    """
+    Summarises many game logs in a process pool.
+
+    Sessions are independent, so each is one task; the per-file results are merged into a
+    single table (scene time columns appear for every scene seen in any session).
+
+    Args:
+        paths (list): Game log CSVs.
+        max_workers (int): Worker processes, defaults to the number of CPUs.
+        use_cache (bool): Load through the columnar cache (see log_cache.py).
+
+    Returns:
+        pd.DataFrame: One row per session with its metrics and the error for files that failed.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        results = [analyze_session_file(path, use_cache) for path in paths]
+    else:
+        chunksize = max(1, len(paths) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(analyze_session_file, paths, [use_cache] * len(paths), chunksize=chunksize))
+
+    rows = [{"session": r["session"], "file": r["file"], **r["row"], "processing_s": r["seconds"],
+             "error": r["error"]} for r in results]
+    summary = pd.DataFrame(rows)
+    scene_columns = sorted(c for c in summary.columns if c.startswith("time_"))
+    if scene_columns:
+        summary[scene_columns] = summary[scene_columns].fillna(0.0).where(summary["error"].isna())
+    return summary
+
+
+# --- Benchmark ---
+def write_synthetic_sessions(directory, n_sessions, rows_per_session=50_000):
+    """Writes n_sessions synthetic game logs (see game_log.synthetic_game_log)."""
+    from log_stream import write_synthetic_log
+    paths = []
+    for i in range(n_sessions):
+        path = os.path.join(directory, f"session_{i:04d}.csv")
+        write_synthetic_log(path, rows_per_session)
+        paths.append(path)
+    return paths
+
+
+def benchmark(n_sessions=40, rows_per_session=50_000):
+    """Times the batch with 1 .. cpu_count workers on synthetic sessions (CSV parsing, no cache)."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = write_synthetic_sessions(tmp_dir, n_sessions, rows_per_session)
+        cpus = os.cpu_count() or 1
+        baseline = None
+        for workers in sorted({1, 2, 4, cpus} - {w for w in (2, 4) if w > cpus}):
+            start = time.perf_counter()
+            analyze_session_files(paths, max_workers=workers, use_cache=False)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{n_sessions} sessions x {rows_per_session:,} rows, {workers} worker(s): {elapsed:.2f} s "
+                  f"({n_sessions / elapsed:.1f} sessions/s, speed-up {baseline / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    # Usage: python session_batch.py <directory | glob> [...] [--output session_summary.csv] [--workers N] [--no-cache]
+    #        python session_batch.py --benchmark [N_SESSIONS]
+    args = sys.argv[1:]
+    if "--benchmark" in args:
+        rest = args[args.index("--benchmark") + 1:]
+        benchmark(int(rest[0]) if rest else 40)
+        sys.exit(0)
+
+    def option(name, default=None):
+        if name in args:
+            i = args.index(name)
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        return default
+
+    output_file = option("--output", SUMMARY_FILE)
+    workers = option("--workers")
+    use_cache = "--no-cache" not in args
+    args = [a for a in args if a != "--no-cache"]
+    paths = find_session_logs(args or ["."])
+    if not paths:
+        print("No game logs found.")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    summary = analyze_session_files(paths, int(workers) if workers else None, use_cache)
+    summary.to_csv(output_file, index=False)
+    failed = summary["error"].notna().sum()
+    print(f"Analysed {len(paths)} sessions in {time.perf_counter() - start:.2f} s ({failed} failed) -> {output_file}")
+    with pd.option_context("display.width", 200, "display.max_columns", 14, "display.precision", 2):
+        print(summary.drop(columns=["file"]).to_string(index=False))
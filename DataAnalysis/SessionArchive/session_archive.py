@@ -0,0 +1,390 @@
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# File layout: MAGIC | block payloads ... | JSON footer | footer length (uint32) | MAGIC
+ARCHIVE_MAGIC = b"RCSA"
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = ".rcsa"
+
+# Samples per independently decodable block
+BLOCK_SIZE = 16384
+
+# Candidate fixed-point scales tried per channel. The firmware sends uint16 values scaled by 10,
+# so FSR / POT normally round-trip exactly with a scale of 10 (or 1 for the integer game logs).
+# Finer values are rounded to the largest scale, the footer records the error per channel.
+CANDIDATE_SCALES = (1, 10, 100, 1000)
+
+# Bit widths above this are stored as raw int64 (the 64-bit word decoder needs 7 spare bits)
+MAX_PACKED_WIDTH = 56
+
+SESSION_CHANNELS = ("FSR", "POT", "ToF")
+
+# --- Integer codecs ---
+def zigzag_encode(values):
+    """Maps signed int64 to unsigned so small negative deltas stay small."""
+    values = values.astype(np.int64, copy=False)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def zigzag_decode(values):
+    """In-place inverse of zigzag_encode() for uint32 or uint64 arrays, returns a signed view."""
+    signed = np.int32 if values.dtype == np.uint32 else np.int64
+    sign = (values & values.dtype.type(1)).view(signed)
+    np.negative(sign, out=sign)
+    np.right_shift(values, values.dtype.type(1), out=values)
+    return np.bitwise_xor(values.view(signed), sign, out=values.view(signed))
+
+
+def lane_order(count):
+    """
+    Sample order used inside a packed block.
+
+    The block is split into 8 lanes of ceil(count / 8) consecutive samples, and the packed
+    stream interleaves them (lane 0, lane 1, ..., lane 7, lane 0, ...). Position j of every
+    8-value group then belongs to lane j, so the decoder writes each lane contiguously.
+    """
+    n_groups = -(-count // 8)
+    return np.arange(n_groups * 8).reshape(8, n_groups).T.ravel()
+
+
+def pack_bits(values, width):
+    """Bit-packs unsigned integers with a fixed width in lane order, least significant bit first."""
+    if width == 0 or len(values) == 0:
+        return b""
+    if width > MAX_PACKED_WIDTH:
+        return values.astype('<u8').tobytes()
+    padded = np.zeros(-(-len(values) // 8) * 8, dtype=np.uint64)
+    padded[:len(values)] = values
+    interleaved = padded[lane_order(len(values))]
+    bits = ((interleaved[:, None] >> np.arange(width, dtype=np.uint64)) & np.uint64(1)).astype(np.uint8)
+    return np.packbits(bits.ravel(), bitorder='little').tobytes()
+
+
+def unpack_bits(payload, count, width):
+    """
+    Vectorized inverse of pack_bits().
+
+    With a fixed width, every group of 8 values occupies exactly `width` bytes, so value j of
+    each group always starts at the same byte and bit. Each lane is decoded for all groups at
+    once through a strided, unaligned word view of the payload (no copies, no Python-level loop
+    over samples). Widths up to 25 bits are read as uint32, wider ones as uint64.
+
+    Returns:
+        np.ndarray: uint32 or uint64 values.
+    """
+    if count == 0:
+        return np.empty(0, dtype=np.uint64)
+    if width == 0:
+        return np.zeros(count, dtype=np.uint32)
+    if width > MAX_PACKED_WIDTH:
+        return np.frombuffer(payload, dtype='<u8', count=count).astype(np.uint64)
+
+    word, unsigned = ('<u4', np.uint32) if width <= 25 else ('<u8', np.uint64)
+    n_groups = -(-count // 8)
+    buffer = bytes(payload) + bytes(width + 8)
+    mask = unsigned((1 << width) - 1)
+    values = np.empty(n_groups * 8, dtype=unsigned)
+    for j in range(8):
+        bit = j * width
+        words = np.ndarray((n_groups,), dtype=word, buffer=buffer, offset=bit >> 3, strides=(width,))
+        lane = values[j * n_groups:(j + 1) * n_groups]
+        np.right_shift(words, unsigned(bit & 7), out=lane)
+        np.bitwise_and(lane, mask, out=lane)
+    return values[:count]
+
+
+def encode_block(values):
+    """
+    Delta + zigzag + bit-pack encoding of one block of int64 values.
+
+    Returns:
+        tuple: (payload bytes, first value, bit width)
+    """
+    first = int(values[0])
+    zigzag = zigzag_encode(np.diff(values))
+    width = int(zigzag.max()).bit_length() if len(zigzag) else 0
+    return pack_bits(zigzag, width), first, width
+
+
+def decode_block(payload, count, first, width, out=None):
+    """
+    Decodes one block back to int64 values.
+
+    Args:
+        out (np.ndarray): Optional int64 array of length count to decode into.
+    """
+    values = np.empty(count, dtype=np.int64) if out is None else out
+    values[0] = first
+    if count > 1:
+        deltas = zigzag_decode(unpack_bits(payload, count - 1, width))
+        np.cumsum(deltas, out=values[1:], dtype=np.int64)
+        values[1:] += first
+    return values
+
+
+def choose_scale(values):
+    """
+    Smallest candidate scale at which the channel round-trips through int64 exactly.
+
+    Channels with more decimals than the largest candidate get that one and are rounded to it
+    (write_session_archive records the rounding error).
+    """
+    for scale in CANDIDATE_SCALES:
+        if np.allclose(np.round(values * scale) / scale, values, rtol=0, atol=1e-9):
+            return scale
+    return CANDIDATE_SCALES[-1]
+
+
+# --- Writer ---
+def write_session_archive(archive_path, times_ms, channels, block_size=BLOCK_SIZE, scales=None):
+    """
+    Writes a finished session as a compressed columnar archive.
+
+    Args:
+        archive_path (str): Output file.
+        times_ms (array-like): Sample timestamps in integer milliseconds, non-decreasing.
+        channels (dict): Channel name -> values, one per timestamp (no NaNs).
+        block_size (int): Samples per block, at most BLOCK_SIZE.
+        scales (dict): Optional fixed-point scale per channel, chosen automatically otherwise.
+
+    Returns:
+        dict: The archive footer (channel and block index). Every channel records its
+        "max_error", the largest rounding error of its fixed-point scale (0.0 if it round-trips
+        exactly); lossy channels are also reported on the console.
+    """
+    if block_size > BLOCK_SIZE:
+        raise ValueError(f"block_size must be at most {BLOCK_SIZE}")
+    times_ms = np.asarray(times_ms, dtype=np.int64)
+    if np.any(np.diff(times_ms) < 0):
+        raise ValueError("times_ms must be non-decreasing (block time ranges and range reads rely on it)")
+    columns = {"time_ms": (times_ms, 1, 0.0)}
+    for name, values in channels.items():
+        values = np.asarray(values, dtype=float)
+        if len(values) != len(times_ms):
+            raise ValueError(f"Channel '{name}' has {len(values)} samples, expected {len(times_ms)}")
+        if np.isnan(values).any():
+            raise ValueError(f"Channel '{name}' contains NaN values")
+        scale = (scales or {}).get(name) or choose_scale(values)
+        ints = np.round(values * scale).astype(np.int64)
+        max_error = float(np.abs(ints / scale - values).max()) if len(values) else 0.0
+        if max_error > 1e-9:
+            print(f"Channel '{name}' does not round-trip at scale {scale}: values change by up to {max_error:.3g}")
+        columns[name] = (ints, scale, max_error)
+
+    starts = range(0, len(times_ms), block_size)
+    footer = {
+        "version": ARCHIVE_VERSION,
+        "samples": int(len(times_ms)),
+        "blocks": [{"count": int(min(block_size, len(times_ms) - s)),
+                    "t_start": int(times_ms[s]),
+                    "t_end": int(times_ms[min(s + block_size, len(times_ms)) - 1])} for s in starts],
+        "channels": {},
+    }
+
+    with open(archive_path, "wb") as f:
+        f.write(ARCHIVE_MAGIC)
+        for name, (ints, scale, max_error) in columns.items():
+            index = []
+            for s in starts:
+                block = ints[s:s + block_size]
+                payload, first, width = encode_block(block)
+                index.append({"offset": f.tell(), "length": len(payload), "first": first, "width": width,
+                              "min": float(block.min()) / scale, "max": float(block.max()) / scale})
+                f.write(payload)
+            footer["channels"][name] = {"scale": scale, "max_error": max_error, "blocks": index}
+
+        footer_bytes = json.dumps(footer, separators=(",", ":")).encode()
+        f.write(footer_bytes)
+        f.write(struct.pack("<I", len(footer_bytes)))
+        f.write(ARCHIVE_MAGIC)
+    return footer
+
+
+# --- Reader ---
+class SessionArchive:
+    """
+    Random-access reader for .rcsa session archives.
+
+    Only the footer is parsed on open; blocks are read and decoded on demand, and range
+    queries skip every block whose time range does not overlap.
+    """
+
+    def __init__(self, archive_path):
+        self.path = archive_path
+        with open(archive_path, "rb") as f:
+            if f.read(4) != ARCHIVE_MAGIC:
+                raise ValueError(f"'{archive_path}' is not a session archive")
+            f.seek(-8, os.SEEK_END)
+            footer_length, magic = struct.unpack("<I4s", f.read(8))
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"'{archive_path}' is truncated")
+            f.seek(-8 - footer_length, os.SEEK_END)
+            self.footer = json.loads(f.read(footer_length))
+
+        if self.footer["version"] != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version {self.footer['version']}")
+        self.blocks = self.footer["blocks"]
+        self.channels = [name for name in self.footer["channels"] if name != "time_ms"]
+        self.samples = self.footer["samples"]
+
+    def block_stats(self, channel):
+        """Per-block time range and min/max of a channel, without decoding anything."""
+        index = self.footer["channels"][channel]["blocks"]
+        return pd.DataFrame([{**block, "min": stats["min"], "max": stats["max"]}
+                             for block, stats in zip(self.blocks, index)])
+
+    def blocks_in_range(self, start_ms=None, end_ms=None):
+        """Indices of the blocks overlapping [start_ms, end_ms]."""
+        return [i for i, block in enumerate(self.blocks)
+                if (start_ms is None or block["t_end"] >= start_ms)
+                and (end_ms is None or block["t_start"] <= end_ms)]
+
+    def _decode(self, f, channel, block_indices):
+        """Decodes consecutive blocks of a channel straight into one int64 array."""
+        meta = self.footer["channels"][channel]
+        ints = np.empty(sum(self.blocks[i]["count"] for i in block_indices), dtype=np.int64)
+        position = 0
+        for i in block_indices:
+            entry, count = meta["blocks"][i], self.blocks[i]["count"]
+            f.seek(entry["offset"])
+            payload = f.read(entry["length"])
+            decode_block(payload, count, entry["first"], entry["width"], out=ints[position:position + count])
+            position += count
+        return ints, meta["scale"]
+
+    def read(self, channels=None, start_ms=None, end_ms=None):
+        """
+        Decodes the requested channels for a time range.
+
+        Args:
+            channels (list): Channel names, all channels by default.
+            start_ms (int): Inclusive start time, from the beginning if None.
+            end_ms (int): Inclusive end time, until the end if None.
+
+        Returns:
+            dict: 'time_ms' (int64) plus one float64 array per channel.
+        """
+        channels = self.channels if channels is None else list(channels)
+        block_indices = self.blocks_in_range(start_ms, end_ms)
+
+        with open(self.path, "rb") as f:
+            times, _ = self._decode(f, "time_ms", block_indices)
+            # Timestamps are non-decreasing, so the range is a slice of the decoded blocks
+            first = 0 if start_ms is None else np.searchsorted(times, start_ms, side="left")
+            last = len(times) if end_ms is None else np.searchsorted(times, end_ms, side="right")
+
+            result = {"time_ms": times[first:last]}
+            for channel in channels:
+                ints, scale = self._decode(f, channel, block_indices)
+                result[channel] = np.divide(ints[first:last], scale)
+        return result
+
+    def to_dataframe(self, channels=None, start_ms=None, end_ms=None):
+        data = self.read(channels, start_ms, end_ms)
+        df = pd.DataFrame(data)
+        df.insert(0, "Timestamp", pd.to_datetime(df.pop("time_ms"), unit="ms"))
+        return df
+
+
+# --- Game log conversion ---
+def archive_game_log(csv_file_path, archive_path=None, channels=SESSION_CHANNELS):
+    """
+    Archives the SensorData rows of a finished game log.
+
+    The Unity logger writes one field less for SensorData rows, which pushes the log type into
+    the 'MaxTof' column; both layouts are accepted.
+
+    Returns:
+        str: Path of the written archive.
+    """
+    if archive_path is None:
+        archive_path = os.path.splitext(csv_file_path)[0] + ARCHIVE_EXTENSION
+
+    df = pd.read_csv(csv_file_path, skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+    log_type = df["LogType"].where(df["LogType"].notna(), df["MaxTof"]).astype(str).str.strip()
+    sensor_df = df[log_type == "SensorData"]
+
+    values = sensor_df[list(channels)].apply(pd.to_numeric, errors="coerce")
+    valid = values.notna().all(axis=1)
+    timestamps = pd.to_datetime(sensor_df.loc[valid, "Timestamp"])
+    times_ms = timestamps.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    # Rows are logged in order, but a clock adjustment can step back; the archive needs sorted times
+    order = np.argsort(times_ms, kind="stable")
+
+    write_session_archive(archive_path, times_ms[order],
+                          {c: values.loc[valid, c].to_numpy()[order] for c in channels})
+    return archive_path
+
+
+# --- Benchmark ---
+def synthetic_session(n_samples, seed=0):
+    """Slowly varying firmware-like channels: uint16 values scaled by 10 at 20 Hz."""
+    rng = np.random.default_rng(seed)
+    times_ms = np.arange(n_samples, dtype=np.int64) * 50 + rng.integers(0, 3, n_samples)
+    walk = lambda start, step: np.clip(start + np.cumsum(rng.integers(-step, step + 1, n_samples)), 0, 33000)
+    channels = {"FSR": walk(15000, 30) / 10.0, "POT": walk(18000, 20) / 10.0,
+                "ToF": np.clip(200 + np.cumsum(rng.integers(-1, 2, n_samples)), 0, 2000) / 10.0}
+    return times_ms, channels
+
+
+def benchmark(n_samples=10_000_000, archive_path="benchmark_session.rcsa"):
+    """Reports compression against raw float32 / CSV and full and random-access decode throughput."""
+    times_ms, channels = synthetic_session(n_samples)
+
+    start = time.perf_counter()
+    write_session_archive(archive_path, times_ms, channels)
+    encode_s = time.perf_counter() - start
+
+    archive_bytes = os.path.getsize(archive_path)
+    raw_bytes = n_samples * (8 + 4 * len(channels))  # int64 time + float32 channels
+    csv_bytes_per_row = len(pd.DataFrame({"t": times_ms[:1000], **{k: v[:1000] for k, v in channels.items()}})
+                            .to_csv(index=False)) / 1000
+
+    archive = SessionArchive(archive_path)
+    start = time.perf_counter()
+    data = archive.read()
+    decode_s = time.perf_counter() - start
+    assert np.array_equal(data["time_ms"], times_ms)
+    assert all(np.allclose(data[c], channels[c]) for c in channels)
+
+    # Codec only: blocks to int64, without the float conversion of read()
+    all_blocks = list(range(len(archive.blocks)))
+    start = time.perf_counter()
+    with open(archive_path, "rb") as f:
+        for channel in ["time_ms"] + archive.channels:
+            archive._decode(f, channel, all_blocks)
+    codec_s = time.perf_counter() - start
+
+    middle = int(times_ms[n_samples // 2])
+    start = time.perf_counter()
+    window = archive.read(["FSR"], middle, middle + 60_000)
+    window_s = time.perf_counter() - start
+
+    decoded_samples = n_samples * (len(channels) + 1)
+    print(f"Samples: {n_samples:,} x {len(channels)} channels + time")
+    print(f"Archive: {archive_bytes / 1e6:.1f} MB, raw: {raw_bytes / 1e6:.1f} MB "
+          f"({raw_bytes / archive_bytes:.1f}x), CSV: {csv_bytes_per_row * n_samples / 1e6:.1f} MB "
+          f"({csv_bytes_per_row * n_samples / archive_bytes:.1f}x)")
+    print(f"Encode: {encode_s:.2f} s, full read: {decode_s:.3f} s "
+          f"({decoded_samples / decode_s / 1e6:.0f} M samples/s), integer decode: {codec_s:.3f} s "
+          f"({decoded_samples / codec_s / 1e6:.0f} M samples/s)")
+    print(f"Random access (60 s of FSR): {len(window['FSR'])} samples in {window_s * 1e3:.2f} ms")
+    os.remove(archive_path)
+
+
+if __name__ == "__main__":
+    # Usage: python session_archive.py [game_log.csv ...]   (no arguments runs the benchmark)
+    if len(sys.argv) > 1:
+        for csv_file in sys.argv[1:]:
+            path = archive_game_log(csv_file)
+            print(f"{csv_file} ({os.path.getsize(csv_file)} bytes) -> {path} ({os.path.getsize(path)} bytes)")
+    else:
+        benchmark()
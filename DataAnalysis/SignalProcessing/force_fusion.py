@@ -0,0 +1,218 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+SAMPLE_PERIOD_S = 0.05           # Firmware send_delay of 50 ms
+
+# Process model tuning
+WEIGHT_ACCEL_NOISE = 400.0       # g/s^2, spectral density of the (white) weight acceleration
+FSR_DRIFT_NOISE = 2.0            # FSR units/sqrt(s), random walk of the FSR offset
+
+# Lower bounds for the measurement noise, the ToF reports whole millimetres
+MIN_FSR_VARIANCE = 1.0
+MIN_TOF_VARIANCE = 1.0 / 12.0    # Variance of the 1 mm quantisation
+
+
+# --- Calibrated measurement model ---
+class QuadraticSensorModel:
+    """
+    Forward calibration model sensor = a*w^2 + b*w + c (as fitted by BLE_Force_mapping.py).
+
+    Args:
+        coeffs (sequence): (a, b, c), highest power first like np.polyfit.
+        variance (float): Measurement noise variance in sensor units^2.
+    """
+
+    def __init__(self, coeffs, variance):
+        self.a, self.b, self.c = (float(v) for v in coeffs)
+        self.variance = float(variance)
+
+    def predict(self, weight):
+        return (self.a * weight + self.b) * weight + self.c
+
+    def slope(self, weight):
+        return 2.0 * self.a * weight + self.b
+
+    @classmethod
+    def fit(cls, weight, sensor, min_variance=0.0):
+        coeffs = np.polyfit(weight, sensor, 2)
+        residuals = np.asarray(sensor) - np.polyval(coeffs, weight)
+        variance = max(np.var(residuals, ddof=3) if len(residuals) > 3 else 0.0, min_variance)
+        return cls(coeffs, variance)
+
+
+# --- Streaming fusion filter ---
+class ForceFusionFilter:
+    """
+    Extended Kalman filter fusing the FSR and ToF readings into one weight (force) estimate.
+
+    State: [weight_g, weight rate g/s, FSR offset drift]. The weight follows a constant-velocity
+    model; the FSR offset is a slow random walk that the ToF (which does not drift) makes
+    observable. Both sensors enter through their calibrated quadratic models, linearised around
+    the predicted weight, so the FSR is automatically down-weighted where its curve is flat.
+
+    F, F^T and Q only depend on the sample period and are computed once. Each sample is then a
+    prediction and two scalar measurement updates, without any matrix inversion.
+    """
+
+    def __init__(self, fsr_model, tof_model, dt=SAMPLE_PERIOD_S,
+                 accel_noise=WEIGHT_ACCEL_NOISE, drift_noise=FSR_DRIFT_NOISE, initial_weight=0.0):
+        self.fsr_model = fsr_model
+        self.tof_model = tof_model
+        self.dt = dt
+
+        # Precomputed process model
+        self.F = np.array([[1.0, dt, 0.0],
+                           [0.0, 1.0, 0.0],
+                           [0.0, 0.0, 1.0]])
+        self.FT = self.F.T.copy()
+        q = accel_noise ** 2
+        self.Q = np.array([[q * dt ** 4 / 4, q * dt ** 3 / 2, 0.0],
+                           [q * dt ** 3 / 2, q * dt ** 2, 0.0],
+                           [0.0, 0.0, drift_noise ** 2 * dt]])
+        self.I = np.eye(3)
+        self.reset(initial_weight)
+
+    def reset(self, initial_weight=0.0):
+        self.x = np.array([initial_weight, 0.0, 0.0])
+        self.P = np.diag([100.0 ** 2, 100.0 ** 2, 50.0 ** 2])
+
+    @classmethod
+    def from_calibration_csv(cls, csv_file_path, **kwargs):
+        """Fits both measurement models from a calibration CSV (weight_g, fsr_value, tof_distance_mm)."""
+        df = pd.read_csv(csv_file_path)
+        fsr_model = QuadraticSensorModel.fit(df['weight_g'], df['fsr_value'], MIN_FSR_VARIANCE)
+        tof_model = QuadraticSensorModel.fit(df['weight_g'], df['tof_distance_mm'], MIN_TOF_VARIANCE)
+        return cls(fsr_model, tof_model, **kwargs)
+
+    @classmethod
+    def from_calibration_record(cls, record, **kwargs):
+        """
+        Builds the filter from a calibration registry record (see calibration_registry.py).
+
+        Raises:
+            ValueError: If FSR or ToF vs weight is not a linear or quadratic model.
+        """
+        models = []
+        for pair, min_variance in (("fsr_vs_weight", MIN_FSR_VARIANCE), ("tof_vs_weight", MIN_TOF_VARIANCE)):
+            fit = record.fits.get(pair)
+            if fit is None or fit.model not in ("linear", "quadratic"):
+                raise ValueError(f"{pair} needs a linear or quadratic model")
+            coeffs = np.r_[np.zeros(3 - len(fit.coefficients)), fit.coefficients]
+            models.append(QuadraticSensorModel(coeffs, max(fit.rmse ** 2, min_variance)))
+        return cls(*models, **kwargs)
+
+    def _scalar_update(self, h, innovation, variance):
+        Ph = self.P @ h
+        gain = Ph / (h @ Ph + variance)
+        self.x += gain * innovation
+        self.P -= np.outer(gain, Ph)
+
+    def update(self, fsr_value, tof_value):
+        """
+        Processes one frame.
+
+        Args:
+            fsr_value (float): FSR reading, NaN if missing.
+            tof_value (float): ToF reading, NaN if missing.
+
+        Returns:
+            float: Fused weight estimate in grams.
+        """
+        # Predict
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.FT + self.Q
+
+        # FSR: z = h_fsr(w) + drift
+        if fsr_value == fsr_value:
+            w = self.x[0]
+            h = np.array([self.fsr_model.slope(w), 0.0, 1.0])
+            self._scalar_update(h, fsr_value - self.fsr_model.predict(w) - self.x[2], self.fsr_model.variance)
+
+        # ToF: z = h_tof(w)
+        if tof_value == tof_value:
+            w = self.x[0]
+            h = np.array([self.tof_model.slope(w), 0.0, 0.0])
+            self._scalar_update(h, tof_value - self.tof_model.predict(w), self.tof_model.variance)
+
+        return self.x[0]
+
+    def update_batch(self, fsr_values, tof_values):
+        """
+        Processes a batch of frames.
+
+        Returns:
+            tuple: (weight estimates, standard deviation of each estimate) as arrays.
+        """
+        n = len(fsr_values)
+        weights = np.empty(n)
+        sigmas = np.empty(n)
+        for i, (fsr_value, tof_value) in enumerate(zip(np.asarray(fsr_values, dtype=float),
+                                                       np.asarray(tof_values, dtype=float))):
+            weights[i] = self.update(fsr_value, tof_value)
+            sigmas[i] = self.P[0, 0] ** 0.5
+        return weights, sigmas
+
+
+# --- Benchmark ---
+def invert_quadratic(model, sensor, branch_max):
+    """Single-sensor baseline: root of the quadratic on the rising branch [0, branch_max]."""
+    grid = np.linspace(0.0, branch_max, 2001)
+    values = model.predict(grid)
+    order = np.argsort(values)
+    return np.interp(sensor, values[order], grid[order])
+
+
+def estimate_lag(truth, estimate, dt, max_lag=20):
+    """Lag (s) maximising the cross-correlation between truth and estimate."""
+    truth = truth - truth.mean()
+    estimate = estimate - estimate.mean()
+    lags = np.arange(max_lag + 1)
+    scores = [np.dot(truth[:len(truth) - lag], estimate[lag:]) for lag in lags]
+    return lags[int(np.argmax(scores))] * dt
+
+
+def simulate_session(fsr_model, tof_model, duration_s=600.0, dt=SAMPLE_PERIOD_S, seed=0):
+    """Grip cycles between 0 and 85 g with a drifting FSR and millimetre-quantised ToF."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(0.0, duration_s, dt)
+    weight = 42.5 - 42.5 * np.cos(2 * np.pi * 0.3 * t) * (0.8 + 0.2 * np.sin(2 * np.pi * 0.01 * t))
+    drift = 40.0 * t / duration_s  # FSR creeps up by 40 units over the session
+    fsr = fsr_model.predict(weight) + drift + rng.normal(0.0, fsr_model.variance ** 0.5, len(t))
+    tof = np.round(tof_model.predict(weight) + rng.normal(0.0, 0.5, len(t)))
+    return t, weight, fsr, tof
+
+
+def benchmark(csv_file_path, duration_s=600.0, smoothing_window=5):
+    """Compares the fused estimate against single-sensor and moving-average baselines."""
+    fusion = ForceFusionFilter.from_calibration_csv(csv_file_path)
+    dt = fusion.dt
+    t, weight, fsr, tof = simulate_session(fusion.fsr_model, fusion.tof_model, duration_s, dt)
+
+    vertex = -fusion.fsr_model.b / (2 * fusion.fsr_model.a) if fusion.fsr_model.a < 0 else 200.0
+    fsr_only = invert_quadratic(fusion.fsr_model, fsr, vertex)
+    tof_only = invert_quadratic(fusion.tof_model, tof, 200.0)
+    kernel = np.ones(smoothing_window) / smoothing_window
+    averaged = np.convolve((fsr_only + tof_only) / 2, kernel)[:len(t)]  # causal moving average
+
+    start = time.perf_counter()
+    fused, _ = fusion.update_batch(fsr, tof)
+    per_sample_us = (time.perf_counter() - start) / len(t) * 1e6
+
+    warmup = int(5.0 / dt)
+    print(f"Simulated {len(t)} frames ({duration_s:.0f} s at {1 / dt:.0f} Hz)")
+    print(f"{'Estimate':<28}{'RMSE (g)':>10}{'Lag (ms)':>10}")
+    for name, estimate in [("FSR only", fsr_only), ("ToF only", tof_only),
+                           (f"Mean of both, {smoothing_window}-sample MA", averaged), ("Kalman fusion", fused)]:
+        rmse = np.sqrt(np.mean((estimate[warmup:] - weight[warmup:]) ** 2))
+        lag_ms = estimate_lag(weight[warmup:], estimate[warmup:], dt) * 1e3
+        print(f"{name:<28}{rmse:>10.2f}{lag_ms:>10.0f}")
+    print(f"Fusion cost: {per_sample_us:.1f} us per sample ({1e6 / per_sample_us:,.0f} samples/s)")
+
+
+if __name__ == "__main__":
+    # Usage: python force_fusion.py [calibration.csv]
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else "DataAnalysis/ForceMapper/Real_calibration_data_ble.csv")
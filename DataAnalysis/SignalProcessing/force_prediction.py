@@ -0,0 +1,213 @@
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from spectral_analysis import LIVE_SAMPLE_RATE_HZ, MAX_SESSION_GAP_S, load_session_channels
+
+# --- Configuration ---
+# Age of a reading when the game uses it: one send_delay plus the BLE connection interval
+DEFAULT_HORIZON_S = 0.075
+EVALUATION_HORIZONS_S = (0.0, 0.025, 0.05, 0.075, 0.1, 0.15)
+
+# Forecast error (signal units) at which the confidence drops to 0.5
+CONFIDENCE_TOLERANCE = 25.0
+
+# Smoothing of the running forecast error used for the confidence value
+ERROR_SMOOTHING = 0.05
+
+
+# --- Predictors ---
+class AlphaBetaPredictor:
+    """
+    Alpha-beta tracker (steady-state constant-velocity Kalman filter) with extrapolation.
+
+    Args:
+        dt (float): Sample period in seconds.
+        alpha (float): Position gain, 0 < alpha < 1. Higher follows faster but keeps more noise.
+        beta (float): Velocity gain, defaults to the Benedict-Bordner choice alpha^2 / (2 - alpha).
+    """
+
+    def __init__(self, dt=1.0 / LIVE_SAMPLE_RATE_HZ, alpha=0.5, beta=None):
+        self.dt = dt
+        self.alpha = alpha
+        self.beta = alpha ** 2 / (2.0 - alpha) if beta is None else beta
+        self.level = None
+        self.rate = 0.0
+
+    @property
+    def name(self):
+        return f"alpha-beta (a={self.alpha:.2f})"
+
+    def update(self, value):
+        if self.level is None:
+            self.level = value
+            return
+        predicted = self.level + self.rate * self.dt
+        residual = value - predicted
+        self.level = predicted + self.alpha * residual
+        self.rate += self.beta * residual / self.dt
+
+    def forecast(self, horizon_s):
+        return self.level + self.rate * horizon_s
+
+
+class PolynomialExtrapolator:
+    """
+    Local polynomial fit over the last `window` samples, evaluated `horizon` ahead.
+
+    The least-squares fit and its evaluation at a given horizon collapse into one precomputed
+    weight vector, so a forecast is a single dot product over the window.
+
+    Args:
+        dt (float): Sample period in seconds.
+        window (int): Number of past samples in the fit.
+        degree (int): Polynomial degree (1 = linear, 2 = quadratic).
+    """
+
+    def __init__(self, dt=1.0 / LIVE_SAMPLE_RATE_HZ, window=6, degree=1):
+        if window <= degree:
+            raise ValueError("window must be larger than degree")
+        self.dt = dt
+        self.window = window
+        self.degree = degree
+        self.history = deque(maxlen=window)
+        # Sample times relative to the newest sample: -(window-1)*dt ... 0
+        times = (np.arange(window) - (window - 1)) * dt
+        self._pinv = np.linalg.pinv(np.vander(times, degree + 1))
+        self._weights = {}
+
+    @property
+    def name(self):
+        return f"polynomial (deg={self.degree}, n={self.window})"
+
+    def weights(self, horizon_s):
+        """Forecast weights for the last `window` samples (oldest first)."""
+        if horizon_s not in self._weights:
+            self._weights[horizon_s] = np.vander([horizon_s], self.degree + 1)[0] @ self._pinv
+        return self._weights[horizon_s]
+
+    def update(self, value):
+        self.history.append(value)
+
+    def forecast(self, horizon_s):
+        if len(self.history) < self.window:
+            return self.history[-1]
+        return float(np.dot(self.weights(horizon_s), self.history))
+
+
+# --- Live prediction stage ---
+class ForcePredictionStage:
+    """
+    Publishes a forecast of the force for 'now' from readings that are already horizon_s old.
+
+    The confidence comes from how well past forecasts matched the readings that arrived later:
+    every forecast is checked once its target time has been measured, and the running mean
+    squared error is mapped to tolerance^2 / (tolerance^2 + mse), from 1 (reliable) down to 0.
+
+    Args:
+        predictor: AlphaBetaPredictor or PolynomialExtrapolator.
+        horizon_s (float): Latency to compensate, in seconds.
+        tolerance (float): Forecast error at which the confidence is 0.5.
+    """
+
+    def __init__(self, predictor, horizon_s=DEFAULT_HORIZON_S, tolerance=CONFIDENCE_TOLERANCE):
+        self.predictor = predictor
+        self.horizon_s = horizon_s
+        self.tolerance = tolerance
+        self.mean_squared_error = 0.0
+        self._pending = deque()  # (target time, forecast)
+        self.forecast = None
+        self.confidence = 0.0
+
+    def update(self, value, timestamp):
+        """
+        Adds one reading and returns the forecast for timestamp + horizon_s.
+
+        Returns:
+            tuple: (forecast, confidence)
+        """
+        # Score forecasts whose target time has now been measured
+        while self._pending and self._pending[0][0] <= timestamp:
+            _, old_forecast = self._pending.popleft()
+            error = (old_forecast - value) ** 2
+            self.mean_squared_error += ERROR_SMOOTHING * (error - self.mean_squared_error)
+
+        self.predictor.update(value)
+        self.forecast = self.predictor.forecast(self.horizon_s)
+        self._pending.append((timestamp + self.horizon_s, self.forecast))
+        self.confidence = self.tolerance ** 2 / (self.tolerance ** 2 + self.mean_squared_error)
+        return self.forecast, self.confidence
+
+
+# --- Offline evaluation on replayed sessions ---
+def replay_forecasts(predictor, values, horizon_s):
+    """Feeds a uniformly sampled signal through a predictor and returns every forecast."""
+    forecasts = np.empty(len(values))
+    for i, value in enumerate(values):
+        predictor.update(value)
+        forecasts[i] = predictor.forecast(horizon_s)
+    return forecasts
+
+
+def evaluate_horizons(times, values, predictor_factories, horizons=EVALUATION_HORIZONS_S,
+                      fs=LIVE_SAMPLE_RATE_HZ):
+    """
+    Accuracy-versus-horizon table for several predictors on one recorded signal.
+
+    Each gap-free segment of the recording is resampled to the firmware rate (the input the live
+    path sees); forecasts are scored against the original recording interpolated at the target
+    time. 'hold last value' is the current behaviour, i.e. no latency compensation.
+
+    Args:
+        times (np.ndarray): Sample times in seconds.
+        values (np.ndarray): Recorded signal.
+        predictor_factories (list): Callables returning a fresh predictor for a given dt.
+        horizons (tuple): Forecast horizons in seconds.
+
+    Returns:
+        pd.DataFrame: RMSE per predictor (rows) and horizon in ms (columns).
+    """
+    dt = 1.0 / fs
+    breaks = np.flatnonzero(np.diff(times) > MAX_SESSION_GAP_S) + 1
+    segments = [(times[a:b], values[a:b]) for a, b in zip(np.r_[0, breaks], np.r_[breaks, len(times)])
+                if b - a > 1]
+
+    rows = {}
+    for horizon in horizons:
+        errors = {}
+        for seg_times, seg_values in segments:
+            grid = np.arange(seg_times[0], seg_times[-1], dt)
+            resampled = np.interp(grid, seg_times, seg_values)
+            targets = grid + horizon
+            valid = targets <= seg_times[-1]
+            truth = np.interp(targets[valid], seg_times, seg_values)
+
+            errors.setdefault("hold last value", []).append(resampled[valid] - truth)
+            for factory in predictor_factories:
+                predictor = factory(dt)
+                forecasts = replay_forecasts(predictor, resampled, horizon)
+                errors.setdefault(predictor.name, []).append(forecasts[valid] - truth)
+
+        for name, error in errors.items():
+            error = np.concatenate(error)
+            rows.setdefault(name, {})[f"{horizon * 1e3:.0f} ms"] = np.sqrt(np.mean(error ** 2))
+    return pd.DataFrame(rows).T
+
+
+DEFAULT_PREDICTORS = [
+    lambda dt: AlphaBetaPredictor(dt, alpha=0.5),
+    lambda dt: AlphaBetaPredictor(dt, alpha=0.8),
+    lambda dt: PolynomialExtrapolator(dt, window=4, degree=1),
+    lambda dt: PolynomialExtrapolator(dt, window=8, degree=2),
+]
+
+
+if __name__ == "__main__":
+    # Usage: python force_prediction.py [game_log.csv ...]
+    csv_files = sys.argv[1:] or ["DataAnalysis/GameLogsAnalysis/test2.csv"]
+    for csv_file in csv_files:
+        times, samples = load_session_channels(csv_file, channels=("FSR",))
+        print(f"\n{csv_file}: FSR forecast RMSE by horizon")
+        print(evaluate_horizons(times, samples[:, 0], DEFAULT_PREDICTORS).round(2).to_string())
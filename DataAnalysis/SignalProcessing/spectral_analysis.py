@@ -0,0 +1,365 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# --- Configuration ---
+# The firmware notifies every send_delay = 50 ms, the Unity game logs at its frame rate (~30 Hz)
+LIVE_SAMPLE_RATE_HZ = 20.0
+SESSION_SAMPLE_RATE_HZ = 30.0
+
+# Welch / STFT settings
+WINDOW_LENGTH = 64       # Samples per analysis window (3.2 s live, ~2.1 s on game logs)
+WINDOW_OVERLAP = 0.75    # Fraction of overlap between consecutive windows
+
+# Frequency bands of interest (Hz). Bands are clipped to the Nyquist frequency of the stream,
+# so with the 20 Hz live stream the tremor band effectively covers 4-10 Hz.
+FREQUENCY_BANDS = {
+    "movement": (0.2, 3.0),  # Voluntary grip / finger extension movements
+    "tremor": (4.0, 12.0),   # Physiological and pathological tremor
+}
+
+# Cut-off for the spectral arc length smoothness metric
+SMOOTHNESS_CUTOFF_HZ = 10.0
+
+# Game log sessions are split into separate segments at gaps longer than this
+MAX_SESSION_GAP_S = 0.5
+
+SESSION_CHANNELS = ("FSR", "POT")
+
+
+# --- Batched spectral helpers ---
+def hann_window(length):
+    """Periodic Hann taper as used for Welch averaging."""
+    n = np.arange(length)
+    return 0.5 - 0.5 * np.cos(2.0 * np.pi * n / length)
+
+
+def frame_signal(x, window_length, hop):
+    """
+    Returns a strided view of overlapping windows over the last axis of x.
+
+    Args:
+        x (np.ndarray): Signal of shape (..., n_samples).
+        window_length (int): Samples per window.
+        hop (int): Samples between the starts of consecutive windows.
+
+    Returns:
+        np.ndarray: View of shape (..., n_windows, window_length). No data is copied.
+    """
+    return sliding_window_view(x, window_length, axis=-1)[..., ::hop, :]
+
+
+def batched_psd(frames, fs, taper=None):
+    """
+    One-sided power spectral density of every window in a single rfft call.
+
+    Args:
+        frames (np.ndarray): Windows of shape (..., n_windows, window_length).
+        fs (float): Sample rate in Hz.
+        taper (np.ndarray): Window function, defaults to a periodic Hann window.
+
+    Returns:
+        tuple: (freqs, psd) with psd of shape (..., n_windows, window_length // 2 + 1).
+    """
+    window_length = frames.shape[-1]
+    if taper is None:
+        taper = hann_window(window_length)
+
+    # Remove the per-window mean so the slowly varying grip level does not leak into the bands
+    detrended = frames - frames.mean(axis=-1, keepdims=True)
+    spectrum = np.fft.rfft(detrended * taper, axis=-1)
+    psd = (spectrum.real ** 2 + spectrum.imag ** 2) / (fs * np.sum(taper ** 2))
+
+    # Fold the negative frequencies in (the Nyquist bin only exists once for even lengths)
+    if window_length % 2 == 0:
+        psd[..., 1:-1] *= 2.0
+    else:
+        psd[..., 1:] *= 2.0
+
+    freqs = np.fft.rfftfreq(window_length, d=1.0 / fs)
+    return freqs, psd
+
+
+def band_matrix(freqs, bands):
+    """
+    Builds a (n_bands, n_freqs) integration matrix so all band powers are one matmul.
+    """
+    df = freqs[1] - freqs[0]
+    matrix = np.zeros((len(bands), len(freqs)))
+    for i, (low, high) in enumerate(bands.values()):
+        matrix[i] = ((freqs >= low) & (freqs <= high)) * df
+    return matrix
+
+
+def spectral_arc_length(frames, fs, cutoff=SMOOTHNESS_CUTOFF_HZ, pad_factor=4):
+    """
+    Spectral arc length (SAL) smoothness of every window, computed on the speed profile.
+
+    Values are negative; closer to zero means a smoother movement.
+
+    Args:
+        frames (np.ndarray): Windows of shape (..., n_windows, window_length).
+        fs (float): Sample rate in Hz.
+        cutoff (float): Highest frequency included in the arc length (clipped to Nyquist).
+        pad_factor (int): Zero padding factor for a finer frequency grid.
+
+    Returns:
+        np.ndarray: SAL values of shape (..., n_windows).
+    """
+    speed = np.abs(np.diff(frames, axis=-1)) * fs
+    n_fft = int(2 ** np.ceil(np.log2(speed.shape[-1] * pad_factor)))
+    magnitude = np.abs(np.fft.rfft(speed, n=n_fft, axis=-1))
+    freqs = np.fft.rfftfreq(n_fft, d=1.0 / fs)
+
+    cutoff = min(cutoff, fs / 2.0)
+    keep = freqs <= cutoff
+    magnitude = magnitude[..., keep]
+
+    # Normalise each window by its DC magnitude; motionless windows are perfectly smooth
+    dc = magnitude[..., :1]
+    normalised = np.divide(magnitude, dc, out=np.zeros_like(magnitude), where=dc > 0)
+
+    df = (freqs[1] - freqs[0]) / cutoff
+    return -np.sum(np.sqrt(df ** 2 + np.diff(normalised, axis=-1) ** 2), axis=-1)
+
+
+# --- Streaming engine ---
+class StreamingSpectralAnalyzer:
+    """
+    Sliding-window Welch/STFT engine for the live sensor stream.
+
+    Samples are pushed in as they arrive. Every push computes all windows that became
+    complete in one batched rfft and publishes their band powers and smoothness.
+    """
+
+    def __init__(self, channels=SESSION_CHANNELS, fs=LIVE_SAMPLE_RATE_HZ,
+                 window_length=WINDOW_LENGTH, overlap=WINDOW_OVERLAP,
+                 bands=FREQUENCY_BANDS, history=600):
+        """
+        Args:
+            channels (tuple): Channel names, in the column order used by push().
+            fs (float): Sample rate of the stream in Hz.
+            window_length (int): Samples per analysis window.
+            overlap (float): Fraction of overlap between consecutive windows (0 <= overlap < 1).
+            bands (dict): Band name -> (low_hz, high_hz).
+            history (int): Number of published windows kept for live plotting.
+        """
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap must be in [0, 1)")
+
+        self.channels = tuple(channels)
+        self.fs = float(fs)
+        self.window_length = int(window_length)
+        self.hop = max(1, int(round(self.window_length * (1.0 - overlap))))
+        self.bands = dict(bands)
+
+        self.taper = hann_window(self.window_length)
+        self.freqs = np.fft.rfftfreq(self.window_length, d=1.0 / self.fs)
+        self._band_matrix = band_matrix(self.freqs, self.bands)
+
+        # Per-channel window buffer holding the samples not yet consumed by a full hop
+        self._buffer = np.empty((len(self.channels), 0))
+        self._buffer_times = np.empty(0)
+        self._samples_seen = 0
+
+        # Published time series for live consumers
+        self.times = deque(maxlen=history)
+        self.band_power = {
+            channel: {band: deque(maxlen=history) for band in self.bands}
+            for channel in self.channels
+        }
+        self.smoothness = {channel: deque(maxlen=history) for channel in self.channels}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Registers callback(result) to be called for every push that completed windows."""
+        self._subscribers.append(callback)
+
+    def push(self, samples, timestamps=None):
+        """
+        Feeds new samples into the window buffer.
+
+        Args:
+            samples (array-like): Shape (n_samples, n_channels), or (n_channels,) for one frame.
+            timestamps (array-like): Optional sample times in seconds. Defaults to the sample
+                index divided by the sample rate.
+
+        Returns:
+            dict or None: Result of the newly completed windows (see analyze_frames()),
+            or None if no window was completed.
+        """
+        samples = np.atleast_2d(np.asarray(samples, dtype=float))
+        if samples.shape[1] != len(self.channels):
+            raise ValueError(f"Expected {len(self.channels)} channels, got {samples.shape[1]}")
+
+        n_new = samples.shape[0]
+        if timestamps is None:
+            timestamps = (self._samples_seen + np.arange(n_new)) / self.fs
+        self._samples_seen += n_new
+
+        self._buffer = np.concatenate([self._buffer, samples.T], axis=1)
+        self._buffer_times = np.concatenate([self._buffer_times, np.asarray(timestamps, dtype=float)])
+
+        available = self._buffer.shape[1]
+        if available < self.window_length:
+            return None
+
+        n_windows = 1 + (available - self.window_length) // self.hop
+        frames = frame_signal(self._buffer, self.window_length, self.hop)[:, :n_windows]
+        centres = frame_signal(self._buffer_times, self.window_length, self.hop)[:n_windows].mean(axis=-1)
+        result = self.analyze_frames(frames, centres)
+
+        # Keep only the overlap needed by the next window
+        consumed = n_windows * self.hop
+        self._buffer = self._buffer[:, consumed:]
+        self._buffer_times = self._buffer_times[consumed:]
+
+        self._publish(result)
+        return result
+
+    def analyze_frames(self, frames, times):
+        """
+        Computes band powers and smoothness for a batch of windows.
+
+        Args:
+            frames (np.ndarray): Shape (n_channels, n_windows, window_length).
+            times (np.ndarray): Centre time of every window.
+
+        Returns:
+            dict: 'time' (n_windows,), 'band_power' (n_windows, n_channels, n_bands)
+            and 'smoothness' (n_windows, n_channels).
+        """
+        _, psd = batched_psd(frames, self.fs, self.taper)
+        band_power = psd @ self._band_matrix.T
+        smoothness = spectral_arc_length(frames, self.fs)
+        return {
+            "time": np.asarray(times),
+            "band_power": np.transpose(band_power, (1, 0, 2)),
+            "smoothness": smoothness.T,
+        }
+
+    def _publish(self, result):
+        self.times.extend(result["time"])
+        for c, channel in enumerate(self.channels):
+            for b, band in enumerate(self.bands):
+                self.band_power[channel][band].extend(result["band_power"][:, c, b])
+            self.smoothness[channel].extend(result["smoothness"][:, c])
+        for callback in self._subscribers:
+            callback(result)
+
+    def to_dataframe(self, result):
+        """Flattens a push()/analyze_frames() result into a tidy DataFrame."""
+        data = {"time_s": result["time"]}
+        for c, channel in enumerate(self.channels):
+            for b, band in enumerate(self.bands):
+                data[f"{channel}_{band}_power"] = result["band_power"][:, c, b]
+            data[f"{channel}_smoothness"] = result["smoothness"][:, c]
+        return pd.DataFrame(data)
+
+
+# --- Offline / bulk processing of archived sessions ---
+def load_session_channels(csv_file_path, channels=SESSION_CHANNELS):
+    """
+    Reads the SensorData rows of a game log.
+
+    The Unity logger writes one field less for SensorData and CalibrationData rows,
+    which pushes the log type into the 'MaxTof' column. Both layouts are accepted.
+
+    Returns:
+        tuple: (time in seconds since the first sample, samples of shape (n, n_channels))
+    """
+    df = pd.read_csv(csv_file_path, skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+
+    log_type = df["LogType"].where(df["LogType"].notna(), df["MaxTof"]).astype(str).str.strip()
+    sensor_df = df[log_type == "SensorData"]
+
+    timestamps = pd.to_datetime(sensor_df["Timestamp"])
+    values = sensor_df[list(channels)].apply(pd.to_numeric, errors="coerce")
+    valid = values.notna().all(axis=1).to_numpy()
+
+    seconds = (timestamps - timestamps.iloc[0]).dt.total_seconds().to_numpy()[valid]
+    return seconds, values.to_numpy(dtype=float)[valid]
+
+
+def analyze_session(times, samples, fs=SESSION_SAMPLE_RATE_HZ, channels=SESSION_CHANNELS,
+                    window_length=WINDOW_LENGTH, overlap=WINDOW_OVERLAP, bands=FREQUENCY_BANDS):
+    """
+    Runs the spectral engine over a complete recorded session.
+
+    The irregular game-log timestamps are resampled onto a uniform grid at fs. Gaps longer
+    than MAX_SESSION_GAP_S (scene changes, pauses) start a new segment so that no window
+    spans a gap.
+
+    Returns:
+        pd.DataFrame: Band-power and smoothness time series of the session.
+    """
+    frames = []
+    if len(times) == 0:
+        return pd.DataFrame()
+
+    breaks = np.flatnonzero(np.diff(times) > MAX_SESSION_GAP_S) + 1
+    for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(times)]):
+        seg_times = times[start:stop]
+        if seg_times[-1] - seg_times[0] < window_length / fs:
+            continue
+
+        grid = np.arange(seg_times[0], seg_times[-1], 1.0 / fs)
+        resampled = np.column_stack([np.interp(grid, seg_times, samples[start:stop, c])
+                                     for c in range(samples.shape[1])])
+
+        analyzer = StreamingSpectralAnalyzer(channels, fs, window_length, overlap, bands, history=0)
+        result = analyzer.push(resampled, grid)
+        if result is not None:
+            frames.append(analyzer.to_dataframe(result))
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def analyze_session_file(csv_file_path):
+    """Loads one game log and returns its band-power time series."""
+    times, samples = load_session_channels(csv_file_path)
+    return analyze_session(times, samples)
+
+
+def analyze_session_files(csv_file_paths, max_workers=None):
+    """
+    Processes many archived sessions in parallel, one session per worker task.
+
+    Args:
+        csv_file_paths (list): Game log CSV files.
+        max_workers (int): Worker processes, defaults to the number of cores.
+
+    Returns:
+        dict: File path -> band-power DataFrame. Files that fail are reported and skipped.
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {path: executor.submit(analyze_session_file, path) for path in csv_file_paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                print(f"Error analysing '{path}': {e}")
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python spectral_analysis.py log1.csv [log2.csv ...]
+    csv_files = sys.argv[1:] or ["DataAnalysis/GameLogsAnalysis/test2.csv"]
+    for path, series in analyze_session_files(csv_files).items():
+        if series.empty:
+            print(f"{path}: session too short for a {WINDOW_LENGTH}-sample window")
+            continue
+        output_file = os.path.splitext(path)[0] + "_spectral.csv"
+        series.to_csv(output_file, index=False)
+        print(f"{path}: {len(series)} windows, "
+              f"mean FSR tremor power {series['FSR_tremor_power'].mean():.3f}, "
+              f"mean POT smoothness {series['POT_smoothness'].mean():.2f} -> {output_file}")